@@ -0,0 +1,99 @@
+"""
+Measures the time to `import fprules` in a fresh interpreter, and the heavy modules that it imports.
+
+Usage:
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --repeat 20 --max-ms 50 --output import.json
+
+Each run starts a new python process, so that nothing is already imported. The best time of `--repeat` runs is
+reported, together with the cumulative import times of the slowest modules measured with `python -X importtime`
+(python 3.7+). With `--max-ms`, the script exits with an error if the best time exceeds the threshold, so that it can
+be used to catch regressions in continuous integration.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# modules that should not be imported by `import fprules`, since they are slow to import and only used by some features
+HEAVY_MODULES = ('asyncio', 'sqlite3', 'ctypes', 'pickle', 'tempfile', 'subprocess', 'setuptools_scm', 'makefun')
+
+_TIME_IMPORT = """
+import sys
+from timeit import default_timer
+start = default_timer()
+import fprules
+elapsed = default_timer() - start
+print('%%r %%s' %% (elapsed, ','.join(m for m in %r if m in sys.modules)))
+""" % (HEAVY_MODULES,)
+
+
+def _run(args):
+    """Runs python with `args` in a fresh process, with fprules importable from the sources"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (ROOT, env.get('PYTHONPATH')) if p)
+    return subprocess.check_output([sys.executable] + args, env=env, stderr=subprocess.STDOUT).decode('utf-8')
+
+
+def measure(repeat=10):
+    """Returns the best time (in seconds) to import fprules, and the list of heavy modules imported"""
+    best = None
+    imported = []
+    for _ in range(repeat):
+        elapsed, imported = _run(['-c', _TIME_IMPORT]).split(' ')
+        elapsed = float(elapsed)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, [m for m in imported.strip().split(',') if m]
+
+
+def slowest_modules(nb=10):
+    """Returns the `nb` modules with the highest cumulative import time (in seconds), using `-X importtime`"""
+    if sys.version_info < (3, 7):
+        return []
+    modules = []
+    for line in _run(['-X', 'importtime', '-c', 'import fprules']).splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(modules, key=lambda m: m[1], reverse=True)[:nb]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10, help="number of runs")
+    parser.add_argument('--max-ms', type=float, default=None, help="maximum import time in ms, exit with an error "
+                                                                   "if it is exceeded")
+    parser.add_argument('--output', default=None, help="a json file where to save the results")
+    opts = parser.parse_args(args)
+
+    best, imported = measure(repeat=opts.repeat)
+    slowest = slowest_modules()
+    print("import fprules: %.1f ms (best of %s)" % (best * 1000, opts.repeat))
+    print("heavy modules imported: %s" % (', '.join(imported) or 'none'))
+    if slowest:
+        print("\nslowest modules (cumulative, ms):")
+        for name, cumulative in slowest:
+            print("%8.1f  %s" % (cumulative * 1000, name))
+
+    if opts.output is not None:
+        report = dict(python=platform.python_version(), platform=platform.platform(), repeat=opts.repeat,
+                      time_s=best, heavy_modules=imported, slowest_modules=slowest)
+        with open(opts.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print("\nResults saved in %s" % opts.output)
+
+    if opts.max_ms is not None and best * 1000 > opts.max_ms:
+        print("\nimport fprules took %.1f ms, more than the maximum of %s ms" % (best * 1000, opts.max_ms))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
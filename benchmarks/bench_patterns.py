@@ -0,0 +1,189 @@
+"""
+Benchmarks `gen_matching_files` and `file_pattern` on a synthetic tree, for several pattern shapes.
+
+Usage:
+
+    python benchmarks/bench_patterns.py --depth 4 --width 6 --files 20 --output results.json
+    python benchmarks/bench_patterns.py --tree /tmp/fprules_tree --output new.json --compare results.json
+
+For each case, the best total time of `--repeat` runs, the throughput (matches per second), the time to get the first
+item and the peak memory allocated during a run (measured with `tracemalloc` in a separate run) are reported. With
+`--output`, the results are saved as JSON together with the versions and the tree parameters, so that they can be
+compared to a later run with `--compare`.
+
+The tree is generated in a temporary folder unless `--tree` is provided, in which case it is created only if it does
+not exist yet, so that it can be reused across runs.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:
+    # python 2
+    tracemalloc = None
+
+try:
+    from pathlib import Path
+except ImportError:
+    from pathlib2 import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from fprules import gen_matching_files, file_pattern, __version__  # noqa: E402
+
+
+# (case name, api, source pattern, destination pattern, names). The destination and names are only used by
+# `file_pattern`, that also creates the name and destination paths of each item.
+CASES = (
+    ('flat', 'gen_matching_files', '*/*.ddl', None, None),
+    ('single-dbl', 'gen_matching_files', '**/*.ddl', None, None),
+    ('double-dbl', 'gen_matching_files', '**/d1/**/*.yml', None, None),
+    ('flat', 'file_pattern', '*/*.ddl', 'out/%.csv', None),
+    ('single-dbl', 'file_pattern', '**/*.ddl', 'out/%%/%.csv', None),
+    ('double-dbl', 'file_pattern', '**/d1/**/*.yml', 'out/%%/%.csv', None),
+    ('multi-target', 'file_pattern', '**/*.ddl', {'csv': 'out/%%/%.csv', 'pkl': 'out/%%/%.pkl',
+                                                  'log': 'logs/%%/%.log'}, None),
+    ('names', 'file_pattern', '**/*.ddl', 'out/%%/%.csv', 'ddl-%'),
+)
+
+
+def make_tree(root, depth, width, files):
+    """
+    Creates a tree of `depth` levels of `width` sub-folders `d<i>` under `root`, with `files` files in each folder
+    (including `root`) with extensions '.ddl', '.yml', '.csv' and '.txt' in turn.
+    """
+    extensions = ('.ddl', '.yml', '.csv', '.txt')
+    level = [root]
+    for d in range(depth + 1):
+        next_level = []
+        for parent in level:
+            for i in range(files):
+                with open(os.path.join(parent, 'f%s%s' % (i, extensions[i % len(extensions)])), 'w'):
+                    pass
+            if d < depth:
+                for i in range(width):
+                    child = os.path.join(parent, 'd%s' % i)
+                    os.mkdir(child)
+                    next_level.append(child)
+        level = next_level
+
+
+def _run(api, src_pattern, dst_pattern, names, engine):
+    """Returns a generator for one run of the case, consuming what a build tool would use from each result"""
+    if api == 'gen_matching_files':
+        for path, captured in gen_matching_files(src_pattern, engine=engine):
+            yield path
+    else:
+        for item in file_pattern(src_pattern, dst_pattern, names=names, engine=engine):
+            item.name
+            item.dst_path
+            yield item
+
+
+def measure(root, api, pattern, dst_pattern, names, repeat=3, engine=None):
+    """Measures a case, and returns a dictionary of results"""
+    src_pattern = Path(root) / pattern
+    best = first = None
+    nb = 0
+    for _ in range(repeat):
+        start = default_timer()
+        it = _run(api, src_pattern, dst_pattern, names, engine)
+        nb = 0
+        for _ in it:
+            if nb == 0:
+                elapsed = default_timer() - start
+                first = elapsed if first is None else min(first, elapsed)
+            nb += 1
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    peak = None
+    if tracemalloc is not None:
+        # a separate run, since tracing allocations slows it down
+        tracemalloc.start()
+        try:
+            sum(1 for _ in _run(api, src_pattern, dst_pattern, names, engine))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return dict(api=api, pattern=pattern, matches=nb, time_s=best, throughput=nb / best if best else None,
+                first_item_s=first, peak_memory_bytes=peak)
+
+
+def bench(root, repeat=3, engine=None):
+    """Measures all `CASES`, and returns the list of results"""
+    print("%-13s %-19s %-15s %8s %9s %11s %11s %10s"
+          % ('case', 'api', 'pattern', 'matches', 'time (s)', 'items/s', 'first (ms)', 'peak (KB)'))
+    results = []
+    for case, api, pattern, dst_pattern, names in CASES:
+        res = measure(root, api, pattern, dst_pattern, names, repeat=repeat, engine=engine)
+        res['case'] = case
+        results.append(res)
+        print("%-13s %-19s %-15s %8s %9.3f %11.0f %11s %10s"
+              % (case, api, pattern, res['matches'], res['time_s'], res['throughput'] or 0,
+                 '-' if res['first_item_s'] is None else '%.2f' % (res['first_item_s'] * 1000),
+                 '-' if res['peak_memory_bytes'] is None else res['peak_memory_bytes'] // 1024))
+    return results
+
+
+def compare(results, previous):
+    """Prints the time ratio of each case compared to the `previous` results saved with `--output`"""
+    previous_times = {(r['case'], r['api']): r['time_s'] for r in previous['results']}
+    print("\nCompared to fprules %s (python %s):" % (previous['fprules'], previous['python']))
+    for res in results:
+        before = previous_times.get((res['case'], res['api']))
+        if before:
+            print("%-13s %-19s x%.2f" % (res['case'], res['api'], res['time_s'] / before))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--depth', type=int, default=4, help="number of levels of sub-folders")
+    parser.add_argument('--width', type=int, default=6, help="number of sub-folders per folder")
+    parser.add_argument('--files', type=int, default=20, help="number of files per folder")
+    parser.add_argument('--tree', default=None, help="folder where to create (or reuse) the tree")
+    parser.add_argument('--repeat', type=int, default=3, help="number of runs per measure")
+    parser.add_argument('--engine', default=None, help="the walk engine to use")
+    parser.add_argument('--output', default=None, help="a json file where to save the results")
+    parser.add_argument('--compare', default=None, help="a json file of previous results to compare to")
+    opts = parser.parse_args(args)
+
+    tmp_dir = None
+    if opts.tree is None:
+        tmp_dir = opts.tree = tempfile.mkdtemp(prefix='fprules_bench_')
+    try:
+        if not os.path.isdir(opts.tree) or not os.listdir(opts.tree):
+            if not os.path.isdir(opts.tree):
+                os.makedirs(opts.tree)
+            print("Creating a tree of depth %s, width %s and %s files per folder in %s"
+                  % (opts.depth, opts.width, opts.files, opts.tree))
+            make_tree(opts.tree, opts.depth, opts.width, opts.files)
+        results = bench(opts.tree, repeat=opts.repeat, engine=opts.engine)
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir)
+
+    report = dict(fprules=__version__, python=platform.python_version(), platform=platform.platform(),
+                  engine=opts.engine, tree=dict(depth=opts.depth, width=opts.width, files=opts.files),
+                  results=results)
+    if opts.output is not None:
+        with open(opts.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print("\nResults saved in %s" % opts.output)
+    if opts.compare is not None:
+        with open(opts.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Compares the walk engines of `fprules.gen_matching_files` on a synthetic tree.
+
+Usage:
+
+    python benchmarks/bench_walk.py --entries 100000
+    python benchmarks/bench_walk.py --entries 1000000 --tree /tmp/fprules_bench_1M
+
+The tree is generated in a temporary folder unless `--tree` is provided, in which case it is created only if it does
+not exist yet, so that it can be reused across runs.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from timeit import default_timer
+
+try:
+    from pathlib import Path
+except ImportError:
+    from pathlib2 import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from fprules import gen_matching_files  # noqa: E402
+from fprules.walk import WALK_ENGINES  # noqa: E402
+
+
+PATTERNS = ('*/*/*.ddl', '**/*.ddl', '**/d1/**/*.yml', '*/d1*/**')
+
+
+def make_tree(root, nb_entries, files_per_dir=20, dirs_per_dir=5):
+    """Creates a tree with approximately `nb_entries` files and folders under `root`, breadth-first"""
+    extensions = ('.ddl', '.yml', '.csv', '.txt')
+    created = 0
+    to_fill = [root]
+    while created < nb_entries:
+        parent = to_fill.pop(0)
+        for i in range(files_per_dir):
+            with open(os.path.join(parent, 'f%s%s' % (i, extensions[i % len(extensions)])), 'w'):
+                pass
+        for i in range(dirs_per_dir):
+            child = os.path.join(parent, 'd%s' % i)
+            os.mkdir(child)
+            to_fill.append(child)
+        created += files_per_dir + dirs_per_dir
+
+
+def bench(root, patterns=PATTERNS, repeat=3, workers=None):
+    """Times a full `gen_matching_files` run for each pattern and engine, keeping the best of `repeat` runs"""
+    configs = [(engine, dict(engine=engine)) for engine in sorted(WALK_ENGINES)]
+    if workers:
+        configs.append(('scandir-w%s' % workers, dict(engine='scandir', workers=workers)))
+        configs.append(('scandir-w%s-unordered' % workers, dict(engine='scandir', workers=workers, ordered=False)))
+
+    print("%-18s %-22s %10s %10s" % ('pattern', 'engine', 'matches', 'time (s)'))
+    for pattern in patterns:
+        src_pattern = Path(root) / pattern
+        timings = {}
+        for config_name, options in configs:
+            best = None
+            for _ in range(repeat):
+                start = default_timer()
+                nb = sum(1 for _ in gen_matching_files(src_pattern, **options))
+                elapsed = default_timer() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[config_name] = best
+            print("%-18s %-22s %10s %10.3f" % (pattern, config_name, nb, best))
+        if 'pathlib' in timings and 'scandir' in timings:
+            print("%-18s speedup: x%.2f" % ('', timings['pathlib'] / timings['scandir']))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=100000, help="approximate number of files and folders")
+    parser.add_argument('--tree', default=None, help="folder where to create (or reuse) the tree")
+    parser.add_argument('--repeat', type=int, default=3, help="number of runs per measure")
+    parser.add_argument('--workers', type=int, default=None, help="also measure the scandir engine with threads")
+    opts = parser.parse_args(args)
+
+    tmp_dir = None
+    if opts.tree is None:
+        tmp_dir = opts.tree = tempfile.mkdtemp(prefix='fprules_bench_')
+    try:
+        if not os.path.isdir(opts.tree) or not os.listdir(opts.tree):
+            if not os.path.isdir(opts.tree):
+                os.makedirs(opts.tree)
+            print("Creating a tree of ~%s entries in %s" % (opts.entries, opts.tree))
+            make_tree(opts.tree, opts.entries)
+        bench(opts.tree, repeat=opts.repeat, workers=opts.workers)
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
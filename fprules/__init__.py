@@ -1,4 +1,19 @@
-from .main import file_pattern, gen_matching_files, FileItem
+import sys as _sys
+
+from .main import file_pattern, file_patterns, gen_matching_files, FileItem, compile_pattern, FilePattern
+from .table import FileTable
+from .changes import ChangedFileItem, ADDED, MODIFIED, REMOVED
+from .watch import watch_pattern
+from .index import PatternIndex
+from .stats import MatchStats
+from .export import export_matches
+from .run import run_rule
+from .fingerprint import FingerprintedFileItem, HashCache
+from .targets import prepare_targets
+
+if _sys.version_info >= (3, 6):
+    # async generators are only available in python 3.6+
+    from .aio import afile_pattern
 
 try:
     # -- Distribution mode --
@@ -7,11 +22,27 @@ try:
 except ImportError:
     # -- Source mode --
     # use setuptools_scm to get the current version from src using git
-    from setuptools_scm import get_version as _gv
-    from os import path as _path
-    __version__ = _gv(_path.join(_path.dirname(__file__), _path.pardir))
+    def _get_version():
+        from setuptools_scm import get_version as _gv
+        from os import path as _path
+        return _gv(_path.join(_path.dirname(__file__), _path.pardir))
 
+    if _sys.version_info >= (3, 7):
+        # compute it lazily: importing setuptools_scm and calling git is slow
+        def __getattr__(name):
+            if name == '__version__':
+                global __version__
+                __version__ = _get_version()
+                return __version__
+            raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    else:
+        __version__ = _get_version()
 
 __all__ = [
-    'file_pattern', 'gen_matching_files', 'FileItem', '__version__'
+    'file_pattern', 'file_patterns', 'gen_matching_files', 'FileItem', 'compile_pattern', 'FilePattern', 'FileTable',
+    'ChangedFileItem', 'ADDED', 'MODIFIED', 'REMOVED', 'watch_pattern', 'PatternIndex',
+    'MatchStats', 'export_matches', 'run_rule', 'FingerprintedFileItem', 'HashCache',
+    'prepare_targets', '__version__'
 ]
+if _sys.version_info >= (3, 6):
+    __all__.append('afile_pattern')
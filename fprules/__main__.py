@@ -0,0 +1,147 @@
+"""
+Command line interface of fprules.
+
+Usage:
+
+    python -m fprules list './defs/**/*.ddl' './downloaded/%%/%.csv' --format nul | xargs -0 -n 3 echo
+    python -m fprules list 'src/**/*.py' --format tsv --fields src_path,captured_subpath
+    python -m fprules list 'defs/*.ddl' --target csv='out/%.csv' --target log='logs/%.log' -o items.jsonl
+    python -m fprules run './defs/**/*.ddl' './downloaded/%%/%.csv' -j 4 -- ddl2csv {src} -o {dst}
+
+When fprules is installed, `fprules` can be used instead of `python -m fprules`.
+"""
+from __future__ import print_function
+
+import argparse
+import errno
+import os
+import sys
+from subprocess import CalledProcessError
+
+try:
+    from typing import List, Optional
+except ImportError:
+    pass
+
+
+def _targets(dst_pattern,  # type: Optional[str]
+             targets       # type: Optional[List[str]]
+             ):
+    """Returns the destination pattern from the command line arguments: a string, a dictionary or None"""
+    if not targets:
+        return dst_pattern
+    if dst_pattern is not None:
+        raise ValueError("A destination pattern can not be used together with `--target`")
+    # use an OrderedDict for legacy python compatibility
+    from collections import OrderedDict
+    dst_patterns = OrderedDict()
+    for target in targets:
+        dst_name, sep, pattern = target.partition('=')
+        if not sep or not dst_name:
+            raise ValueError("Invalid target '%s': it should be of the form NAME=PATTERN" % target)
+        dst_patterns[dst_name] = pattern
+    return dst_patterns
+
+
+def _add_search_options(parser  # type: argparse.ArgumentParser
+                        ):
+    """Adds the arguments common to all commands: the rule and the search options"""
+    parser.add_argument('src_pattern', help="the source pattern, such as './defs/**/*.ddl'")
+    parser.add_argument('dst_pattern', nargs='?', default=None,
+                        help="the destination pattern, such as './downloaded/%%%%/%%.csv'")
+    parser.add_argument('-t', '--target', action='append', dest='targets', metavar='NAME=PATTERN',
+                        help="a named destination pattern, for rules with several targets. Can be repeated")
+    parser.add_argument('--names', default=None, help="the naming pattern of the items")
+    parser.add_argument('--engine', default=None, help="the walk engine to use, such as 'scandir' or 'git'")
+    parser.add_argument('--cache', default=None, help="a persistent cache file of folder listings")
+    parser.add_argument('--workers', type=int, default=None, help="number of threads listing folders concurrently")
+    parser.add_argument('--processes', type=int, default=None, help="number of processes searching the files")
+    parser.add_argument('--unordered', action='store_true',
+                        help="with --workers or --processes, yield the items as soon as they are found")
+    parser.add_argument('--paths', default=None,
+                        help="a manifest file of candidate paths to match instead of searching the file system")
+
+
+def _search_options(opts  # type: argparse.Namespace
+                    ):
+    """Returns the search options from the parsed command line arguments"""
+    return dict(engine=opts.engine, cache=opts.cache, workers=opts.workers, ordered=not opts.unordered,
+                processes=opts.processes, paths=opts.paths)
+
+
+def _list(opts  # type: argparse.Namespace
+          ):
+    """The `list` command: exports the items of the rule"""
+    from .export import export_matches
+    fields = None if opts.fields is None else [f.strip() for f in opts.fields.split(',')]
+    export_matches(opts.src_pattern, _targets(opts.dst_pattern, opts.targets), out=opts.output,
+                   format='nul' if opts.null else opts.format, fields=fields, names=opts.names,
+                   **_search_options(opts))
+
+
+def _run(opts  # type: argparse.Namespace
+         ):
+    """The `run` command: runs the command for each item to build"""
+    from .run import run_rule
+    if not opts.command:
+        raise ValueError("The command to run should be provided after `--`")
+    # a single argument is run by the shell, so that pipes and redirections can be used
+    command = opts.command[0] if len(opts.command) == 1 else opts.command
+    run_rule(opts.src_pattern, _targets(opts.dst_pattern, opts.targets), command, names=opts.names, jobs=opts.jobs,
+             force=opts.always_make, dry_run=opts.dry_run, **_search_options(opts))
+
+
+def main(args=None  # type: List[str]
+         ):
+    from .export import FORMATS, FIELDS
+
+    # the command to run is everything after `--`
+    args = sys.argv[1:] if args is None else list(args)
+    command = None
+    if '--' in args:
+        command = args[args.index('--') + 1:]
+        args = args[:args.index('--')]
+
+    parser = argparse.ArgumentParser(prog='fprules', description="File pattern rules for build tools.")
+    commands = parser.add_subparsers(dest='subcommand', metavar='command')
+    commands.required = True
+
+    list_parser = commands.add_parser('list', help="stream the items of a rule as JSON lines, TSV or null-separated "
+                                                   "records")
+    _add_search_options(list_parser)
+    list_parser.add_argument('-f', '--format', choices=FORMATS, default='jsonl', help="the format of the records")
+    list_parser.add_argument('-0', '--null', action='store_true', help="same as --format nul")
+    list_parser.add_argument('--fields', default=None,
+                             help="comma-separated fields to export, among %s" % ', '.join(FIELDS))
+    list_parser.add_argument('-o', '--output', default=None, help="the file where to write the records (default: "
+                                                                  "the standard output)")
+    list_parser.set_defaults(func=_list)
+
+    run_parser = commands.add_parser('run', help="run a command for each item whose destinations are missing or "
+                                                 "older than the source, as make")
+    _add_search_options(run_parser)
+    run_parser.add_argument('-j', '--jobs', type=int, default=1, help="number of commands to run at the same time")
+    run_parser.add_argument('-B', '--always-make', action='store_true', help="run the command for all items, even "
+                                                                             "the up-to-date ones")
+    run_parser.add_argument('-n', '--dry-run', action='store_true', help="print the commands without running them")
+    run_parser.set_defaults(func=_run)
+
+    opts = parser.parse_args(args)
+    opts.command = command
+    try:
+        return opts.func(opts)
+    except ValueError as e:
+        parser.exit(2, "fprules: error: %s\n" % e)
+    except CalledProcessError as e:
+        parser.exit(1, "fprules: error: command %r failed with exit code %s\n" % (e.cmd, e.returncode))
+    except IOError as e:
+        if e.errno != errno.EPIPE:
+            parser.exit(1, "fprules: error: %s\n" % e)
+        # the consumer stopped reading, for example `head`: silence the error when the interpreter exits
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
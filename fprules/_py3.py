@@ -0,0 +1,40 @@
+"""
+Definitions using the python 3 syntax. This module is only imported on python 3.
+"""
+from .main import _legacy_file_pattern
+
+try:
+    from typing import Union, Any, Callable, Iterable, List
+    from .cache import DirListingCache
+    from .main import FileItem
+    from .stats import MatchStats
+    from .fingerprint import HashCache
+except ImportError:
+    pass
+
+
+def file_pattern(src_pattern,           # type: Union[str, Any]
+                 dst_pattern,           # type: Union[str, Any]
+                 *,
+                 names=None,            # type: Union[str, Any]
+                 engine=None,           # type: Union[str, Callable]
+                 cache=None,            # type: Union[str, DirListingCache]
+                 workers=None,          # type: int
+                 ordered=True,          # type: bool
+                 as_table=False,        # type: bool
+                 snapshot=None,         # type: str
+                 only_stale=False,      # type: bool
+                 processes=None,        # type: int
+                 paths=None,            # type: Union[str, Any, Iterable[Union[str, Any]]]
+                 stats=None,            # type: MatchStats
+                 fingerprint=None,      # type: str
+                 hash_cache=None        # type: Union[str, HashCache]
+                 ):
+    # type: (...) -> List[FileItem]
+    return _legacy_file_pattern(src_pattern, dst_pattern, names=names, engine=engine, cache=cache, workers=workers,
+                                ordered=ordered, as_table=as_table, snapshot=snapshot, only_stale=only_stale,
+                                processes=processes, paths=paths, stats=stats, fingerprint=fingerprint,
+                                hash_cache=hash_cache)
+
+
+file_pattern.__doc__ = _legacy_file_pattern.__doc__
@@ -0,0 +1,137 @@
+"""
+asyncio support. This module requires python 3.6+.
+"""
+from threading import Event
+
+from .main import compile_pattern, file_pattern
+
+try:
+    from typing import Union, Any, Callable, AsyncIterator, Iterable
+    from .cache import DirListingCache
+    from .main import FileItem
+    from .stats import MatchStats
+    from .fingerprint import HashCache
+except ImportError:
+    pass
+
+
+# the sentinel marking the end of the producer thread
+_END = object()
+
+
+async def afile_pattern(src_pattern,       # type: Union[str, Any]
+                        dst_pattern,       # type: Union[str, Any]
+                        *,
+                        names=None,        # type: Union[str, Any]
+                        engine=None,       # type: Union[str, Callable]
+                        cache=None,        # type: Union[str, DirListingCache]
+                        workers=None,      # type: int
+                        ordered=True,      # type: bool
+                        as_table=False,    # type: bool
+                        snapshot=None,     # type: str
+                        only_stale=False,  # type: bool
+                        processes=None,    # type: int
+                        paths=None,        # type: Union[str, Any, Iterable[Union[str, Any]]]
+                        stats=None,        # type: MatchStats
+                        fingerprint=None,  # type: str
+                        hash_cache=None,   # type: Union[str, HashCache]
+                        batch_size=256,    # type: int
+                        max_batches=8,     # type: int
+                        executor=None
+                        ):
+    # type: (...) -> AsyncIterator[FileItem]
+    """
+    An asynchronous generator equivalent to `file_pattern`, for asyncio-based build tools. See `file_pattern` for
+    details about the arguments and returned items: all its options are supported, except `as_table` since a table
+    is not streamed.
+
+    The file search runs in a thread of `executor`, so that it does not block the event loop. The matching items are
+    transferred to the event loop in batches: the first batches are small so that the first items are received
+    quickly, and the next ones grow up to `batch_size` items. At most `max_batches` batches are waiting to be consumed:
+    when this limit is reached, the file search pauses until the consumer catches up.
+
+    :param src_pattern: see `file_pattern`
+    :param dst_pattern: see `file_pattern`
+    :param names: see `file_pattern`
+    :param engine: see `file_pattern`
+    :param cache: see `file_pattern`
+    :param workers: see `file_pattern`
+    :param ordered: see `file_pattern`
+    :param as_table: not supported, a `ValueError` is raised if True. Use `file_pattern` in an executor instead.
+    :param snapshot: see `file_pattern`
+    :param only_stale: see `file_pattern`
+    :param processes: see `file_pattern`
+    :param paths: see `file_pattern`
+    :param stats: see `file_pattern`
+    :param fingerprint: see `file_pattern`
+    :param hash_cache: see `file_pattern`
+    :param batch_size: the maximum number of items transferred at once to the event loop
+    :param max_batches: the maximum number of batches waiting to be consumed
+    :param executor: the `concurrent.futures.Executor` to use to run the file search. The default `None` uses the
+        default executor of the event loop.
+    :return: an asynchronous generator of `FileItem`
+    """
+    if batch_size < 1 or max_batches < 1:
+        raise ValueError("`batch_size` and `max_batches` should be positive integers")
+    if as_table:
+        raise ValueError("`as_table` is not supported by `afile_pattern`: a table is not streamed")
+
+    # imported here so that importing fprules does not import asyncio
+    import asyncio
+
+    # compile first so that invalid patterns raise here
+    compile_pattern(src_pattern, dst_pattern, names=names)
+
+    # python 3.6 has no `get_running_loop`
+    loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)()
+    queue = asyncio.Queue(maxsize=max_batches)
+    stop = Event()
+
+    def put(batch):
+        """Put a batch in the queue from the producer thread, waiting while the queue is full"""
+        asyncio.run_coroutine_threadsafe(queue.put(batch), loop).result()
+
+    def produce():
+        """Runs the file search in the producer thread"""
+        size = 1
+        batch = []
+        items = None
+        try:
+            items = file_pattern(src_pattern, dst_pattern, names=names, engine=engine, cache=cache, workers=workers,
+                                 ordered=ordered, snapshot=snapshot, only_stale=only_stale, processes=processes,
+                                 paths=paths, stats=stats, fingerprint=fingerprint, hash_cache=hash_cache)
+            for item in items:
+                batch.append(item)
+                if len(batch) >= size:
+                    if stop.is_set():
+                        return
+                    put(batch)
+                    batch = []
+                    size = min(size * 2, batch_size)
+            if batch and not stop.is_set():
+                put(batch)
+        except BaseException as e:
+            if not stop.is_set():
+                put(e)
+        finally:
+            if items is not None:
+                items.close()
+            if not stop.is_set():
+                put(_END)
+
+    producer = loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is _END:
+                break
+            elif isinstance(batch, BaseException):
+                raise batch
+            for item in batch:
+                yield item
+    finally:
+        # stop the producer, and unblock it if it is waiting for space in the queue
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+        await producer
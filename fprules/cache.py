@@ -0,0 +1,236 @@
+"""
+A persistent cache of folder listings, used by the scandir walk engine to avoid listing unchanged folders again.
+"""
+import os
+from os.path import abspath
+from threading import Lock
+from time import time
+
+from .walk import list_dir, _entry_is_dir, _mtime_ns, _IGNORED_ERRNOS
+
+try:
+    from typing import Optional, List, Any, Union, Tuple
+except ImportError:
+    pass
+
+
+# the version of the database schema, stored in sqlite's `user_version`
+_SCHEMA_VERSION = 1
+
+# folders modified less than this number of seconds before being listed are not stored: they could be modified again
+# within the file system mtime granularity (up to 2s on some network file systems) without their mtime changing.
+RACY_DELAY = 2.0
+
+# the bit flags used to store the kind of each entry
+_KIND_DIR, _KIND_SYMLINK = 1, 2
+
+_fsencode = getattr(os, 'fsencode', lambda s: s)
+_fsdecode = getattr(os, 'fsdecode', lambda s: s)
+
+
+def _connect(path,     # type: str
+             timeout,  # type: float
+             table,    # type: str
+             columns,  # type: str
+             version   # type: int
+             ):
+    """
+    Opens the sqlite database file `path` shared by concurrent processes, and creates `table` with `columns` if the
+    schema version stored in `user_version` is not `version` (dropping the table of a previous version).
+
+    The schema is checked again and created in a single `BEGIN IMMEDIATE` transaction, so that several processes
+    opening a new file at the same time do not all try to create the table.
+
+    :param path: the path of the database file. It is created if needed.
+    :param timeout: the number of seconds to wait for a lock held by another process
+    :param table: the name of the table
+    :param columns: the definition of the columns of the table, as in `CREATE TABLE`
+    :param version: the version of the schema
+    :return: the connection, that can be used from several threads
+    """
+    # imported here since importing sqlite3 is slow, and the caches are optional
+    import sqlite3
+
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] == version:
+            return conn
+
+        # the transaction is handled explicitly: in its default mode the driver may commit before DDL statements
+        isolation_level = conn.isolation_level
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # read again with the lock held: another process may have created the schema in the meantime
+                if conn.execute("PRAGMA user_version").fetchone()[0] != version:
+                    conn.execute("DROP TABLE IF EXISTS %s" % table)
+                    conn.execute("CREATE TABLE IF NOT EXISTS %s (%s)" % (table, columns))
+                    conn.execute("PRAGMA user_version = %d" % version)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.isolation_level = isolation_level
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+class CachedDirEntry(object):
+    """
+    A lightweight equivalent of `os.DirEntry` for the folder entries read from a `DirListingCache`.
+    """
+    __slots__ = ('name', 'path', '_kind')
+
+    def __init__(self, dir_path, name, kind):
+        self.name = name
+        self.path = os.path.join(dir_path, name)
+        self._kind = kind
+
+    def is_dir(self, follow_symlinks=True):
+        if follow_symlinks or not (self._kind & _KIND_SYMLINK):
+            return bool(self._kind & _KIND_DIR)
+        else:
+            return False
+
+    def is_symlink(self):
+        return bool(self._kind & _KIND_SYMLINK)
+
+    def stat(self, follow_symlinks=True):
+        return os.stat(self.path) if follow_symlinks else os.lstat(self.path)
+
+    def __repr__(self):
+        return "<CachedDirEntry %r>" % self.name
+
+
+class DirListingCache(object):
+    """
+    A persistent cache of folder listings, stored in a sqlite database file.
+
+    Each listing is stored with the modification time of the folder, and is reused as long as the folder's
+    modification time does not change. Since creating, removing or renaming an entry in a folder updates its
+    modification time, a single `stat` is then needed instead of a full listing for each unchanged folder.
+
+    New listings are written in a single transaction when `flush()` or `close()` is called. sqlite locking makes it
+    safe to share the same cache file between concurrent processes: if the database is locked for too long by
+    another process, the new listings are simply not stored.
+
+    It can be used as a context manager.
+    """
+    __slots__ = ('path', '_conn', '_lock', '_pending')
+
+    def __init__(self,
+                 path,         # type: str
+                 timeout=10.0  # type: float
+                 ):
+        """
+        :param path: the path of the cache database file. It is created if needed.
+        :param timeout: the number of seconds to wait for a lock held by another process
+        """
+        self.path = str(path)
+        self._lock = Lock()
+        self._pending = {}
+        self._conn = _connect(self.path, timeout, 'listings',
+                              "path TEXT PRIMARY KEY, mtime INTEGER, names BLOB, kinds BLOB", _SCHEMA_VERSION)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def list_dir(self,
+                 dir_path  # type: str
+                 ):
+        # type: (...) -> Optional[List[Any]]
+        """
+        A folder lister with the same contract than `fprules.walk.list_dir`, using the cached listing when the
+        folder did not change.
+
+        :param dir_path: the string path of the folder to list
+        :return: the list of entries in the folder, or None if the folder does not exist or can not be read.
+        """
+        return self._list_dir(dir_path)[0]
+
+    def _list_dir(self,
+                  dir_path  # type: str
+                  ):
+        # type: (...) -> Tuple[Optional[List[Any]], bool, int]
+        """
+        Implementation of `list_dir`, returning a tuple (entries, cached, fs_calls) where `cached` indicates if the
+        listing was read from the cache, and `fs_calls` is the number of system calls made.
+        """
+        try:
+            dir_stat = os.stat(dir_path)
+        except OSError as e:
+            if e.errno in _IGNORED_ERRNOS:
+                return None, False, 1
+            raise
+
+        mtime = _mtime_ns(dir_stat)
+
+        key = abspath(dir_path)
+        with self._lock:
+            row = self._conn.execute("SELECT mtime, names, kinds FROM listings WHERE path = ?", (key,)).fetchone()
+
+        if row is not None and row[0] == mtime:
+            # unchanged folder: use the cached listing
+            _, names, kinds = row
+            if not names:
+                return [], True, 1
+            return [CachedDirEntry(dir_path, name, kind)
+                    for name, kind in zip(_fsdecode(bytes(names)).split('\0'), bytearray(kinds))], True, 1
+
+        # list the folder
+        entries = list_dir(dir_path)
+        if entries is None:
+            return None, False, 2
+
+        if time() - dir_stat.st_mtime > RACY_DELAY:
+            kinds = bytearray((_KIND_DIR if _entry_is_dir(e) else 0) | (_KIND_SYMLINK if e.is_symlink() else 0)
+                              for e in entries)
+            names = _fsencode('\0'.join(e.name for e in entries))
+            from sqlite3 import Binary
+            with self._lock:
+                self._pending[key] = (mtime, Binary(names), Binary(bytes(kinds)))
+
+        return entries, False, 2
+
+    def flush(self):
+        """Writes the new listings to the database file"""
+        import sqlite3
+        with self._lock:
+            if not self._pending:
+                return
+            rows = [(k, m, n, kd) for k, (m, n, kd) in self._pending.items()]
+            self._pending = {}
+            try:
+                with self._conn:
+                    self._conn.executemany("INSERT OR REPLACE INTO listings (path, mtime, names, kinds) "
+                                           "VALUES (?, ?, ?, ?)", rows)
+            except sqlite3.OperationalError:
+                # the database is locked by another process: this is only a cache, skip.
+                pass
+
+    def close(self):
+        """Writes the new listings to the database file and closes it"""
+        self.flush()
+        self._conn.close()
+
+
+def get_cache(cache  # type: Union[str, DirListingCache]
+              ):
+    """
+    Returns a tuple (cache, should_close) where `cache` is a `DirListingCache` corresponding to `cache`, and
+    `should_close` is True if it was created here.
+
+    :param cache: a `DirListingCache` instance, or the path to a cache database file.
+    :return:
+    """
+    if isinstance(cache, DirListingCache):
+        return cache, False
+    else:
+        return DirListingCache(cache), True
@@ -0,0 +1,150 @@
+"""
+Incremental mode: compare the matches of a rule with a snapshot saved during a previous run, and only report changes.
+"""
+import os
+
+from .main import FileItem, _gen_matching_strs
+from .walk import EntriesMemo, _mtime_ns
+
+try:
+    from typing import Dict, Tuple, Iterable, Optional
+    from .main import FilePattern
+except ImportError:
+    pass
+
+
+# the change status of items
+ADDED = 'added'
+MODIFIED = 'modified'
+REMOVED = 'removed'
+
+# the version of the snapshot file format
+_SNAPSHOT_VERSION = 1
+
+
+class ChangedFileItem(FileItem):
+    """
+    A `FileItem` with an additional `change` attribute, equal to `ADDED`, `MODIFIED` or `REMOVED`.
+    """
+    __slots__ = ('change',)
+
+    def __init__(self,
+                 pattern,           # type: FilePattern
+                 src_str,           # type: str
+                 captured_subpath,  # type: Optional[str]
+                 change             # type: str
+                 ):
+        super(ChangedFileItem, self).__init__(pattern, src_str, captured_subpath)
+        self.change = change
+
+    def __reduce__(self):
+        return ChangedFileItem, (self.pattern, self.src_str, self.captured_subpath, self.change)
+
+    def __repr__(self):
+        return "%s (%s)" % (self, self.change)
+
+
+def load_snapshot(snapshot_file,  # type: str
+                  pattern         # type: FilePattern
+                  ):
+    # type: (...) -> Dict[str, Tuple[int, int]]
+    """
+    Loads the snapshot saved for `pattern` in `snapshot_file`.
+
+    :param snapshot_file: the path to the snapshot file
+    :param pattern: the compiled pattern
+    :return: a dictionary containing the (mtime in ns, size) of each source path. It is empty if the file does not
+        exist or was created for another source pattern.
+    """
+    import pickle
+    try:
+        with open(snapshot_file, 'rb') as f:
+            version, src_pattern, files = pickle.load(f)
+    except (IOError, OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return dict()
+
+    if version != _SNAPSHOT_VERSION or src_pattern != str(pattern.src_pattern):
+        return dict()
+    return files
+
+
+def save_snapshot(snapshot_file,  # type: str
+                  pattern,        # type: FilePattern
+                  files           # type: Dict[str, Tuple[int, int]]
+                  ):
+    """
+    Saves the snapshot of `pattern` in `snapshot_file`. The file is replaced atomically, so that concurrent readers
+    see either the previous or the new snapshot.
+
+    :param snapshot_file: the path to the snapshot file
+    :param pattern: the compiled pattern
+    :param files: a dictionary containing the (mtime in ns, size) of each source path
+    """
+    import pickle
+    from tempfile import NamedTemporaryFile
+
+    snapshot_dir = os.path.dirname(os.path.abspath(snapshot_file))
+    with NamedTemporaryFile(dir=snapshot_dir, prefix='.fprules-', delete=False) as f:
+        pickle.dump((_SNAPSHOT_VERSION, str(pattern.src_pattern), files), f, protocol=pickle.HIGHEST_PROTOCOL)
+    try:
+        os.replace(f.name, snapshot_file)
+    except AttributeError:
+        # python 2: no atomic replace on windows
+        os.rename(f.name, snapshot_file)
+
+
+def _signature(st  # type: Optional[os.stat_result]
+               ):
+    # type: (...) -> Optional[Tuple[int, int]]
+    """Return the (mtime in ns, size) of stat result `st`, or None if the file does not exist anymore"""
+    if st is None:
+        return None
+    return _mtime_ns(st), st.st_size
+
+
+def gen_changed_items(pattern,        # type: FilePattern
+                      snapshot_file,  # type: str
+                      update=True,    # type: bool
+                      **walk_options
+                      ):
+    # type: (...) -> Iterable[ChangedFileItem]
+    """
+    Lists all files matching the source pattern of `pattern` and only yields the items whose source was added,
+    modified (its modification time or size changed) or removed since the snapshot saved in `snapshot_file`. Removed
+    items are yielded last.
+
+    Each matching source is checked with a single `stat`, or none at all when the walk listings provide it (on
+    windows). Combine with the `cache` walk option to avoid listing again
+    the folders that did not change.
+
+    :param pattern: the compiled pattern
+    :param snapshot_file: the path to the snapshot file. It does not need to exist.
+    :param update: if True (default), the snapshot file is updated once all items have been yielded.
+    :param walk_options: the walk options, see `FilePattern.iter`
+    :return: a generator of `ChangedFileItem`
+    """
+    previous = load_snapshot(snapshot_file, pattern)
+    current = dict()
+    entries = EntriesMemo()
+
+    for src_str, captured_subpath in _gen_matching_strs(pattern.src_pattern, pattern.src_glob_start,
+                                                        pattern.src_double_wildcard, pattern.src_suffix_matchers,
+                                                        entries=entries, **walk_options):
+        signature = _signature(entries.stat(src_str))
+        if signature is None:
+            # removed during the search
+            continue
+        current[src_str] = signature
+
+        previous_signature = previous.pop(src_str, None)
+        if previous_signature is None:
+            yield ChangedFileItem(pattern, src_str, captured_subpath, ADDED)
+        elif previous_signature != signature:
+            yield ChangedFileItem(pattern, src_str, captured_subpath, MODIFIED)
+
+    for src_str in previous:
+        item = pattern._expand_str(src_str)
+        yield ChangedFileItem(pattern, src_str, item.captured_subpath, REMOVED)
+
+    if update:
+        save_snapshot(snapshot_file, pattern, current)
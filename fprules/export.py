@@ -0,0 +1,235 @@
+"""
+Streaming export of the items of a file pattern rule as JSON lines, tab-separated values or null-separated records, for
+consumers written in other languages.
+"""
+import io
+import sys
+from itertools import groupby
+from os import sep
+
+from .main import compile_pattern, _gen_matching_strs, _dst_templates, _normalize, _stem
+
+try:
+    from typing import Union, Any, Optional, Sequence, Callable, List, Tuple, IO
+except ImportError:
+    pass
+
+
+# the supported export formats
+FORMATS = ('jsonl', 'tsv', 'nul')
+
+# the fields that can be exported
+FIELDS = ('name', 'src_path', 'dst_path', 'captured_subpath')
+
+# the size (in characters) of the chunks of records written at once
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+def export_matches(src_pattern,                     # type: Union[str, Any]
+                   dst_pattern=None,                # type: Union[str, Any]
+                   out=None,                        # type: Union[str, IO]
+                   format='jsonl',                  # type: str
+                   fields=None,                     # type: Sequence[str]
+                   names=None,                      # type: Union[str, Any]
+                   buffer_size=DEFAULT_BUFFER_SIZE,  # type: int
+                   **search_options
+                   ):
+    # type: (...) -> int
+    """
+    Writes the items of the rule `(src_pattern, dst_pattern)` to `out` as they are found, one record per item, so
+    that the results can be consumed by other programs. For example `xargs -0` with the `'nul'` format.
+
+    Records are formatted directly from the string paths found by the search, without creating `FileItem` or `Path`
+    objects, and written in chunks of about `buffer_size` characters: the list of items is never held in memory.
+
+    Paths always use forward slashes, as in `Path.as_posix()`. Three formats are available:
+
+     - `'jsonl'`: one JSON object per line, such as `{"name":"a","src_path":"defs/a.ddl","dst_path":"out/a.csv"}`.
+       When `dst_pattern` is a dictionary, `"dst_path"` is an object with one entry per target. The output is pure
+       ASCII.
+     - `'tsv'`: one line per item with the fields separated by tabulations, and one column per target when
+       `dst_pattern` is a dictionary. Backslashes, tabulations and line breaks in paths are escaped as `\\\\`, `\\t`,
+       `\\n` and `\\r`.
+     - `'nul'`: each field is terminated by a null character, as with `find -print0`.
+
+    A missing `captured_subpath` (when the source pattern has no double wildcard) is exported as `null` in JSON, and
+    as an empty string otherwise.
+
+    :param src_pattern: the source pattern, see `file_pattern`
+    :param dst_pattern: the destination pattern or dictionary of destination patterns, see `file_pattern`. If None
+        (default), only the source paths can be exported.
+    :param out: the binary or text stream where to write the records, or the path of a file to create. The default
+        None writes to the standard output.
+    :param format: the format of the records, one of `FORMATS`
+    :param fields: the sequence of fields to export, among `FIELDS`. The default is `('name', 'src_path',
+        'dst_path')`, or `('src_path',)` if `dst_pattern` is None.
+    :param names: the naming pattern, see `file_pattern`
+    :param buffer_size: the approximate number of characters written at once
+    :param search_options: the search options such as `engine`, `cache`, `workers` or `paths`, see `FilePattern.iter`
+    :return: the number of records written
+    """
+    # -- validate the parameters
+    if format not in FORMATS:
+        raise ValueError("Unknown format '%s'. Available formats: %s" % (format, ', '.join(FORMATS)))
+    if fields is None:
+        fields = ('src_path',) if dst_pattern is None else ('name', 'src_path', 'dst_path')
+    fields = tuple(fields)
+    for field in fields:
+        if field not in FIELDS:
+            raise ValueError("Unknown field '%s'. Available fields: %s" % (field, ', '.join(FIELDS)))
+        if fields.count(field) > 1:
+            raise ValueError("Field '%s' is exported twice" % field)
+        if dst_pattern is None and field in ('name', 'dst_path'):
+            raise ValueError("Field '%s' can not be exported without a destination pattern" % field)
+    if buffer_size < 1:
+        raise ValueError("`buffer_size` should be a positive integer")
+
+    # the destination is only used to validate the source pattern when not provided
+    pattern = compile_pattern(src_pattern, '%' if dst_pattern is None else dst_pattern, names=names)
+    columns, keys = _columns(pattern, fields)
+    template, encode = _record_format(format, keys)
+    needs_stem = any(field in ('name', 'dst_path') for field in fields)
+
+    # -- open the output stream
+    should_close = False
+    if out is None:
+        out = getattr(sys.stdout, 'buffer', sys.stdout)
+    elif not hasattr(out, 'write'):
+        out = open(str(out), 'wb')
+        should_close = True
+    write = _chunk_writer(out)
+
+    # -- search and write the records in chunks
+    nb = 0
+    chunk = []
+    size = 0
+    try:
+        matches = _gen_matching_strs(pattern.src_pattern, pattern.src_glob_start, pattern.src_double_wildcard,
+                                     pattern.src_suffix_matchers, **search_options)
+        for src_str, captured_subpath in matches:
+            stem = _stem(src_str) if needs_stem else None
+            record = template % tuple(encode(column(src_str, stem, captured_subpath)) for column in columns)
+            chunk.append(record)
+            size += len(record)
+            nb += 1
+            if size >= buffer_size:
+                write(''.join(chunk))
+                chunk = []
+                size = 0
+        if chunk:
+            write(''.join(chunk))
+        out.flush()
+    finally:
+        if should_close:
+            out.close()
+
+    return nb
+
+
+def _columns(pattern,  # type: FilePattern
+             fields    # type: Sequence[str]
+             ):
+    # type: (...) -> Tuple[List[Callable], List[Tuple[str, Optional[str]]]]
+    """
+    Returns the list of functions computing the posix string of each exported column from the source path string,
+    its stem and the captured path, and the list of (field, target name) of each column. The target name is None
+    except for the `'dst_path'` columns of a pattern with multiple targets.
+    """
+    columns = []
+    keys = []
+    for field in fields:
+        if field == 'src_path':
+            columns.append(_posix_column(lambda src_str, stem, captured_subpath: src_str))
+            keys.append((field, None))
+        elif field == 'captured_subpath':
+            columns.append(_posix_column(lambda src_str, stem, captured_subpath: captured_subpath))
+            keys.append((field, None))
+        elif field == 'name':
+            columns.append(_template_column(pattern.names_template))
+            keys.append((field, None))
+        elif pattern.has_multi_targets:
+            for dst_name, template in zip(pattern.dst_keys, _dst_templates(pattern)):
+                columns.append(_template_column(template))
+                keys.append((field, dst_name))
+        else:
+            columns.append(_template_column(pattern.dst_templates))
+            keys.append((field, None))
+    return columns, keys
+
+
+def _posix_column(column  # type: Callable
+                  ):
+    # type: (...) -> Callable
+    """Returns `column`, converting the path strings it returns to posix paths if needed"""
+    if sep == '/':
+        return column
+
+    def posix_column(src_str, stem, captured_subpath):
+        path_str = column(src_str, stem, captured_subpath)
+        return None if path_str is None else path_str.replace(sep, '/')
+    return posix_column
+
+
+def _template_column(template  # type: str
+                     ):
+    # type: (...) -> Callable
+    """Returns the function computing the posix path string created with compiled template `template`"""
+    return _posix_column(lambda src_str, stem, captured_subpath: _normalize(template.format(stem, captured_subpath)))
+
+
+def _record_format(format,  # type: str
+                   keys     # type: List[Tuple[str, Optional[str]]]
+                   ):
+    # type: (...) -> Tuple[str, Callable[[Optional[str]], str]]
+    """
+    Returns the `%`-format string of a record in `format` with one `%s` per column, and the function encoding each
+    column value before it is inserted in the record.
+    """
+    if format == 'jsonl':
+        from json.encoder import encode_basestring_ascii
+
+        def encode(value):
+            return 'null' if value is None else encode_basestring_ascii(value)
+
+        members = []
+        for field, group in groupby(keys, key=lambda k: k[0]):
+            dst_names = [dst_name for _, dst_name in group]
+            if dst_names[0] is None:
+                members.append('%s:%%s' % encode_basestring_ascii(field))
+            else:
+                # one object for all the targets
+                members.append('%s:{%s}' % (encode_basestring_ascii(field),
+                                            ','.join('%s:%%s' % encode_basestring_ascii(dst_name).replace('%', '%%')
+                                                     for dst_name in dst_names)))
+        return '{%s}\n' % ','.join(members), encode
+
+    elif format == 'tsv':
+        def encode(value):
+            if value is None:
+                return ''
+            elif '\\' in value or '\t' in value or '\n' in value or '\r' in value:
+                return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+            return value
+
+        return '\t'.join(['%s'] * len(keys)) + '\n', encode
+
+    else:
+        def encode(value):
+            return '' if value is None else value
+
+        return '%s\0' * len(keys), encode
+
+
+def _chunk_writer(out  # type: IO
+                  ):
+    # type: (...) -> Callable[[str], Any]
+    """Returns a function writing a string chunk to `out`, encoding it first if `out` is a binary stream"""
+    if isinstance(out, io.TextIOBase):
+        return out.write
+
+    def write(chunk):
+        if not isinstance(chunk, bytes):
+            # paths that could not be decoded with the file system encoding are written back as they were
+            chunk = chunk.encode('utf-8', 'surrogateescape')
+        out.write(chunk)
+    return write
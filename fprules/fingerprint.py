@@ -0,0 +1,300 @@
+"""
+Content fingerprints of the source files, with a persistent cache of the hashes of the files that did not change.
+"""
+import os
+from collections import deque
+from errno import ENOENT, ENOTDIR
+from mmap import mmap, ACCESS_READ
+from os.path import abspath
+from stat import S_ISREG
+from threading import Lock
+from time import time
+
+from .cache import RACY_DELAY, _connect
+from .main import FileItem
+from .walk import _mtime_ns
+
+try:
+    from typing import Optional, Union, Iterable, Callable, Any, Tuple
+    from .main import FilePattern
+except ImportError:
+    pass
+
+
+# the supported hash algorithms. 'xxhash' requires the `xxhash` package.
+HASH_ALGORITHMS = ('sha256', 'xxhash')
+
+# the size of the blocks read at once when hashing a file
+READ_SIZE = 1 << 20
+
+# files larger than this size (in bytes) are memory-mapped and hashed at once instead of being read by blocks
+MMAP_THRESHOLD = 16 << 20
+
+# the version of the database schema, stored in sqlite's `user_version`
+_SCHEMA_VERSION = 1
+
+# the errors meaning that a source file was removed since it was found
+_MISSING_ERRNOS = (ENOENT, ENOTDIR)
+
+
+def _hash_factory(algorithm  # type: str
+                  ):
+    # type: (...) -> Tuple[str, Callable[[], Any]]
+    """
+    Returns the name of the hash function used for `algorithm`, stored in the hash caches, and the function creating a
+    new hash object.
+    """
+    if algorithm == 'sha256':
+        from hashlib import sha256
+        return 'sha256', sha256
+    elif algorithm == 'xxhash':
+        try:
+            import xxhash
+        except ImportError:
+            raise ImportError("fingerprint='xxhash' requires the `xxhash` package")
+        # the 128-bit XXH3 is much faster than the others on large inputs, but only in recent versions
+        if hasattr(xxhash, 'xxh3_128'):
+            return 'xxh3_128', xxhash.xxh3_128
+        return 'xxh64', xxhash.xxh64
+    else:
+        raise ValueError("Unknown hash algorithm '%s'. Available algorithms: %s"
+                         % (algorithm, ', '.join(HASH_ALGORITHMS)))
+
+
+def hash_file(path_str,           # type: str
+              algorithm='sha256'  # type: Union[str, Callable[[], Any]]
+              ):
+    # type: (...) -> str
+    """
+    Returns the hexadecimal digest of the contents of file `path_str`. Large files are memory-mapped and hashed at
+    once, smaller ones are read by large blocks. Hash functions release the GIL on large buffers, so that several
+    files can be hashed concurrently by threads.
+
+    :param path_str: the path of the file
+    :param algorithm: one of `HASH_ALGORITHMS`, or a function creating a new hash object
+    :return:
+    """
+    h = (_hash_factory(algorithm)[1] if isinstance(algorithm, str) else algorithm)()
+    with open(path_str, 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+            m = mmap(f.fileno(), 0, access=ACCESS_READ)
+            try:
+                h.update(m)
+            finally:
+                m.close()
+        else:
+            for block in iter(lambda: f.read(READ_SIZE), b''):
+                h.update(block)
+    return h.hexdigest()
+
+
+def _regular_stat(path_str  # type: str
+                  ):
+    # type: (...) -> Optional[os.stat_result]
+    """
+    Returns the `stat` of `path_str` if it is a regular file, or None if it does not exist anymore or is something else
+    such as a folder. Opening a named pipe to hash it could block forever.
+    """
+    try:
+        st = os.stat(path_str)
+    except OSError as e:
+        if e.errno in _MISSING_ERRNOS:
+            return None
+        raise
+    return st if S_ISREG(st.st_mode) else None
+
+
+class HashCache(object):
+    """
+    A persistent cache of file hashes, stored in a sqlite database file.
+
+    Each hash is stored with the size, modification time and inode of the file, and is reused as long as none of them
+    changes. As for `fprules.cache.DirListingCache`, files modified less than `RACY_DELAY` seconds before being hashed
+    are not stored, new hashes are written in a single transaction when `flush()` or `close()` is called, and the same
+    cache file can be shared between concurrent processes.
+
+    It can be used as a context manager.
+    """
+    __slots__ = ('path', '_conn', '_lock', '_pending')
+
+    def __init__(self,
+                 path,         # type: str
+                 timeout=10.0  # type: float
+                 ):
+        """
+        :param path: the path of the cache database file. It is created if needed.
+        :param timeout: the number of seconds to wait for a lock held by another process
+        """
+        self.path = str(path)
+        self._lock = Lock()
+        self._pending = {}
+        self._conn = _connect(self.path, timeout, 'hashes', "path TEXT, algorithm TEXT, size INTEGER, mtime INTEGER, "
+                              "inode INTEGER, digest TEXT, PRIMARY KEY (path, algorithm)", _SCHEMA_VERSION)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def hash_file(self,
+                  path_str,           # type: str
+                  algorithm='sha256'  # type: str
+                  ):
+        # type: (...) -> Optional[str]
+        """
+        Returns the hexadecimal digest of the contents of file `path_str`, using the cached one when the file did not
+        change. It can be called from several threads.
+
+        :param path_str: the path of the file
+        :param algorithm: one of `HASH_ALGORITHMS`
+        :return: the digest, or None if the file does not exist anymore or is not a regular file (e.g. a folder)
+        """
+        hash_name, new_hash = _hash_factory(algorithm)
+        st = _regular_stat(path_str)
+        if st is None:
+            return None
+        # inodes can use all 64 bits, while sqlite integers are signed
+        signature = (st.st_size, _mtime_ns(st), st.st_ino & 0x7fffffffffffffff)
+
+        key = abspath(path_str)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime, inode, digest FROM hashes WHERE path = ? AND algorithm = ?",
+                                     (key, hash_name)).fetchone()
+        if row is not None and tuple(row[:3]) == signature:
+            return row[3]
+
+        digest = hash_file(path_str, new_hash)
+        if time() - st.st_mtime > RACY_DELAY:
+            with self._lock:
+                self._pending[(key, hash_name)] = signature + (digest,)
+        return digest
+
+    def flush(self):
+        """Writes the new hashes to the database file"""
+        import sqlite3
+        with self._lock:
+            if not self._pending:
+                return
+            rows = [k + v for k, v in self._pending.items()]
+            self._pending = {}
+            try:
+                with self._conn:
+                    self._conn.executemany("INSERT OR REPLACE INTO hashes (path, algorithm, size, mtime, inode, "
+                                           "digest) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            except sqlite3.OperationalError:
+                # the database is locked by another process: this is only a cache, skip.
+                pass
+
+    def close(self):
+        """Writes the new hashes to the database file and closes it"""
+        self.flush()
+        self._conn.close()
+
+
+class FingerprintedFileItem(FileItem):
+    """
+    A `FileItem` with an additional `fingerprint` attribute, the hexadecimal digest of the contents of its source.
+    """
+    __slots__ = ('fingerprint',)
+
+    def __init__(self,
+                 pattern,           # type: FilePattern
+                 src_str,           # type: str
+                 captured_subpath,  # type: Optional[str]
+                 fingerprint        # type: str
+                 ):
+        super(FingerprintedFileItem, self).__init__(pattern, src_str, captured_subpath)
+        self.fingerprint = fingerprint
+
+    def __reduce__(self):
+        return FingerprintedFileItem, (self.pattern, self.src_str, self.captured_subpath, self.fingerprint)
+
+    def __repr__(self):
+        return "%s (%s)" % (self, self.fingerprint)
+
+
+def gen_fingerprinted_items(items,               # type: Iterable[FileItem]
+                            algorithm='sha256',  # type: str
+                            hash_cache=None,     # type: Union[str, HashCache]
+                            workers=None         # type: int
+                            ):
+    # type: (...) -> Iterable[FingerprintedFileItem]
+    """
+    Yields a `FingerprintedFileItem` for each item of `items`, in the same order, with the digest of the contents of
+    its source. Sources are hashed concurrently on a pool of `workers` threads while the next items are found, and
+    items whose source does not exist anymore or is not a regular file (a folder matched by the pattern, a pipe...)
+    are skipped.
+
+    :param items: the items, for example `pattern.iter()`
+    :param algorithm: one of `HASH_ALGORITHMS`
+    :param hash_cache: an optional persistent cache of hashes, so that the files that did not change (same size,
+        modification time and inode) are not hashed again. It can be the path to a cache file, or a `HashCache`.
+    :param workers: the number of threads hashing files. The default is the number of processors.
+    :return: a generator of `FingerprintedFileItem`
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    _, new_hash = _hash_factory(algorithm)
+    if workers is None:
+        workers = (os.cpu_count() if hasattr(os, 'cpu_count') else None) or 4
+    elif workers < 1:
+        raise ValueError("`workers` should be a positive integer")
+
+    should_close = False
+    if hash_cache is None:
+        def fingerprint(src_str):
+            if _regular_stat(src_str) is None:
+                return None
+            try:
+                return hash_file(src_str, new_hash)
+            except (IOError, OSError) as e:
+                if e.errno in _MISSING_ERRNOS:
+                    return None
+                raise
+    else:
+        if not isinstance(hash_cache, HashCache):
+            hash_cache, should_close = HashCache(hash_cache), True
+
+        def fingerprint(src_str):
+            try:
+                return hash_cache.hash_file(src_str, algorithm)
+            except (IOError, OSError) as e:
+                if e.errno in _MISSING_ERRNOS:
+                    return None
+                raise
+
+    # a bounded number of files are hashed in advance, and the items are yielded in order
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append((item, pool.submit(fingerprint, item.src_str)))
+            if len(pending) >= 4 * workers:
+                f_item = _fingerprinted(*pending.popleft())
+                if f_item is not None:
+                    yield f_item
+        while pending:
+            f_item = _fingerprinted(*pending.popleft())
+            if f_item is not None:
+                yield f_item
+    finally:
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown()
+        if hash_cache is not None:
+            if should_close:
+                hash_cache.close()
+            else:
+                hash_cache.flush()
+
+
+def _fingerprinted(item,   # type: FileItem
+                   future
+                   ):
+    # type: (...) -> Optional[FingerprintedFileItem]
+    """Returns the `FingerprintedFileItem` for `item` once its fingerprint is computed, or None if it was removed"""
+    digest = future.result()
+    if digest is None:
+        return None
+    return FingerprintedFileItem(item.pattern, item.src_str, item.captured_subpath, digest)
@@ -0,0 +1,317 @@
+"""
+Listing of the files of a git repository from its index file, instead of walking the folders. See the `'git'` walk
+engine in `fprules.walk`.
+"""
+from binascii import hexlify
+from heapq import merge
+from itertools import chain
+from os import sep
+from os.path import abspath, dirname, isabs, isdir, isfile, join, relpath
+from struct import Struct, unpack_from
+from subprocess import check_output
+
+try:
+    from os import fsdecode, fsencode
+except ImportError:
+    # python 2: paths are bytes strings
+    def fsdecode(b):
+        return b
+
+    def fsencode(s):
+        return s
+
+from .walk import compile_glob_regex, _join
+
+try:
+    from typing import Iterable, Tuple, Optional, Callable, List, Any, Dict, Set
+except ImportError:
+    pass
+
+
+# the size of an index entry before its path, without the extended flags
+_ENTRY_HEADER_SIZE = 62
+# the mode and flags fields of an index entry
+_ENTRY_MODE_FLAGS = Struct('>24xI32xH')
+# flags of an index entry
+_EXTENDED_FLAG = 0x4000
+_NAME_MASK = 0xFFF
+# the mode of the directory entries of a sparse index
+_SPARSE_DIR_MODE = 0o040000
+
+
+def find_git_dir(path  # type: str
+                 ):
+    # type: (...) -> Optional[Tuple[str, str]]
+    """
+    Returns a tuple (working tree folder, git folder) for the git repository containing folder `path`, or None if it
+    is not in a git repository. Linked working trees and submodules, where `.git` is a file pointing to the git
+    folder, are supported.
+
+    :param path: the path to a folder
+    :return:
+    """
+    top = abspath(path)
+    while True:
+        dot_git = join(top, '.git')
+        if isdir(dot_git):
+            return top, dot_git
+        elif isfile(dot_git):
+            with open(dot_git) as f:
+                content = f.read().strip()
+            if content.startswith('gitdir:'):
+                git_dir = content[len('gitdir:'):].strip()
+                return top, git_dir if isabs(git_dir) else abspath(join(top, git_dir))
+        parent = dirname(top)
+        if parent == top:
+            return None
+        top = parent
+
+
+def _read_varint(data,  # type: bytes
+                 pos    # type: int
+                 ):
+    # type: (...) -> Tuple[int, int]
+    """Reads the variable-length integer used to compress paths in index version 4, and returns (value, next pos)"""
+    c, = unpack_from('>B', data, pos)
+    pos += 1
+    value = c & 0x7F
+    while c & 0x80:
+        c, = unpack_from('>B', data, pos)
+        pos += 1
+        value = ((value + 1) << 7) | (c & 0x7F)
+    return value, pos
+
+
+def _read_ewah(data,  # type: bytes
+               pos    # type: int
+               ):
+    # type: (...) -> Tuple[Set[int], int]
+    """
+    Reads an EWAH compressed bitmap, as used by the `link` extension of split indexes, and returns (set of the
+    positions of the bits set, next pos).
+    """
+    bit_size, nb_words = unpack_from('>II', data, pos)
+    pos += 8
+    words = unpack_from('>%sQ' % nb_words, data, pos)
+    # the words, and the position of the last run-length word
+    pos += 8 * nb_words + 4
+
+    bits = set()
+    i = word_pos = 0
+    while i < nb_words:
+        # a run-length word: 1 running bit, 32 bits of running length and 31 bits of number of literal words
+        rlw = words[i]
+        i += 1
+        running_length = (rlw >> 1) & 0xFFFFFFFF
+        if rlw & 1:
+            bits.update(range(word_pos * 64, (word_pos + running_length) * 64))
+        word_pos += running_length
+        for literal in words[i:i + (rlw >> 33)]:
+            if literal:
+                bits.update(word_pos * 64 + b for b in range(64) if (literal >> b) & 1)
+            word_pos += 1
+        i += rlw >> 33
+    return set(b for b in bits if b < bit_size), pos
+
+
+def _parse_index(index_file  # type: str
+                 ):
+    # type: (...) -> Tuple[List[Optional[bytes]], Dict[bytes, bytes]]
+    """
+    Parses git index file `index_file` and returns a tuple (entries paths, extensions). The list of paths contains
+    one element per entry, in the order of the index, with None for the folder entries of sparse indexes. Extensions
+    are a dictionary of data by signature.
+    """
+    with open(index_file, 'rb') as f:
+        data = f.read()
+
+    signature, version, nb_entries = unpack_from('>4sII', data, 0)
+    if signature != b'DIRC' or version not in (2, 3, 4):
+        raise ValueError("Unsupported git index file '%s' (version %s)" % (index_file, version))
+
+    pos = 12
+    previous = b''
+    paths = []
+    mode_flags = _ENTRY_MODE_FLAGS.unpack_from
+    for _ in range(nb_entries):
+        mode, flags = mode_flags(data, pos)
+        path_start = pos + _ENTRY_HEADER_SIZE + (2 if flags & _EXTENDED_FLAG else 0)
+
+        if version == 4:
+            # prefix-compressed path, without padding
+            strip, path_start = _read_varint(data, path_start)
+            path_end = data.index(b'\0', path_start)
+            path = previous[:len(previous) - strip] + data[path_start:path_end]
+            pos = path_end + 1
+        else:
+            name_length = flags & _NAME_MASK
+            if name_length == _NAME_MASK:
+                # long path
+                path_end = data.index(b'\0', path_start + name_length)
+            else:
+                path_end = path_start + name_length
+            path = data[path_start:path_end]
+            # entries are padded with 1 to 8 null bytes to a multiple of 8 bytes
+            pos += (path_end - pos + 8) & ~7
+
+        paths.append(path if mode != _SPARSE_DIR_MODE else None)
+        previous = path
+
+    # the extensions, until the final checksum (of 20 bytes, or 32 in sha256 repositories)
+    extensions = dict()
+    while pos + 8 + 20 <= len(data):
+        ext_signature, size = unpack_from('>4sI', data, pos)
+        if pos + 8 + size + 20 > len(data):
+            break
+        extensions[ext_signature] = data[pos + 8:pos + 8 + size]
+        pos += 8 + size
+    return paths, extensions
+
+
+def read_git_index(index_file  # type: str
+                   ):
+    # type: (...) -> Iterable[bytes]
+    """
+    Yields the paths of the entries of git index file `index_file`, in the order of the index (sorted by path). Paths
+    are bytes strings relative to the working tree folder, with forward slashes. Index versions 2, 3 and 4 are
+    supported. Entries in conflict (with several stages) are yielded once, and the folder entries of sparse indexes
+    are skipped.
+
+    Split indexes (see `git update-index --split-index`) are supported: the entries of the shared index file
+    `sharedindex.<hash>` are merged with the ones of `index_file`.
+
+    :param index_file: the path to the index file, usually `.git/index`
+    :return: a generator of bytes paths
+    """
+    paths, extensions = _parse_index(index_file)
+
+    link = extensions.get(b'link')
+    if link is not None:
+        paths = _merge_shared_index(index_file, paths, link)
+
+    previous = None
+    for path in paths:
+        if path is not None and path != previous:
+            yield path
+            previous = path
+
+
+def _merge_shared_index(index_file,  # type: str
+                        paths,       # type: List[Optional[bytes]]
+                        link         # type: bytes
+                        ):
+    # type: (...) -> Iterable[Optional[bytes]]
+    """
+    Returns the sorted paths of the split index `index_file` with `link` extension data `link`, merging the entries
+    of its shared index file that are not deleted with the new entries of `index_file`. Entries of `index_file` that
+    replace an entry of the shared index have an empty path, and are skipped since the path does not change.
+    """
+    # the name of the shared index is a sha1 or a sha256 hash, followed by the optional delete and replace bitmaps
+    git_dir = dirname(index_file)
+    for hash_size in (20, 32):
+        shared_file = join(git_dir, 'sharedindex.%s' % hexlify(link[:hash_size]).decode('ascii'))
+        if isfile(shared_file):
+            break
+    else:
+        if link[:20].strip(b'\0') == b'':
+            # no shared index yet
+            return paths
+        raise ValueError("The shared index of split git index file '%s' was not found" % index_file)
+
+    deleted = _read_ewah(link, hash_size)[0] if len(link) > hash_size else set()
+    shared_paths = (p for i, p in enumerate(_parse_index(shared_file)[0]) if i not in deleted and p is not None)
+    new_paths = (p for p in paths if p)
+    return merge(shared_paths, new_paths)
+
+
+def git_untracked_files(top,       # type: str
+                        subdir=''  # type: str
+                        ):
+    # type: (...) -> List[bytes]
+    """
+    Returns the paths of the untracked files that are not ignored in folder `subdir` of working tree `top`, as
+    bytes strings relative to `top` with forward slashes. This relies on the `git` executable, since it requires
+    the full `.gitignore` rules.
+    """
+    cmd = ['git', 'ls-files', '--others', '--exclude-standard', '-z']
+    if subdir:
+        cmd += ['--', subdir]
+    out = check_output(cmd, cwd=top)
+    return [p for p in out.split(b'\0') if p]
+
+
+def git_walk(root,             # type: str
+             pattern_parts,    # type: Tuple[str, ...]
+             lister=None,      # type: Callable[[str], Optional[List[Any]]]
+             untracked=False,  # type: bool
+             **walk_options
+             ):
+    # type: (...) -> Iterable[str]
+    """
+    Implementation of the `'git'` walk engines. The files of the git index under folder `root`, and the folders
+    containing them, are matched in memory against the glob pattern: no folder is listed. Paths are yielded in the
+    form of `root` (relative or absolute) in the order of the index, with folders before their content.
+
+    Files that are not in the index (untracked or ignored) are not found, unless `untracked` is True: in that case the
+    untracked files that are not ignored are listed with `git ls-files` and yielded after the tracked files. Files
+    deleted from the working tree but still in the index are yielded.
+
+    :param root: the string path of the folder to search. It should be in a git working tree.
+    :param pattern_parts: the tuple of glob pattern parts to match in `root`
+    :param lister: not supported by this engine, should be None
+    :param untracked: a boolean indicating if untracked files that are not ignored should also be listed
+    :param walk_options: no other walk option is supported by this engine
+    :return: a generator of matching string paths
+    """
+    if lister is not None:
+        raise ValueError("The 'git' walk engine does not support custom folder listers")
+    if walk_options:
+        raise ValueError("The 'git' walk engine does not support options %s" % sorted(walk_options))
+
+    found = find_git_dir(root)
+    if found is None:
+        raise ValueError("Folder '%s' is not in a git repository" % root)
+    top, git_dir = found
+
+    # the prefix of the paths located under `root`, relatively to the working tree
+    rel_root = relpath(abspath(root), top)
+    prefix = b'' if rel_root == '.' else fsencode(rel_root.replace(sep, '/')) + b'/'
+    prefix_len = len(prefix)
+
+    paths = read_git_index(join(git_dir, 'index'))
+    if untracked:
+        paths = chain(paths, git_untracked_files(top, rel_root if prefix else ''))
+
+    # decode all the paths located under `root` at once, git paths can not contain null characters
+    paths = [path[prefix_len:] for path in paths if path.startswith(prefix)]
+    if not paths:
+        return
+    paths = fsdecode(b'\0'.join(paths)).split('\0')
+    if sep != '/':
+        paths = [p.replace('/', sep) for p in paths]
+
+    match = compile_glob_regex(pattern_parts).match
+    # the empty relative path of `root` matches the regex of '*', but `root` can only be matched by '**'
+    seen_dirs = set() if all(p == '**' for p in pattern_parts) else {''}
+    # as in `Path.glob`, a trailing '**' only matches folders
+    dirs_only = pattern_parts[-1] == '**'
+    last_dir = None
+    for rel_path in paths:
+        # the folders containing the file, from the first one not seen yet
+        rel_dir = rel_path.rpartition(sep)[0]
+        if rel_dir != last_dir:
+            last_dir = rel_dir
+            new_dirs = []
+            d = rel_dir
+            while d not in seen_dirs:
+                seen_dirs.add(d)
+                new_dirs.append(d)
+                if not d:
+                    break
+                d = d.rpartition(sep)[0]
+            for d in reversed(new_dirs):
+                if match(d) is not None:
+                    yield _join(root, d) if d else root
+
+        if not dirs_only and match(rel_path) is not None:
+            yield _join(root, rel_path)
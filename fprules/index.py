@@ -0,0 +1,271 @@
+"""
+An index of the items of one or several rules, to find the item producing a given target without scanning all items.
+"""
+from collections import OrderedDict
+from os import sep
+from os.path import normcase
+
+from .main import FileItem, file_patterns, _compile_rule, _dst_templates, _normalize, _stem
+
+try:
+    from typing import Union, Any, Iterable, List, Tuple, Dict
+    from .cache import DirListingCache
+    from .main import FilePattern
+except ImportError:
+    pass
+
+
+def _path_parts(path  # type: Union[str, Any]
+                ):
+    # type: (...) -> List[str]
+    """Returns the list of elements of `path` used as trie keys, with the same normalization than `str(Path(...))`"""
+    path_str = normcase(_normalize(str(path)))
+    return path_str.split(sep) if path_str != '.' else []
+
+
+def _name_parts(name  # type: str
+                ):
+    # type: (...) -> List[str]
+    """Returns the list of elements of item name `name` used as trie keys"""
+    return [p for p in str(name).split('/') if p and p != '.']
+
+
+def _item_keys(item  # type: FileItem
+               ):
+    # type: (...) -> Tuple[List[str], List[List[str]], List[str]]
+    """Returns the trie keys of the source, of each destination and of the name of `item`, without creating `Path`s"""
+    pattern = item.pattern
+    stem = _stem(item.src_str)
+    dst_parts_list = [_path_parts(template.format(stem, item.captured_subpath)) for template in _dst_templates(pattern)]
+    name_parts = _name_parts(_normalize(pattern.names_template.format(stem, item.captured_subpath)).replace(sep, '/'))
+    return _path_parts(item.src_str), dst_parts_list, name_parts
+
+
+class _PathTrie(object):
+    """
+    A trie over path elements. Each node is a dictionary of child nodes by path element, and the items stored at a
+    node are in a list under the `None` key.
+    """
+    __slots__ = ('_root',)
+
+    def __init__(self):
+        self._root = dict()
+
+    def add(self,
+            parts,  # type: List[str]
+            item    # type: FileItem
+            ):
+        node = self._root
+        for p in parts:
+            node = node.setdefault(p, {})
+        node.setdefault(None, []).append(item)
+
+    def get(self,
+            parts  # type: List[str]
+            ):
+        # type: (...) -> List[FileItem]
+        node = self._root
+        for p in parts:
+            node = node.get(p)
+            if node is None:
+                return []
+        return list(node.get(None, ()))
+
+    def remove(self,
+               parts,  # type: List[str]
+               item    # type: FileItem
+               ):
+        """Removes `item` from the node at `parts`, and the nodes that become empty"""
+        nodes = [self._root]
+        for p in parts:
+            node = nodes[-1].get(p)
+            if node is None:
+                return
+            nodes.append(node)
+        items = nodes[-1].get(None)
+        if items is None:
+            return
+        items[:] = [i for i in items if i is not item]
+        if not items:
+            del nodes[-1][None]
+            for i in range(len(parts) - 1, -1, -1):
+                if nodes[i + 1]:
+                    break
+                del nodes[i][parts[i]]
+
+    def iter_under(self,
+                   parts  # type: List[str]
+                   ):
+        # type: (...) -> Iterable[FileItem]
+        """Yields all items stored at `parts` or below"""
+        node = self._root
+        for p in parts:
+            node = node.get(p)
+            if node is None:
+                return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for k, child in node.items():
+                if k is None:
+                    for item in child:
+                        yield item
+                else:
+                    stack.append(child)
+
+
+class PatternIndex(object):
+    """
+    An index of the items of one or several compiled patterns, to find items by source path, destination path or
+    name in a time proportional to the length of the path, whatever the number of items. For example:
+
+    ```python
+    index = PatternIndex(compile_pattern('./defs/**/*.ddl', './downloaded/%%/%.csv')).scan()
+    item, = index.by_dst('downloaded/iris.csv')
+    ```
+
+    Paths are stored in tries over their path elements, so all items located under a given folder can also be
+    listed with `under()`. Paths are normalized as `str(Path(...))` does but are not resolved: relative paths
+    should be queried relatively to the same working directory than the patterns.
+
+    The index can be updated incrementally with `add_path()`, `add()` and `remove_path()` when files are added or
+    removed, without scanning the folders again.
+    """
+    __slots__ = ('patterns', '_src', '_dst', '_names', '_len')
+
+    def __init__(self,
+                 *patterns  # type: Union[FilePattern, Tuple, Dict[str, Any]]
+                 ):
+        """
+        Creates an empty index for `patterns`. Use `scan()` to add all the items matching them.
+
+        :param patterns: the compiled patterns to index. As in `file_patterns`, tuples `(src_pattern, dst_pattern)`
+            or dictionaries of keyword arguments for `compile_pattern` can also be provided.
+        """
+        self.patterns = tuple(_compile_rule(p) for p in patterns)
+        self._src = _PathTrie()
+        self._dst = _PathTrie()
+        self._names = _PathTrie()
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        # type: (...) -> Iterable[FileItem]
+        """Yields all items in the index"""
+        return self._src.iter_under([])
+
+    def scan(self,
+             cache=None  # type: Union[str, DirListingCache]
+             ):
+        # type: (...) -> PatternIndex
+        """
+        Lists all files matching the patterns and adds their items to the index, with a single traversal for the
+        patterns searching the same folder (see `file_patterns`).
+
+        :param cache: an optional persistent cache of folder listings, see `file_pattern`
+        :return: this index, for chaining
+        """
+        results = file_patterns(OrderedDict(enumerate(self.patterns)), cache=cache)
+        for items in results.values():
+            self.update(items)
+        return self
+
+    def add(self,
+            item  # type: FileItem
+            ):
+        """Adds `item` to the index"""
+        src_parts, dst_parts_list, name_parts = _item_keys(item)
+        self._src.add(src_parts, item)
+        for dst_parts in dst_parts_list:
+            self._dst.add(dst_parts, item)
+        self._names.add(name_parts, item)
+        self._len += 1
+
+    def update(self,
+               items  # type: Iterable[FileItem]
+               ):
+        """Adds all `items` to the index"""
+        for item in items:
+            self.add(item)
+
+    def add_path(self,
+                 path  # type: Union[str, Any]
+                 ):
+        # type: (...) -> List[FileItem]
+        """
+        Adds the items corresponding to a new source file `path`, for each pattern that it matches. The file system
+        is not accessed.
+
+        :param path: the path of the new source file
+        :return: the list of items added
+        """
+        added = []
+        if not self._src.get(_path_parts(path)):
+            for pattern in self.patterns:
+                item = pattern.match(path)
+                if item is not None:
+                    self.add(item)
+                    added.append(item)
+        return added
+
+    def remove_path(self,
+                    path  # type: Union[str, Any]
+                    ):
+        # type: (...) -> List[FileItem]
+        """
+        Removes the items corresponding to source file `path`.
+
+        :param path: the path of the removed source file
+        :return: the list of items removed
+        """
+        removed = self._src.get(_path_parts(path))
+        for item in removed:
+            src_parts, dst_parts_list, name_parts = _item_keys(item)
+            self._src.remove(src_parts, item)
+            for dst_parts in dst_parts_list:
+                self._dst.remove(dst_parts, item)
+            self._names.remove(name_parts, item)
+            self._len -= 1
+        return removed
+
+    def by_src(self,
+               path  # type: Union[str, Any]
+               ):
+        # type: (...) -> List[FileItem]
+        """Returns the list of items with source `path` (one per pattern matching it)"""
+        return self._src.get(_path_parts(path))
+
+    def by_dst(self,
+               path  # type: Union[str, Any]
+               ):
+        # type: (...) -> List[FileItem]
+        """Returns the list of items with a destination `path`. It usually contains a single item."""
+        return self._dst.get(_path_parts(path))
+
+    def by_name(self,
+                name  # type: str
+                ):
+        # type: (...) -> List[FileItem]
+        """Returns the list of items named `name`, with forward slashes as in `FileItem.name`"""
+        return self._names.get(_name_parts(name))
+
+    def under(self,
+              folder,     # type: Union[str, Any]
+              kind='dst'  # type: str
+              ):
+        # type: (...) -> Iterable[FileItem]
+        """
+        Yields the items with a source (`kind='src'`) or a destination (`kind='dst'`, default) located in `folder`
+        or in one of its sub-folders. An item with several destinations in `folder` is yielded once per destination.
+        """
+        if kind == 'src':
+            return self._src.iter_under(_path_parts(folder))
+        elif kind == 'dst':
+            return self._dst.iter_under(_path_parts(folder))
+        else:
+            raise ValueError("`kind` should be 'src' or 'dst', found %r" % kind)
+
+    def __repr__(self):
+        return "<PatternIndex of %s items for %s patterns>" % (len(self), len(self.patterns))
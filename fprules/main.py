@@ -1,18 +1,38 @@
 from collections import namedtuple, OrderedDict
+from os import sep
+from os.path import basename, altsep
 from sys import version_info
 
+try:
+    from sys import intern
+except ImportError:
+    # python 2: intern is a builtin
+    pass
+
 try:
     from pathlib import Path, PurePath
 except ImportError:
     from pathlib2 import Path, PurePath
 
 try:
-    from typing import Union, Type, Any
+    from typing import Union, Any, Tuple, Callable, Iterable, Optional, Dict, List, Mapping
+    from .stats import MatchStats
 except ImportError:
     pass
 
+from .cache import DirListingCache, get_cache
+from .walk import get_engine, scandir, scandir_engine, scandir_multi_walk, list_dir, EntriesMemo, \
+    compile_glob_regex, _compile_glob_part
+
 
 def gen_matching_files(src_pattern,  # type: Path
+                       engine=None,  # type: Union[str, Callable]
+                       cache=None,   # type: Union[str, DirListingCache]
+                       workers=None,  # type: int
+                       ordered=True,  # type: bool
+                       processes=None,  # type: int
+                       paths=None,    # type: Union[str, Any, Iterable[Union[str, Any]]]
+                       stats=None     # type: MatchStats
                        ):
     """
     Utility generator function used by `file_pattern` to yield of matching file
@@ -30,89 +50,405 @@ def gen_matching_files(src_pattern,  # type: Path
     :param src_pattern: a `Path` representing the source pattern to match.
         The list returned will contain one item for each file matching
         this pattern, using `glob` to perform the match.
+    :param engine: the walk engine to use to perform the file search. It can be the name of one of the engines in
+        `fprules.walk.WALK_ENGINES` or a custom engine function. The default `None` uses `'scandir'` when
+        `os.scandir` is available and `'pathlib'` (`Path.glob`) otherwise.
+    :param cache: an optional persistent cache of folder listings, to avoid listing again the folders that did not
+        change since the previous call. It can be the path to a cache file, or a `fprules.cache.DirListingCache`.
+        It is only supported by walk engines accepting a `lister`, such as the default `'scandir'` engine.
+    :param workers: an optional number of threads to use to list folders concurrently. This is much faster on
+        network file systems. It is only supported by walk engines accepting this option, such as the default
+        `'scandir'` engine.
+    :param ordered: when `workers` or `processes` is set, a boolean indicating if results should be yielded in the
+        same deterministic order than without them (default), or as soon as they are found (`False`).
+    :param processes: an optional number of processes to use to search the files, for very large trees where the
+        per-match work is CPU-bound. The folders to search are split into shards, and each process searches some of
+        them and computes the captured paths. Results are sent back in compact batches of strings. It can not be
+        combined with `workers`, and is only supported by the `'scandir'` engine.
+    :param paths: an optional list of candidate paths to match instead of searching the file system. It can be an
+        iterable of strings or objects representing paths, or the path to a manifest file listing them one per line
+        or separated with null characters, such as the output of `git ls-files -z`. Paths are matched in memory with a
+        single regular expression (see `fprules.walk.compile_glob_regex`) and yielded in the same order: no file
+        system call is made, apart from reading the manifest. It can not be combined with the other search options.
+    :param stats: an optional `fprules.stats.MatchStats` where to collect statistics about the search: number of
+        folders listed, entries examined, matches, and timings per phase. The search is only instrumented when it is
+        provided.
     :return: a generator yielding tuples (<file_path>, <captured_double_wildcard_path>)
     """
     # -- validate the source pattern
-    src_double_wildcard = None  # the index of the first '**' path element, and the pattern after the last '**' path elt
-    src_glob_start = None  # the index of the first path element where special glob characters are used
+    src_glob_start, src_double_wildcard = _parse_src_pattern(src_pattern)
+    if src_double_wildcard is None:
+        suffix_matchers = None
+    else:
+        suffix_matchers = tuple(_compile_glob_part(p) for p in src_double_wildcard[1])
 
-    for i, p in enumerate(src_pattern.parts):
-        if src_glob_start is None and ('*' in p or '?' in p or '[' in p):
-            # first path element where a special glob character is used
-            src_glob_start = i
-        if '**' in p:
-            if p != '**':
-                # raise same error than glob
-                raise ValueError("Invalid pattern '%s': '**' can only be an entire path component" % src_pattern)
-            else:
-                try:
-                    end_ptrn = Path(*src_pattern.parts[i+1:])
-                except IndexError:
-                    end_ptrn = None
-                if src_double_wildcard is None:
-                    # first double wildcard
-                    src_double_wildcard = (i, end_ptrn)
-                else:
-                    # second double wildcard: replace the end pattern
-                    src_double_wildcard = (src_double_wildcard[0], end_ptrn)
-
-    # -- Perform the glob file search operation, using Pathlib.glob
-    if src_glob_start is None:
-        glob_results = (src_pattern,)
+    # -- perform the search, and only create `Path` objects for the matches
+    for matched_file, captured_subpath in _gen_matching_strs(src_pattern, src_glob_start, src_double_wildcard,
+                                                             suffix_matchers, engine=engine, cache=cache,
+                                                             workers=workers, ordered=ordered,
+                                                             processes=processes, paths=paths, stats=stats):
+        yield Path(matched_file), captured_subpath
+
+
+def _gen_matching_strs(src_pattern,          # type: Path
+                       src_glob_start,       # type: Optional[int]
+                       src_double_wildcard,  # type: Optional[Tuple[int, Tuple[str, ...]]]
+                       suffix_matchers,      # type: Optional[Tuple[Callable, ...]]
+                       engine=None,          # type: Union[str, Callable]
+                       cache=None,           # type: Union[str, DirListingCache]
+                       workers=None,         # type: int
+                       ordered=True,         # type: bool
+                       entries=None,         # type: EntriesMemo
+                       processes=None,       # type: int
+                       paths=None,           # type: Union[str, Any, Iterable[Union[str, Any]]]
+                       stats=None            # type: MatchStats
+                       ):
+    # type: (...) -> Iterable[Tuple[str, Optional[str]]]
+    """
+    Implementation of `gen_matching_files` for an already parsed source pattern, yielding the string paths of the
+    matches instead of `Path` objects. The captured sub-paths are interned, since many matches share the same one.
+
+    If `entries` is provided, the folder listings made by the walk are recorded in it when the walk engine accepts a
+    `lister`. If `stats` is provided, the search is instrumented to collect statistics in it.
+    """
+    if paths is not None:
+        if engine is not None or cache is not None or workers is not None or processes is not None:
+            raise ValueError("`paths` can not be used with `engine`, `cache`, `workers` or `processes`")
+        from .manifest import gen_listed_matches
+        matches = gen_listed_matches(compile_glob_regex(src_pattern.parts), src_double_wildcard, paths)
+
+    # -- Perform the glob file search operation, using the walk engine
+    elif src_glob_start is None:
+        matches = _capture_matches((str(src_pattern),), src_pattern, None, src_glob_start, src_double_wildcard,
+                                   suffix_matchers)
     else:
+        walk_engine = get_engine(engine)
         root_path = src_pattern.parents[len(src_pattern.parts)
                                         - src_glob_start - 1]
-        to_search = PurePath(*src_pattern.parts[src_glob_start:])
-        glob_results = root_path.glob(str(to_search))
+        root_str = str(root_path)
+        if processes is not None:
+            if workers is not None:
+                raise ValueError("`processes` can not be used with `workers`")
+            from .shard import gen_sharded_matches
+            matches = gen_sharded_matches(src_pattern, root_str, src_glob_start, src_double_wildcard, walk_engine,
+                                          cache, ordered, processes)
+        else:
+            walk_args = (root_str, src_pattern.parts[src_glob_start:])
+            walk_options = dict()
+            if workers is not None:
+                walk_options.update(workers=workers, ordered=ordered)
+            if walk_engine is scandir_engine and stats is not None:
+                walk_options.update(pruned=stats.count_pruned)
+            if cache is None:
+                if walk_engine is scandir_engine and (entries is not None or stats is not None):
+                    lister = list_dir if stats is None else stats.lister(list_dir)
+                    walk_options.update(lister=lister if entries is None else entries.recorder(lister))
+                glob_results = walk_engine(*walk_args, **walk_options)
+            else:
+                glob_results = _walk_with_cache(walk_engine, walk_args, walk_options, cache, entries, stats)
+            if stats is not None:
+                glob_results = stats.timed(glob_results, 'walk')
+            matches = _capture_matches(glob_results, src_pattern, root_str, src_glob_start, src_double_wildcard,
+                                       suffix_matchers)
+
+    if stats is not None:
+        matches = stats.timed(matches, 'search')
+    for match in matches:
+        yield match
+
 
+def _capture_matches(glob_results,         # type: Iterable[str]
+                     src_pattern,          # type: PurePath
+                     root_str,             # type: Optional[str]
+                     src_glob_start,       # type: Optional[int]
+                     src_double_wildcard,  # type: Optional[Tuple[int, Tuple[str, ...]]]
+                     suffix_matchers       # type: Optional[Tuple[Callable, ...]]
+                     ):
+    # type: (...) -> Iterable[Tuple[str, Optional[str]]]
+    """
+    Yields a tuple (path string, interned captured sub-path) for each of the `glob_results` found by a search in
+    folder `root_str`. The captured sub-path is None if the source pattern has no double wildcard.
+    """
     # Create the appropriate generator according to presence of '**'
     if src_double_wildcard is None:
-        # no double wildcard: simply yield the matching file Path items
+        # no double wildcard: simply yield the matching file paths
         for matched_file in glob_results:
             yield matched_file, None
     else:
+        # get information about the double wildcard
+        src_dblwildcard_idx = src_double_wildcard[0]
+
+        # the matches are located under the root folder: only split the path after it
+        rel_dblwildcard_idx = src_dblwildcard_idx - src_glob_start
+        if root_str == '.':
+            prefix = ''
+        elif root_str[-1] == sep:
+            prefix = root_str
+        else:
+            prefix = root_str + sep
+
         # for each matching item, find the path captured by the '**' and yield
         for matched_file in glob_results:
-            # get information about the double wildcard
-            src_dblwildcard_idx, src_ptrn_suffix = src_double_wildcard
-
-            # split the path in two according to the double wildcard position
-            root_path = matched_file.parents[len(matched_file.parts)
-                                              - src_dblwildcard_idx - 1]
-            variable_path = matched_file.parts[src_dblwildcard_idx:]
-
-            # remove the end of the path according to what was really matched
-            if src_ptrn_suffix is not None:
-                src_ptrn_suffix_str = str(src_ptrn_suffix)
-                for i in range(len(variable_path)):
-                    s_root = (root_path / Path(*variable_path[:i]))
-                    if matched_file in tuple(s_root.glob(src_ptrn_suffix_str)):
-                        variable_path = variable_path[:i]
-                        break
-                else:
-                    # nothing matched, this has to be because len is 0.
-                    assert len(variable_path) == 0
-
-            yield (matched_file, str(PurePath(*variable_path)))
-
-
-class FileItem(namedtuple('FileItem',
-                          ('name', 'src_path', 'has_multi_targets', 'dst_path'))):
+            if matched_file.startswith(prefix):
+                variable_path = _capture_double_wildcard(matched_file[len(prefix):].split(sep), rel_dblwildcard_idx,
+                                                         suffix_matchers)
+            elif matched_file == root_str:
+                variable_path = _capture_double_wildcard((), rel_dblwildcard_idx, suffix_matchers)
+            else:
+                # a custom engine returning paths in another form
+                variable_path = _capture_double_wildcard(Path(matched_file).parts, src_dblwildcard_idx,
+                                                         suffix_matchers)
+            if variable_path is None:
+                # this can not happen for a file returned by glob
+                raise ValueError("Internal error: '%s' does not match the end of pattern '%s'"
+                                 % (matched_file, src_pattern))
+
+            yield matched_file, intern(sep.join(variable_path) if variable_path else '.')
+
+
+def _walk_with_cache(walk_engine,   # type: Callable
+                     walk_args,     # type: Tuple[str, Tuple[str, ...]]
+                     walk_options,  # type: Dict[str, Any]
+                     cache,         # type: Union[str, DirListingCache]
+                     entries=None,  # type: EntriesMemo
+                     stats=None     # type: MatchStats
+                     ):
+    """
+    Runs `walk_engine` with the folder lister of `cache`, and closes `cache` at the end if it was a path. If `entries`
+    is provided, the listings are recorded in it. If `stats` is provided, the listings are counted in it.
+    """
+    cache, should_close = get_cache(cache)
+    lister = cache.list_dir if stats is None else stats.cache_lister(cache)
+    if entries is not None:
+        lister = entries.recorder(lister)
+    try:
+        for p in walk_engine(*walk_args, lister=lister, **walk_options):
+            yield p
+    finally:
+        if should_close:
+            cache.close()
+        else:
+            cache.flush()
+
+
+def _parse_src_pattern(src_pattern  # type: PurePath
+                       ):
+    """
+    Parses the parts of source pattern `src_pattern` and returns a tuple (src_glob_start, src_double_wildcard):
+
+     - `src_glob_start` is the index of the first path element where special glob characters are used, or `None`
+     - `src_double_wildcard` is `None` if there is no double wildcard in the pattern. Otherwise it is a tuple
+       containing the index of the first '**' path element, and the tuple of pattern parts after the last '**'.
+
+    :param src_pattern: a `PurePath` representing the source pattern
+    :return:
+    """
+    src_double_wildcard = None
+    src_glob_start = None
+
+    parts = src_pattern.parts
+    for i, p in enumerate(parts):
+        if src_glob_start is None and ('*' in p or '?' in p or '[' in p):
+            # first path element where a special glob character is used
+            src_glob_start = i
+        if '**' in p:
+            if p != '**':
+                # raise same error than glob
+                raise ValueError("Invalid pattern '%s': '**' can only be an entire path component" % src_pattern)
+            elif src_double_wildcard is None:
+                # first double wildcard
+                src_double_wildcard = (i, parts[i+1:])
+            else:
+                # second double wildcard: replace the end pattern
+                src_double_wildcard = (src_double_wildcard[0], parts[i+1:])
+
+    return src_glob_start, src_double_wildcard
+
+
+def _capture_double_wildcard(matched_parts,     # type: Tuple[str, ...]
+                             dblwildcard_idx,   # type: int
+                             suffix_matchers    # type: Tuple[Callable, ...]
+                             ):
+    """
+    Returns the path elements captured by the double wildcard(s) for a path matching the source pattern, without
+    accessing the file system.
+
+    Since the pattern parts after the last '**' do not contain any double wildcard, they match exactly as many
+    trailing path elements. The captured path elements are therefore the ones between the first '**' position and
+    these trailing elements.
+
+    :param matched_parts: the parts of the path that matched the source pattern
+    :param dblwildcard_idx: the index of the first '**' in the source pattern parts
+    :param suffix_matchers: the compiled matchers for each pattern part located after the last '**'
+    :return: a tuple of captured path elements (possibly empty), or None if `matched_parts` does not match the
+        pattern suffix.
+    """
+    suffix_start = len(matched_parts) - len(suffix_matchers)
+    if suffix_start < dblwildcard_idx:
+        return None
+
+    for part, matcher in zip(matched_parts[suffix_start:], suffix_matchers):
+        if matcher(part) is None:
+            return None
+
+    return matched_parts[dblwildcard_idx:suffix_start]
+
+
+def _stem(path_str  # type: str
+          ):
+    # type: (...) -> str
+    """Returns the same stem than `Path(path_str).stem`, without creating a `Path`"""
+    name = basename(path_str)
+    if name == '.':
+        return ''
+    i = name.rfind('.')
+    if 0 < i < len(name) - 1:
+        return name[:i]
+    else:
+        return name
+
+
+def _normalize(path_str  # type: str
+               ):
+    # type: (...) -> str
+    """Returns the same string than `str(Path(path_str))` without creating a `Path`, for paths without drive"""
+    if not (sep + sep in path_str or '.' + sep in path_str or path_str[-1:] in (sep, '.', '')
+            or (altsep and altsep in path_str)):
+        # already normalized: this is the most frequent case, made faster
+        return path_str
+    if altsep:
+        path_str = path_str.replace(altsep, sep)
+    parts = [p for p in path_str.split(sep) if p and p != '.']
+    root = sep if path_str[:1] == sep else ''
+    return (root + sep.join(parts)) or '.'
+
+
+def _dst_templates(pattern  # type: FilePattern
+                   ):
+    # type: (...) -> Tuple[str, ...]
+    """Returns the tuple of compiled templates of all the destinations of `pattern`"""
+    if pattern.has_multi_targets:
+        return tuple(template for _, template in pattern.dst_templates)
+    else:
+        return pattern.dst_templates,
+
+
+class FileItem(object):
     """
-    Represents an item created by `file_pattern(...)`.
+    Represents an item created by `file_pattern(...)`, with attributes `name`, `src_path`, `has_multi_targets` and
+    `dst_path`. When the item has multiple targets, each of them is also available as an attribute.
+
+    Items are compact: each item only stores the string path of the source, the part of it captured by the double
+    wildcard, and a reference to the compiled `FilePattern` that is shared by all items. The name and the `Path`
+    objects for the source and each destination are created on first access.
     """
+    __slots__ = ('pattern', 'src_str', 'captured_subpath', '_name', '_src_path', '_dst_paths', '_dst_dict')
+
+    def __init__(self,
+                 pattern,               # type: FilePattern
+                 src_str,               # type: str
+                 captured_subpath=None  # type: Optional[str]
+                 ):
+        """
+        :param pattern: the compiled `FilePattern` that created this item
+        :param src_str: the normalized string path of the source file, as returned by `str(Path(...))`
+        :param captured_subpath: the part of the path captured by the double wildcard, or None
+        """
+        self.pattern = pattern
+        self.src_str = src_str
+        self.captured_subpath = captured_subpath
+        self._name = None
+        self._src_path = None
+        self._dst_paths = None
+        self._dst_dict = None
+
+    @property
+    def name(self):
+        # type: (...) -> str
+        """The friendly name of this item, created from the `names` pattern"""
+        if self._name is None:
+            self._name = Path(self.pattern.names_template.format(_stem(self.src_str),
+                                                                 self.captured_subpath)).as_posix()
+        return self._name
+
+    @property
+    def src_path(self):
+        # type: (...) -> Path
+        """The `Path` of the source file"""
+        if self._src_path is None:
+            self._src_path = Path(self.src_str)
+        return self._src_path
+
+    @property
+    def has_multi_targets(self):
+        # type: (...) -> bool
+        """A boolean indicating if this item has multiple targets"""
+        return self.pattern.has_multi_targets
+
+    @property
+    def dst_path(self):
+        # type: (...) -> Union[Path, Dict[str, Path]]
+        """
+        The `Path` of the destination file, or an ordered dictionary of destination `Path`s if there are several. The
+        dictionary is created on first access and the same one is returned afterwards: it should not be modified.
+        """
+        if self.pattern.has_multi_targets:
+            if self._dst_dict is None:
+                # use an OrderedDict for legacy python compatibility
+                self._dst_dict = OrderedDict([(dst_name, self._get_dst_path(i))
+                                              for i, dst_name in enumerate(self.pattern.dst_keys)])
+            return self._dst_dict
+        else:
+            if self._dst_paths is None:
+                self._dst_paths = Path(self.pattern.dst_templates.format(_stem(self.src_str), self.captured_subpath))
+            return self._dst_paths
+
+    def _get_dst_path(self,
+                      idx  # type: int
+                      ):
+        # type: (...) -> Path
+        """Returns the `Path` of the destination at position `idx` in a multi-targets item, creating it if needed"""
+        dst_paths = self._dst_paths
+        if dst_paths is None:
+            dst_paths = self._dst_paths = [None] * len(self.pattern.dst_keys)
+        dst_path = dst_paths[idx]
+        if dst_path is None:
+            template = self.pattern.dst_templates[idx][1]
+            dst_path = dst_paths[idx] = Path(template.format(_stem(self.src_str), self.captured_subpath))
+        return dst_path
+
     def __getattr__(self, item):
         """
         If the item has multiple targets, allow users to access them with an
         attribute style. (see `munch` for inspiration)
         """
-        if self.has_multi_targets:
+        dst_keys = self.pattern.dst_keys
+        if dst_keys is not None and not item.startswith('_'):
             try:
-                return self.dst_path[item]
-            except KeyError as e:
-                raise AttributeError(item)
-        else:
-            return super(FileItem, self).__getattribute__(item)
+                return self._get_dst_path(dst_keys.index(item))
+            except ValueError:
+                pass
+        raise AttributeError(item)
+
+    def __iter__(self):
+        # legacy: items used to be named tuples (name, src_path, has_multi_targets, dst_path)
+        return iter((self.name, self.src_path, self.has_multi_targets, self.dst_path))
+
+    def __eq__(self, other):
+        if not isinstance(other, FileItem):
+            return NotImplemented
+        return (self.src_str == other.src_str and self.captured_subpath == other.captured_subpath
+                and self.pattern == other.pattern)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash((self.src_str, self.captured_subpath))
+
+    def __reduce__(self):
+        return FileItem, (self.pattern, self.src_str, self.captured_subpath)
 
     def __str__(self):
         if self.has_multi_targets:
@@ -148,20 +484,402 @@ def _validate_dst_pattern(dst_pattern, src_pattern, src_has_double_wildcard, pat
     return dst_pattern
 
 
-if version_info >= (3, 6):
-    _true_fp_sig = """file_pattern(src_pattern: Union[str, Any],
-                                   dst_pattern: Union[str, Any],
-                                   *,
-                                   names: Union[str, Any] = None,
-                                   # src_attr: str = 'src_path',
-                                   # dst_attr: str = 'dst_path'
-                     )"""
+def _compile_dst_template(dst_pattern  # type: str
+                          ):
+    # type: (...) -> str
+    """
+    Compiles a validated destination pattern into a format string, where the stem is field `{0}` and the path captured
+    by the double wildcard is field `{1}`. For example `'./downloaded/%%/%.csv'` becomes `'./downloaded/{1}/{0}.csv'`.
+    """
+    return '{1}'.join('{0}'.join(p.replace('{', '{{').replace('}', '}}') for p in s.split('%'))
+                      for s in dst_pattern.split('%%'))
+
+
+class FilePattern(namedtuple('FilePattern',
+                             ('src_pattern', 'dst_pattern', 'names', 'has_multi_targets',
+                              'src_glob_start', 'src_double_wildcard', 'src_regex', 'src_suffix_matchers',
+                              'dst_keys', 'dst_templates', 'names_template'))):
+    """
+    A compiled file pattern rule, created by `compile_pattern(...)`. It is immutable, and holds the parsed source
+    pattern and the compiled destination and name templates, so that it can be used several times at no extra cost.
+
+    Fields:
+
+     - `src_pattern`: the source pattern `Path`
+     - `dst_pattern`: the destination pattern string, or a tuple of (name, pattern string) pairs when there are
+       multiple targets
+     - `names`: the naming pattern string
+     - `has_multi_targets`: a boolean indicating if there are multiple targets
+     - `src_glob_start`, `src_double_wildcard`: the result of parsing the source pattern, see `_parse_src_pattern`
+     - `src_regex`: the whole source pattern compiled into a single regular expression with named groups
+       `'captured'` and `'stem'`, used to match paths in memory. See `fprules.walk.compile_glob_regex`
+     - `src_suffix_matchers`: the compiled source pattern parts after the last double wildcard, if any
+     - `dst_keys`: the tuple of destination names when there are multiple targets, None otherwise
+     - `dst_templates`: the compiled destination template, or a tuple of (name, template) pairs when there are
+       multiple targets. See `_compile_dst_template`
+     - `names_template`: the compiled naming template
+    """
+    __slots__ = ()
+
+    def __eq__(self, other):
+        # compiled fields are derived from the patterns
+        if not isinstance(other, FilePattern):
+            return NotImplemented
+        return self[:3] == other[:3]
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self[:3])
+
+    def __reduce__(self):
+        # compiled fields are not picklable reliably: compile again from the patterns
+        dst_pattern = OrderedDict(self.dst_pattern) if self.has_multi_targets else self.dst_pattern
+        return compile_pattern, (str(self.src_pattern), dst_pattern, self.names)
+
+    def iter(self,
+             engine=None,   # type: Union[str, Callable]
+             cache=None,    # type: Union[str, DirListingCache]
+             workers=None,  # type: int
+             ordered=True,   # type: bool
+             processes=None,  # type: int
+             paths=None,      # type: Union[str, Any, Iterable[Union[str, Any]]]
+             stats=None       # type: MatchStats
+             ):
+        # type: (...) -> Iterable[FileItem]
+        """
+        Lists all files matching the source pattern and yields the corresponding `FileItem`s.
+
+        :param engine: the walk engine to use to perform the file search, see `gen_matching_files`.
+        :param cache: an optional persistent cache of folder listings, see `gen_matching_files`.
+        :param workers: an optional number of threads to use to list folders concurrently, see `gen_matching_files`.
+        :param ordered: when `workers` or `processes` is set, whether to preserve the serial order, see
+            `gen_matching_files`.
+        :param processes: an optional number of processes to use to search the files, see `gen_matching_files`.
+        :param paths: an optional list of candidate paths or manifest file, matched instead of searching the file
+            system. See `gen_matching_files`.
+        :param stats: an optional `fprules.stats.MatchStats` where to collect statistics about the search.
+        :return: a generator of `FileItem`
+        """
+        matches = _gen_matching_strs(self.src_pattern, self.src_glob_start, self.src_double_wildcard,
+                                     self.src_suffix_matchers, engine=engine, cache=cache, workers=workers,
+                                     ordered=ordered, processes=processes, paths=paths, stats=stats)
+        if stats is None:
+            for f_str, capt_subpath in matches:
+                yield FileItem(self, f_str, capt_subpath)
+        else:
+            for item in stats.timed((FileItem(self, f_str, capt_subpath) for f_str, capt_subpath in matches), 'total'):
+                yield item
+
+    def changes(self,
+                snapshot,      # type: str
+                update=True,   # type: bool
+                engine=None,   # type: Union[str, Callable]
+                cache=None,    # type: Union[str, DirListingCache]
+                workers=None,  # type: int
+                ordered=True,   # type: bool
+                processes=None,  # type: int
+                paths=None,      # type: Union[str, Any, Iterable[Union[str, Any]]]
+                stats=None       # type: MatchStats
+                ):
+        # type: (...) -> Iterable[ChangedFileItem]
+        """
+        Lists all files matching the source pattern and only yields the items whose source was added, modified or
+        removed since the previous call with the same `snapshot` file. Each item has a `change` attribute equal to
+        `'added'`, `'modified'` or `'removed'`. See `fprules.changes.gen_changed_items` for details, and `iter` for
+        the walk arguments.
+
+        :param snapshot: the path to the snapshot file. It does not need to exist.
+        :param update: if True (default), the snapshot file is updated once all items have been yielded.
+        :return: a generator of `fprules.changes.ChangedFileItem`
+        """
+        from .changes import gen_changed_items
+        items = gen_changed_items(self, snapshot, update=update, engine=engine, cache=cache, workers=workers,
+                                  ordered=ordered, processes=processes, paths=paths, stats=stats)
+        return items if stats is None else stats.timed(items, 'total')
+
+    def stale(self,
+              engine=None,   # type: Union[str, Callable]
+              cache=None,    # type: Union[str, DirListingCache]
+              workers=None,  # type: int
+              ordered=True,   # type: bool
+              processes=None,  # type: int
+              paths=None,      # type: Union[str, Any, Iterable[Union[str, Any]]]
+              stats=None       # type: MatchStats
+              ):
+        # type: (...) -> Iterable[FileItem]
+        """
+        Lists all files matching the source pattern and only yields the items with at least one destination that does
+        not exist or is older than the source, as in `make`. See `fprules.stale.gen_stale_items` for details, and
+        `iter` for the arguments.
+
+        :return: a generator of `FileItem`
+        """
+        from .stale import gen_stale_items
+        items = gen_stale_items(self, engine=engine, cache=cache, workers=workers, ordered=ordered,
+                                processes=processes, paths=paths, stats=stats)
+        return items if stats is None else stats.timed(items, 'total')
+
+    def fingerprints(self,
+                     algorithm='sha256',  # type: str
+                     hash_cache=None,     # type: Union[str, HashCache]
+                     engine=None,         # type: Union[str, Callable]
+                     cache=None,          # type: Union[str, DirListingCache]
+                     workers=None,        # type: int
+                     ordered=True,        # type: bool
+                     processes=None,      # type: int
+                     paths=None,          # type: Union[str, Any, Iterable[Union[str, Any]]]
+                     stats=None           # type: MatchStats
+                     ):
+        # type: (...) -> Iterable[FingerprintedFileItem]
+        """
+        Lists all files matching the source pattern and yields the corresponding `FingerprintedFileItem`s, with the
+        digest of the contents of their source in a `fingerprint` attribute. See
+        `fprules.fingerprint.gen_fingerprinted_items` for details, and `iter` for the other arguments.
+
+        :param algorithm: the hash algorithm, `'sha256'` or `'xxhash'` (this requires the `xxhash` package)
+        :param hash_cache: an optional persistent cache of hashes, so that the files that did not change are not
+            hashed again. It can be the path to a cache file, or a `fprules.fingerprint.HashCache`.
+        :return: a generator of `FingerprintedFileItem`
+        """
+        from .fingerprint import gen_fingerprinted_items
+        items = self.iter(engine=engine, cache=cache, workers=workers, ordered=ordered, processes=processes,
+                          paths=paths, stats=stats)
+        return gen_fingerprinted_items(items, algorithm, hash_cache=hash_cache)
+
+    def table(self,
+              engine=None,   # type: Union[str, Callable]
+              cache=None,    # type: Union[str, DirListingCache]
+              workers=None,  # type: int
+              ordered=True,   # type: bool
+              processes=None,  # type: int
+              paths=None,      # type: Union[str, Any, Iterable[Union[str, Any]]]
+              stats=None       # type: MatchStats
+              ):
+        # type: (...) -> FileTable
+        """
+        Lists all files matching the source pattern and returns a columnar `FileTable`, that does not create one
+        `FileItem` per match. See `iter` for the arguments.
+
+        :return: a `fprules.table.FileTable`
+        """
+        from .table import FileTable
+        matches = _gen_matching_strs(self.src_pattern, self.src_glob_start, self.src_double_wildcard,
+                                     self.src_suffix_matchers, engine=engine, cache=cache, workers=workers,
+                                     ordered=ordered, processes=processes, paths=paths, stats=stats)
+        if stats is None:
+            return FileTable.from_matches(self, matches)
+        else:
+            # time the creation of the table as the creation of a single item
+            table, = stats.timed((FileTable.from_matches(self, m) for m in (matches,)), 'total')
+            return table
+
+    def resolve(self,
+                dst_path,  # type: Union[str, Any]
+                key=None   # type: str
+                ):
+        # type: (...) -> List[FileItem]
+        """
+        Returns the items producing target `dst_path`, by solving the destination template instead of searching all
+        the source files. Only the folders needed to resolve the wildcards of the source pattern are listed. See
+        `fprules.resolve.resolve_target` for details.
+
+        :param dst_path: a string or object representing the target path
+        :param key: for patterns with multiple targets, the optional name of the destination to solve
+        :return: the list of items producing `dst_path`, usually empty or containing a single item
+        """
+        from .resolve import resolve_target
+        return resolve_target(self, dst_path, key=key)
+
+    def match(self,
+              path  # type: Union[str, Any]
+              ):
+        # type: (...) -> Optional[FileItem]
+        """
+        Returns the `FileItem` corresponding to `path` if it matches the source pattern, or `None` otherwise. This
+        does not access the file system, so `path` does not need to exist: paths listed by other tools or read from
+        a file can be matched. A single match of `src_regex` is done, that also captures the double wildcard path.
+
+        As the file system is not accessed, a source pattern ending with '**' matches files too, while `iter` only
+        yields folders for it.
+
+        :param path: a string or object representing the path to match
+        :return:
+        """
+        if isinstance(path, PurePath):
+            path_str = str(path)
+        else:
+            path_str = _normalize(str(path))
+
+        m = self.src_regex.match(path_str)
+        if m is None:
+            return None
+        elif self.src_double_wildcard is None:
+            item = FileItem(self, path_str)
+        else:
+            item = FileItem(self, path_str, intern(m.group('captured') or '.'))
+
+        if isinstance(path, Path):
+            item._src_path = path
+        return item
+
+    def expand(self,
+               path,                   # type: Union[str, Any]
+               captured_subpath=None,  # type: str
+               ):
+        # type: (...) -> FileItem
+        """
+        Creates the `FileItem` corresponding to source path `path`, that should match the source pattern.
+
+        :param path: a string or object representing the path of a file matching the source pattern
+        :param captured_subpath: the part of the path captured by the double wildcard, as yielded by
+            `gen_matching_files`. When `None` and the source pattern contains a double wildcard, it is computed from
+            `path`.
+        :return: the `FileItem`
+        """
+        if not isinstance(path, Path):
+            path = Path(str(path))
+
+        if captured_subpath is None and self.src_double_wildcard is not None:
+            variable_path = _capture_double_wildcard(path.parts, self.src_double_wildcard[0],
+                                                     self.src_suffix_matchers)
+            if variable_path is None:
+                raise ValueError("Path '%s' does not match source pattern '%s'" % (path, self.src_pattern))
+            captured_subpath = str(PurePath(*variable_path))
+
+        item = FileItem(self, str(path), captured_subpath)
+        item._src_path = path
+        return item
+
+    def _expand_str(self,
+                    path_str  # type: str
+                    ):
+        # type: (...) -> FileItem
+        """
+        Creates the `FileItem` corresponding to the normalized string path `path_str` (as returned by `str(Path(...))`)
+        of a file matching the source pattern, without creating any `Path`.
+        """
+        if self.src_double_wildcard is None:
+            return FileItem(self, path_str)
+
+        # a normalized path string split on the separator has the same number of elements than `Path.parts`
+        variable_path = _capture_double_wildcard(path_str.split(sep) if path_str != '.' else (),
+                                                 self.src_double_wildcard[0], self.src_suffix_matchers)
+        if variable_path is None:
+            raise ValueError("Path '%s' does not match source pattern '%s'" % (path_str, self.src_pattern))
+        return FileItem(self, path_str, intern(sep.join(variable_path) if variable_path else '.'))
+
+
+# the maximum number of compiled patterns kept in `_COMPILED_PATTERNS`
+COMPILED_PATTERNS_CACHE_SIZE = 128
+# the cache of compiled patterns, from least to most recently used
+_COMPILED_PATTERNS = OrderedDict()
+
+
+def compile_pattern(src_pattern,  # type: Union[str, Any]
+                    dst_pattern,  # type: Union[str, Any]
+                    names=None    # type: Union[str, Any]
+                    ):
+    # type: (...) -> FilePattern
+    """
+    Compiles a file pattern rule into an immutable `FilePattern` object, that can be used several times to list the
+    matching files with `.iter()`, or to create the `FileItem` corresponding to a given path with `.match(path)` or
+    `.expand(path)`. See `file_pattern` for details about the arguments.
+
+    The compiled patterns are kept in a module-level LRU cache keyed on the pattern strings, so calling this function
+    several times with the same patterns parses and validates them only once.
+
+    :param src_pattern: a string or object representing the source pattern to match.
+    :param dst_pattern: a string or object representing the destination pattern, or a dictionary of such patterns.
+    :param names: a string or object representing the naming pattern to use, or None for the default.
+    :return: a `FilePattern`
+    """
+    # -- create the cache key from the pattern strings
+    src_pattern_str = str(src_pattern)
+    try:
+        # assume a dictionary of destination patterns
+        dst_key = tuple((dst_name, str(_dst_pattern)) for dst_name, _dst_pattern in dst_pattern.items())
+    except AttributeError:
+        # single pattern
+        dst_key = str(dst_pattern)
+    names_key = None if names is None else str(names)
+    key = (src_pattern_str, dst_key, names_key)
+
+    try:
+        compiled = _COMPILED_PATTERNS.pop(key)
+    except KeyError:
+        compiled = _compile_pattern(src_pattern_str, dst_key, names_key)
+        if len(_COMPILED_PATTERNS) >= COMPILED_PATTERNS_CACHE_SIZE:
+            # remove the least recently used
+            _COMPILED_PATTERNS.popitem(last=False)
+
+    # (re)insert as the most recently used
+    _COMPILED_PATTERNS[key] = compiled
+    return compiled
+
+
+def _compile_pattern(src_pattern,  # type: str
+                     dst_pattern,  # type: Union[str, Tuple[Tuple[str, str], ...]]
+                     names         # type: Optional[str]
+                     ):
+    # type: (...) -> FilePattern
+    """Creates a `FilePattern` from the pattern strings. The multiple destination patterns should be a tuple"""
+    # since we will use a parent in this pattern for actual glob search,
+    # we use a concrete `Path` not a `PurePath`
+    src_has_double_wildcard = '**' in src_pattern
+    src_pattern = Path(src_pattern)
+    src_glob_start, src_double_wildcard = _parse_src_pattern(src_pattern)
+
+    # default names pattern
+    if names is None:
+        names = "%%/%" if src_has_double_wildcard else "%"
+
+    # -- validate and compile all destination patterns
+    has_multi_targets = isinstance(dst_pattern, tuple)
+    if has_multi_targets:
+        dst_pattern = tuple((dst_name, _validate_dst_pattern(_dst_pattern, src_pattern, src_has_double_wildcard))
+                            for dst_name, _dst_pattern in dst_pattern)
+        dst_templates = tuple((dst_name, _compile_dst_template(_dst_pattern))
+                              for dst_name, _dst_pattern in dst_pattern)
+        dst_keys = tuple(dst_name for dst_name, _ in dst_pattern)
+    else:
+        dst_keys = None
+        dst_pattern = _validate_dst_pattern(dst_pattern, src_pattern, src_has_double_wildcard)
+        dst_templates = _compile_dst_template(dst_pattern)
+
+    # -- validate name pattern
+    names = _validate_dst_pattern(names, src_pattern, src_has_double_wildcard, pattern_name='Name')
+
+    if src_double_wildcard is None:
+        src_suffix_matchers = None
+    else:
+        src_suffix_matchers = tuple(_compile_glob_part(p) for p in src_double_wildcard[1])
+
+    return FilePattern(src_pattern=src_pattern, dst_pattern=dst_pattern, names=names,
+                       has_multi_targets=has_multi_targets, src_glob_start=src_glob_start,
+                       src_double_wildcard=src_double_wildcard, src_regex=compile_glob_regex(src_pattern.parts),
+                       src_suffix_matchers=src_suffix_matchers, dst_keys=dst_keys, dst_templates=dst_templates,
+                       names_template=_compile_dst_template(names))
 
 
 def file_pattern(src_pattern,          # type: Union[str, Any]
                  dst_pattern,          # type: Union[str, Any]
-                 # *,  this keyword-only feature is added on python 3.6+, see above
+                 # *,  this keyword-only feature is added on python 3, see `fprules._py3`
                  names=None,            # type: Union[str, Any]
+                 engine=None,           # type: Union[str, Callable]
+                 cache=None,            # type: Union[str, DirListingCache]
+                 workers=None,          # type: int
+                 ordered=True,          # type: bool
+                 as_table=False,        # type: bool
+                 snapshot=None,         # type: str
+                 only_stale=False,      # type: bool
+                 processes=None,        # type: int
+                 paths=None,            # type: Union[str, Any, Iterable[Union[str, Any]]]
+                 stats=None,            # type: MatchStats
+                 fingerprint=None,      # type: str
+                 hash_cache=None,       # type: Union[str, HashCache]
                  # src_attr='src_path',  # type: str
                  # dst_attr='dst_path'   # type: str
                  ):
@@ -232,77 +950,168 @@ def file_pattern(src_pattern,          # type: Union[str, Any]
     :param names: a string or object representing the naming pattern to use. A
         value of `None` (default) provides a default pattern trying to
         guarantee uniqueness while preserving compacity.
-    :return: a list of `FileItem` instances with at least two fields `src_path`
+    :param engine: the walk engine to use to perform the file search, see
+        `gen_matching_files`. The default `None` uses the fastest available.
+    :param cache: an optional persistent cache of folder listings, for
+        example `'.fprules-cache'`. Folders that did not change since the
+        previous call with the same cache are not listed again. See
+        `gen_matching_files`.
+    :param workers: an optional number of threads to use to list folders
+        concurrently, for example on network file systems. See
+        `gen_matching_files`.
+    :param ordered: when `workers` or `processes` is set, a boolean
+        indicating if items should be yielded in the same order than without
+        them (default), or as soon as they are found (`False`).
+    :param as_table: if `True`, a columnar `fprules.table.FileTable` is
+        returned instead of a generator. This is much more efficient for very
+        large sets of matches.
+    :param snapshot: an optional path to a snapshot file. When provided, only
+        the items whose source was added, modified or removed since the
+        previous call with the same snapshot are yielded, with a `change`
+        attribute. The snapshot is updated once all items have been yielded.
+    :param only_stale: if `True`, only the items with at least one
+        destination that does not exist or is older than the source are
+        yielded, as in `make`. See `fprules.stale.gen_stale_items`.
+    :param processes: an optional number of processes to use to search the
+        files in very large trees. See `gen_matching_files`.
+    :param paths: an optional list of candidate paths to match instead of
+        searching the file system, for example when the list of files is
+        already known. It can be an iterable of paths, or the path to a
+        manifest file listing them one per line or separated with null
+        characters (such as the output of `git ls-files -z`). No file system
+        call is made to find the matching items. See `gen_matching_files`.
+    :param stats: an optional `fprules.stats.MatchStats` object where to
+        collect statistics about the search (folders listed, entries
+        examined, matches, timings per phase...), for example to find out
+        why a search is slow. The search is only instrumented if provided.
+    :param fingerprint: an optional hash algorithm, `'sha256'` or `'xxhash'`
+        (this requires the `xxhash` package). When provided, the contents of
+        each source are hashed on a thread pool, and the digest is available
+        in the `fingerprint` attribute of the items. See
+        `fprules.fingerprint.gen_fingerprinted_items`.
+    :param hash_cache: with `fingerprint`, an optional persistent cache of
+        hashes, for example `'.fprules-hashes'`. Sources with the same size,
+        modification time and inode than in the previous call with the same
+        cache are not hashed again.
+    :return: a generator of `FileItem` instances with at least two fields `src_path`
         and `dst_path`. When `dst_pattern` is a dictionary, the items will also
         show one attribute per key in that dictionary.
     """
-    if not isinstance(src_pattern, PurePath):
-        # create a pathlib.Path based on the string view of the object
-        # since we will use a parent in this pattern for actual glob search,
-        # we use a concrete `Path` not a `PurePath`
-        src_pattern_str = str(src_pattern)
-        src_has_double_wildcard = '**' in src_pattern_str
-        src_pattern = Path(src_pattern_str)
+    pattern = compile_pattern(src_pattern, dst_pattern, names=names)
+    if fingerprint is not None:
+        if as_table or snapshot is not None:
+            raise ValueError("`fingerprint` can not be used with `as_table` or `snapshot`")
+        if only_stale:
+            from .fingerprint import gen_fingerprinted_items
+            items = pattern.stale(engine=engine, cache=cache, workers=workers, ordered=ordered,
+                                  processes=processes, paths=paths, stats=stats)
+            return gen_fingerprinted_items(items, fingerprint, hash_cache=hash_cache)
+        return pattern.fingerprints(fingerprint, hash_cache=hash_cache, engine=engine, cache=cache, workers=workers,
+                                    ordered=ordered, processes=processes, paths=paths, stats=stats)
+    elif hash_cache is not None:
+        raise ValueError("`hash_cache` can only be used with `fingerprint`")
+    elif only_stale:
+        if as_table or snapshot is not None:
+            raise ValueError("`only_stale` can not be used with `as_table` or `snapshot`")
+        return pattern.stale(engine=engine, cache=cache, workers=workers, ordered=ordered,
+                             processes=processes, paths=paths, stats=stats)
+    elif snapshot is not None:
+        if as_table:
+            raise ValueError("`snapshot` can not be used with `as_table`")
+        return pattern.changes(snapshot, engine=engine, cache=cache, workers=workers, ordered=ordered,
+                               processes=processes, paths=paths, stats=stats)
+    elif as_table:
+        return pattern.table(engine=engine, cache=cache, workers=workers, ordered=ordered,
+                             processes=processes, paths=paths, stats=stats)
     else:
-        src_has_double_wildcard = '**' in str(src_pattern)
+        return pattern.iter(engine=engine, cache=cache, workers=workers, ordered=ordered,
+                            processes=processes, paths=paths, stats=stats)
 
-    # default names pattern
-    if names is None:
-        names = "%%/%" if src_has_double_wildcard else "%"
 
-    # create the generator
-    match_generator = gen_matching_files(src_pattern)
+def _compile_rule(rule  # type: Union[FilePattern, Tuple, Dict[str, Any]]
+                  ):
+    # type: (...) -> FilePattern
+    """Returns the compiled pattern for a rule of `file_patterns`"""
+    if isinstance(rule, FilePattern):
+        return rule
+    elif isinstance(rule, dict):
+        return compile_pattern(**rule)
+    else:
+        return compile_pattern(*rule)
 
-    # -- validate all destination patterns
-    try:
-        # assume a dictionary of destination patterns
-        for dst_name, _dst_pattern in dst_pattern.items():
-            dst_pattern[dst_name] = \
-                _validate_dst_pattern(_dst_pattern, src_pattern,
-                                      src_has_double_wildcard)
-        has_multi_targets = True
-    except AttributeError:
-        # single pattern
-        dst_pattern = _validate_dst_pattern(dst_pattern, src_pattern,
-                                            src_has_double_wildcard)
-        has_multi_targets = False
 
-    # -- validate name pattern
-    names = _validate_dst_pattern(names, src_pattern,
-                                  src_has_double_wildcard, pattern_name='Name')
+def file_patterns(rules,      # type: Mapping[str, Union[FilePattern, Tuple, Dict[str, Any]]]
+                  cache=None  # type: Union[str, DirListingCache]
+                  ):
+    # type: (...) -> Dict[str, List[FileItem]]
+    """
+    Applies several file pattern rules at once, and returns the lists of `FileItem` created for each rule.
 
-    def _create_dst_path(matching_file, captured_subpath, dst_pattern):
-        # replace %% with the **-captured sub-path
-        if captured_subpath is not None and '%%' in dst_pattern:
-            dst_path = dst_pattern.replace('%%', captured_subpath)
-        else:
-            dst_path = dst_pattern
-
-        # replace % with file stem and convert to Path object
-        return Path(dst_path.replace('%', matching_file.stem))
-
-    for f_path, capt_subpath in match_generator:
-        # create the destination path(s)
-        if has_multi_targets:
-            # use an OrderedDict for legacy python compatibility
-            _items = [(dst_name, _create_dst_path(f_path, capt_subpath,
-                                                  _dst_pattern))
-                      for dst_name, _dst_pattern in dst_pattern.items()]
-            dst_paths = OrderedDict(_items)
-        else:
-            dst_paths = _create_dst_path(f_path, capt_subpath, dst_pattern)
+    Rules are provided as a dictionary, where each value can be
+
+     - a `FilePattern` created with `compile_pattern`,
+     - a tuple `(src_pattern, dst_pattern)` or `(src_pattern, dst_pattern, names)`,
+     - or a dictionary of keyword arguments for `compile_pattern`.
+
+    All rules that search the same folder (or one of its sub-folders) are matched during the same traversal: each
+    folder is listed once and each of its entries is tested against all rules. For example with rules
+    `'data/**/*.ddl'`, `'data/**/*.yml'` and `'data/raw/*.parquet'`, the `data/` folder is traversed only once.
+
+    Within each rule, folders are visited depth-first and the items of a folder are in the order of its entries. This
+    is the same order than `file_pattern` with the default engine when no double wildcard of the rule is followed by
+    more than one pattern part (such as `'data/**/*.ddl'`), whatever the other rules. Otherwise the items are the
+    same, but possibly in a different order.
+
+    :param rules: a dictionary of rules, see above
+    :param cache: an optional persistent cache of folder listings, see `file_pattern`
+    :return: a dictionary with the same keys than `rules`, containing the list of `FileItem` for each rule.
+    """
+    # -- compile all rules
+    patterns = OrderedDict((rule_name, _compile_rule(rule)) for rule_name, rule in rules.items())
+
+    if scandir is None:
+        # legacy python without scandir: one search per rule
+        return OrderedDict((rule_name, list(pattern.iter())) for rule_name, pattern in patterns.items())
+
+    results = OrderedDict((rule_name, []) for rule_name in patterns)
 
-        # create the name
-        name = _create_dst_path(f_path, capt_subpath, names).as_posix()
+    # -- group the rules by search root: a rule searching a sub-folder of another rule's root joins its group
+    groups = OrderedDict()  # root parts -> list of (rule name, pattern parts relative to the root)
+    for rule_name, pattern in sorted(patterns.items(), key=lambda np: np[1].src_glob_start or 0):
+        src_parts = pattern.src_pattern.parts
+        if pattern.src_glob_start is None:
+            # no glob search: the pattern itself is the match, as in `gen_matching_files`
+            results[rule_name].append(pattern.expand(pattern.src_pattern))
+            continue
+        root_parts = src_parts[:pattern.src_glob_start]
+        for group_root in groups:
+            if root_parts[:len(group_root)] == group_root:
+                root_parts = group_root
+                break
+        groups.setdefault(root_parts, []).append((rule_name, src_parts[len(root_parts):]))
+
+    # -- perform one traversal per group
+    if cache is not None:
+        cache, should_close = get_cache(cache)
+    try:
+        for root_parts, members in groups.items():
+            root = str(PurePath(*root_parts)) if root_parts else '.'
+            lister = None if cache is None else cache.list_dir
+            for rule_idx, path in scandir_multi_walk(root, [rel_parts for _, rel_parts in members], lister=lister):
+                rule_name = members[rule_idx][0]
+                results[rule_name].append(patterns[rule_name]._expand_str(path))
+    finally:
+        if cache is not None:
+            if should_close:
+                cache.close()
+            else:
+                cache.flush()
 
-        # finally create the container object and append
-        yield FileItem(src_path=f_path, dst_path=dst_paths,
-                       has_multi_targets=has_multi_targets,
-                       name=name)
+    return results
 
 
-if version_info >= (3, 6):
-    # in python versions that allow it,
-    # modify the signature so that name and others are keyword-only arguments
-    from makefun import with_signature
-    file_pattern = with_signature(_true_fp_sig)(file_pattern)
+if version_info >= (3, 0):
+    # in python versions that allow it, names and others are keyword-only arguments. The function is defined with the
+    # native syntax in a separate module, rather than generated at import time.
+    _legacy_file_pattern = file_pattern
+    from ._py3 import file_pattern  # noqa: F811
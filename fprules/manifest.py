@@ -0,0 +1,126 @@
+"""
+Explicit lists of candidate paths: the source pattern is matched against paths coming from an iterable or a manifest
+file (for example the output of `git ls-files -z`), instead of searching the file system.
+"""
+from mmap import mmap, ACCESS_READ
+from os import fstat
+
+try:
+    from os import fsdecode
+except ImportError:
+    # python 2: paths are bytes strings
+    def fsdecode(b):
+        return b
+
+try:
+    from sys import intern
+except ImportError:
+    # python 2: intern is a builtin
+    pass
+
+try:
+    from pathlib import PurePath
+except ImportError:
+    from pathlib2 import PurePath
+
+from .main import _normalize
+
+try:
+    from typing import Union, Any, Iterable, Tuple, Optional, Pattern
+except ImportError:
+    pass
+
+
+# manifest files larger than this size (in bytes) are memory-mapped instead of read at once
+MMAP_THRESHOLD = 1 << 20
+
+# the size of the blocks of a manifest file decoded at once
+BLOCK_SIZE = 1 << 20
+
+
+def _split_manifest(buf,   # type: Union[bytes, mmap]
+                    size   # type: int
+                    ):
+    # type: (...) -> Iterable[str]
+    """
+    Yields the paths contained in buffer `buf` of `size` bytes. Paths are separated with null characters if there is
+    at least one in the buffer, and with new lines otherwise. Blocks of about `BLOCK_SIZE` bytes are decoded and split
+    at once, so that large memory-mapped files are never fully copied in memory.
+    """
+    delimiter = b'\0' if buf.find(b'\0') >= 0 else b'\n'
+    str_delimiter = fsdecode(delimiter)
+    start = 0
+    while start < size:
+        end = buf.find(delimiter, min(start + BLOCK_SIZE, size))
+        if end < 0:
+            end = size
+        block = fsdecode(buf[start:end])
+        start = end + 1
+        for path_str in block.split(str_delimiter):
+            if delimiter == b'\n':
+                path_str = path_str.rstrip('\r')
+            if path_str:
+                yield path_str
+
+
+def read_manifest(manifest  # type: Union[str, Any]
+                  ):
+    # type: (...) -> Iterable[str]
+    """
+    Yields the paths listed in file `manifest`, separated with new lines or null characters (such as the output of
+    `git ls-files -z`). Empty lines are ignored. Files larger than `MMAP_THRESHOLD` are memory-mapped.
+
+    :param manifest: the path to the manifest file
+    :return: a generator of path strings, as written in the file
+    """
+    with open(str(manifest), 'rb') as f:
+        size = fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        elif size < MMAP_THRESHOLD:
+            for path_str in _split_manifest(f.read(), size):
+                yield path_str
+        else:
+            buf = mmap(f.fileno(), 0, access=ACCESS_READ)
+            try:
+                for path_str in _split_manifest(buf, size):
+                    yield path_str
+            finally:
+                buf.close()
+
+
+def gen_listed_matches(src_regex,           # type: Pattern
+                       src_double_wildcard,  # type: Optional[Tuple[int, Tuple[str, ...]]]
+                       paths                 # type: Union[str, Any, Iterable[Union[str, Any]]]
+                       ):
+    # type: (...) -> Iterable[Tuple[str, Optional[str]]]
+    """
+    Yields a tuple (path string, interned captured sub-path) for each of the listed `paths` matching the source
+    pattern compiled in `src_regex` (see `fprules.walk.compile_glob_regex`). The file system is not accessed, except
+    to read the manifest file: so unlike the walk engines, a source pattern ending with '**' also matches the listed
+    files, not only folders.
+
+    :param src_regex: the compiled source pattern
+    :param src_double_wildcard: the double wildcard information of the source pattern, see `_parse_src_pattern`
+    :param paths: the path to a manifest file (a string or a `PurePath`, see `read_manifest`), or an iterable of
+        strings or objects representing paths. Paths are normalized as `str(Path(...))` does, but are not resolved:
+        relative paths are matched against relative patterns, as if they were relative to the current folder.
+    :return: a generator of tuples (path string, captured sub-path), in the order of `paths`
+    """
+    if isinstance(paths, (str, PurePath)):
+        path_strs = read_manifest(paths)
+    else:
+        path_strs = (str(p) for p in paths)
+
+    match = src_regex.match
+    if src_double_wildcard is None:
+        for path_str in path_strs:
+            path_str = _normalize(path_str)
+            if match(path_str) is not None:
+                yield path_str, None
+    else:
+        for path_str in path_strs:
+            path_str = _normalize(path_str)
+            m = match(path_str)
+            if m is not None:
+                yield path_str, intern(m.group('captured') or '.')
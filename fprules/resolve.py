@@ -0,0 +1,175 @@
+"""
+Inverse resolution: find the source file(s) producing a given target path, by solving the destination template
+instead of searching all the files matching the source pattern.
+"""
+import re
+from os import sep
+from os.path import exists, normcase
+
+from .main import FileItem, _dst_templates, _normalize, _stem
+from .walk import list_dir, _compile_glob_part, _entry_is_dir, _is_wildcard_part, _join, _GLOB_FLAGS
+
+try:
+    from typing import Union, Any, List, Optional, Tuple, Dict, Callable
+    from .main import FilePattern
+except ImportError:
+    pass
+
+
+# placeholders for the stem and captured path fields in a normalized template. They are not path separators, so they
+# are not modified by the normalization.
+_STEM, _CAPTURED = '\0', '\1'
+
+# the cache of compiled inverse templates
+_INVERSE_TEMPLATES = dict()  # type: Dict[str, Callable]
+
+
+def _compile_inverse_template(template  # type: str
+                              ):
+    """
+    Compiles a destination template (see `_compile_dst_template`) into the `match` function of a regular expression
+    matching the normalized paths that it creates, with groups `stem` and `captured`.
+
+    When the captured path is `'.'`, the normalized path does not contain it: so when it is a whole path element, it
+    is optional in the regular expression.
+    """
+    try:
+        return _INVERSE_TEMPLATES[template]
+    except KeyError:
+        pass
+
+    esc_sep = re.escape(sep)
+    groups = {_STEM: '(?P<stem>[^%s]+)' % esc_sep, _CAPTURED: '(?P<captured>.+?)'}
+    backrefs = {_STEM: '(?P=stem)', _CAPTURED: '(?P=captured)'}
+
+    elements = _normalize(template.format(_STEM, _CAPTURED)).split(sep)
+    last = len(elements) - 1
+    regex = ''
+    for i, element in enumerate(elements):
+        element_regex = ''.join((groups.pop(c, None) or backrefs[c]) if c in backrefs else re.escape(c)
+                                for c in element)
+        if element == _CAPTURED and last > 0:
+            # an optional path element, with its separator
+            if i < last:
+                regex += '(?:%s%s)?' % (element_regex, esc_sep)
+            else:
+                regex = regex[:-len(esc_sep)] + '(?:%s%s)?' % (esc_sep, element_regex)
+        else:
+            regex += element_regex + (esc_sep if i < last else '')
+
+    match = re.compile(regex + r'\Z', re.DOTALL | _GLOB_FLAGS).match
+    _INVERSE_TEMPLATES[template] = match
+    return match
+
+
+def _resolve_parts(parts,  # type: Tuple[str, ...]
+                   stem    # type: Optional[str]
+                   ):
+    # type: (...) -> List[str]
+    """
+    Returns the paths of the existing files matching the concrete pattern `parts`, where only the last part contains
+    the stem. Folders are only listed to resolve wildcards: for the typical `'*.ext'` last part, a single `exists`
+    is needed.
+    """
+    dirs = ['.']
+    for part in parts[:-1]:
+        if not _is_wildcard_part(part):
+            dirs = [_join(d, part) for d in dirs]
+        else:
+            matcher = _compile_glob_part(part)
+            dirs = [_join(d, e.name) for d in dirs for e in (list_dir(d) or ())
+                    if matcher(e.name) and _entry_is_dir(e)]
+
+    last = parts[-1]
+    if not _is_wildcard_part(last):
+        names = [last] if stem is None or _stem(last) == stem else []
+        return [p for p in (_join(d, n) for d in dirs for n in names) if exists(p)]
+
+    ext = last[1:]
+    if stem is not None and last[:1] == '*' and ext[:1] == '.' and not _is_wildcard_part(ext) and '.' not in ext[1:]:
+        # '*.ext': the name is known
+        name = stem + ext
+        return [p for p in (_join(d, name) for d in dirs) if exists(p)]
+
+    # list the folder(s)
+    matcher = _compile_glob_part(last)
+    return [_join(d, e.name) for d in dirs for e in (list_dir(d) or ())
+            if matcher(e.name) and (stem is None or _stem(e.name) == stem)]
+
+
+def resolve_target(pattern,  # type: FilePattern
+                   dst_path,  # type: Union[str, Any]
+                   key=None   # type: str
+                   ):
+    # type: (...) -> List[FileItem]
+    """
+    Returns the items of `pattern` producing target `dst_path`, without searching all the files matching the source
+    pattern.
+
+    The destination template is solved against `dst_path` to find the stem and the path captured by the double
+    wildcard. The source path is then known, except for the wildcards of the source pattern: they are resolved by
+    listing only the relevant folder(s). For the typical `'./defs/**/*.ddl'` source pattern, a single `exists` is
+    needed. When a destination template does not use the captured path while the source pattern contains a double
+    wildcard, all the matching sources are searched as a fallback.
+
+    :param pattern: the compiled pattern
+    :param dst_path: the target path. Paths are compared after the same normalization than `str(Path(...))`, but are
+        not resolved.
+    :param key: for patterns with multiple targets, the optional name of the destination to solve. By default, all
+        destinations are tried.
+    :return: the list of items with a destination equal to `dst_path`. It is usually empty or contains a single item.
+    """
+    if key is None:
+        templates = _dst_templates(pattern)
+    elif pattern.has_multi_targets:
+        templates = (pattern.dst_templates[pattern.dst_keys.index(key)][1],)
+    else:
+        raise ValueError("`key` can only be used with patterns with multiple targets")
+
+    target = normcase(_normalize(str(dst_path)))
+    src_parts = pattern.src_pattern.parts
+    found = []
+
+    def add_item(src_str, template):
+        """Adds the item of `src_str` if it is not already found, and if it produces the target"""
+        if pattern.src_regex.match(src_str) is None:
+            # with several double wildcards, the captured path may not match the parts between them
+            return
+        try:
+            item = pattern._expand_str(src_str)
+        except ValueError:
+            # the captured path contains elements that can not be matched by the double wildcard, such as '..'
+            return
+        if item.src_str not in (i.src_str for i in found) \
+                and normcase(_normalize(template.format(_stem(src_str), item.captured_subpath))) == target:
+            found.append(item)
+
+    for template in templates:
+        if pattern.src_glob_start is None:
+            # the source is known
+            add_item(str(pattern.src_pattern), template)
+            continue
+
+        match = _compile_inverse_template(normcase(template))(target)
+        if match is None:
+            continue
+        stem = match.group('stem') if '{0}' in template else None
+
+        if pattern.src_double_wildcard is None:
+            parts = src_parts
+        elif '{1}' in template:
+            captured = match.group('captured')
+            dbl_idx, suffix_parts = pattern.src_double_wildcard
+            captured_parts = tuple(p for p in captured.split(sep) if p and p != '.') if captured else ()
+            parts = src_parts[:dbl_idx] + captured_parts + suffix_parts
+        else:
+            # the path captured by the double wildcard is unknown: search all sources
+            for item in pattern.iter():
+                if stem is None or _stem(item.src_str) == stem:
+                    add_item(item.src_str, template)
+            continue
+
+        for src_str in _resolve_parts(parts, stem):
+            add_item(src_str, template)
+
+    return found
@@ -0,0 +1,179 @@
+"""
+Make-like execution of a command for each item of a file pattern rule, on a pool of processes.
+"""
+from __future__ import print_function
+
+from string import Formatter
+
+from .main import compile_pattern, _dst_templates, _normalize, _stem
+from .targets import prepare_targets
+
+try:
+    from typing import Union, Any, Iterable, List, Dict, Sequence, Tuple, Optional
+    from .main import FilePattern, FileItem
+except ImportError:
+    pass
+
+
+def run_rule(src_pattern,     # type: Union[str, Any]
+             dst_pattern,     # type: Union[str, Any]
+             command,         # type: Union[str, Sequence[str]]
+             names=None,      # type: Union[str, Any]
+             jobs=1,          # type: int
+             force=False,     # type: bool
+             dry_run=False,   # type: bool
+             **search_options
+             ):
+    # type: (...) -> int
+    """
+    Runs `command` for each item of the rule `(src_pattern, dst_pattern)` whose destinations are missing or older
+    than the source, as `make` would do. For example:
+
+    ```python
+    run_rule('defs/**/*.ddl', 'out/%%/%.csv', ['ddl2csv', '{src}', '-o', '{dst}'], jobs=4)
+    ```
+
+    The following placeholders can be used in the command:
+
+     - `{src}`: the source path
+     - `{dst}`: the destination path, for rules with a single target. With several targets, each of them is available
+       with its name, for example `{csv}`.
+     - `{name}`: the name of the item
+     - `{captured}`: the path captured by the double wildcard, or `.`
+
+    All the items to build are listed first, and the folders of all their destinations are created beforehand with
+    `fprules.targets.prepare_targets`. Then the commands are run with at most `jobs` at a time. As soon as a command
+    fails no new command is started, and a `subprocess.CalledProcessError` is raised once the running commands have
+    completed.
+
+    :param src_pattern: the source pattern, see `file_pattern`
+    :param dst_pattern: the destination pattern or dictionary of destination patterns, see `file_pattern`
+    :param command: the command to run for each item, as a list of arguments. If it is a string, it is run by the
+        shell and the paths inserted in it are quoted.
+    :param names: the naming pattern, see `file_pattern`
+    :param jobs: the maximum number of commands running at the same time
+    :param force: if True, the command is run for all items, even if they are up to date
+    :param dry_run: if True, the commands are printed instead of being run, and no folder is created
+    :param search_options: the search options such as `engine`, `cache`, `workers` or `paths`, see `FilePattern.iter`
+    :return: the number of commands run (or printed, with `dry_run`)
+    """
+    # imported here so that importing fprules does not import subprocess
+    import subprocess
+
+    if jobs < 1:
+        raise ValueError("`jobs` should be a positive integer")
+    pattern = compile_pattern(src_pattern, dst_pattern, names=names)
+    shell = isinstance(command, str)
+    _check_placeholders(pattern, [command] if shell else command)
+
+    # -- list all the items to build, and prepare their destination folders
+    items = list(pattern.iter(**search_options) if force else pattern.stale(**search_options))
+    commands = [_format_command(command, _placeholders(item), shell) for item in items]
+    if dry_run:
+        for cmd in commands:
+            print(cmd if shell else ' '.join(_quote(arg) for arg in cmd))
+        return len(commands)
+    prepare_targets(items)
+
+    # -- run the commands
+    if jobs == 1:
+        for cmd in commands:
+            return_code = subprocess.call(cmd, shell=shell)
+            if return_code != 0:
+                raise subprocess.CalledProcessError(return_code, cmd)
+    else:
+        _run_parallel(commands, shell, jobs)
+    return len(commands)
+
+
+def _quote(arg  # type: str
+           ):
+    # type: (...) -> str
+    """Returns `arg` quoted for the shell"""
+    try:
+        from shlex import quote
+    except ImportError:
+        # python 2
+        from pipes import quote
+    return quote(arg)
+
+
+def _check_placeholders(pattern,  # type: FilePattern
+                        command   # type: Sequence[str]
+                        ):
+    """Raises a `ValueError` if an argument of `command` uses an unknown placeholder"""
+    available = {'src', 'name', 'captured'}
+    available.update(pattern.dst_keys if pattern.has_multi_targets else ('dst',))
+    for arg in command:
+        for _, field, _, _ in Formatter().parse(arg):
+            if field is not None and field not in available:
+                raise ValueError("Unknown placeholder '{%s}' in command argument '%s'. Available placeholders: %s"
+                                 % (field, arg, ', '.join('{%s}' % p for p in sorted(available))))
+
+
+def _placeholders(item  # type: FileItem
+                  ):
+    # type: (...) -> Dict[str, str]
+    """Returns the dictionary of placeholder values for `item`"""
+    stem = _stem(item.src_str)
+    values = dict(src=item.src_str, name=item.name, captured=item.captured_subpath or '.')
+    dst_strs = [_normalize(template.format(stem, item.captured_subpath)) for template in _dst_templates(item.pattern)]
+    if item.has_multi_targets:
+        values.update(zip(item.pattern.dst_keys, dst_strs))
+    else:
+        values['dst'] = dst_strs[0]
+    return values
+
+
+def _format_command(command,  # type: Union[str, Sequence[str]]
+                    values,   # type: Dict[str, str]
+                    shell     # type: bool
+                    ):
+    # type: (...) -> Union[str, List[str]]
+    """Returns `command` with the placeholders replaced with `values`, quoted if the command is run by the shell"""
+    if shell:
+        return command.format(**dict((k, _quote(v)) for k, v in values.items()))
+    else:
+        return [arg.format(**values) for arg in command]
+
+
+def _run_parallel(commands,  # type: List[Union[str, List[str]]]
+                  shell,     # type: bool
+                  jobs       # type: int
+                  ):
+    """Runs `commands` with at most `jobs` at a time, and stops starting new ones after the first failure"""
+    import subprocess
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    def run(cmd):
+        return cmd, subprocess.call(cmd, shell=shell)
+
+    pool = ThreadPoolExecutor(max_workers=jobs)
+    pending = set()
+    failure = None
+    try:
+        for cmd in commands:
+            if len(pending) >= jobs:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                failure = _first_failure(done)
+                if failure is not None:
+                    break
+            pending.add(pool.submit(run, cmd))
+        done, _ = wait(pending)
+        failure = failure or _first_failure(done)
+    finally:
+        pool.shutdown()
+
+    if failure is not None:
+        raise subprocess.CalledProcessError(failure[1], failure[0])
+
+
+def _first_failure(done  # type: Iterable
+                   ):
+    # type: (...) -> Optional[Tuple[Union[str, List[str]], int]]
+    """Returns the (command, return code) of the first failed command in the completed futures `done`, if any"""
+    for future in done:
+        cmd, return_code = future.result()
+        if return_code != 0:
+            return cmd, return_code
+    return None
@@ -0,0 +1,127 @@
+"""
+Multi-process file search: the folders to search are split into shards, that are searched by a pool of processes.
+"""
+try:
+    from sys import intern
+except ImportError:
+    # python 2: intern is a builtin
+    pass
+
+try:
+    from pathlib import Path
+except ImportError:
+    from pathlib2 import Path
+
+from .cache import DirListingCache, get_cache
+from .main import _capture_matches, _parse_src_pattern
+from .walk import scandir_engine, split_frames, walk_frames, _compile_glob_part, _RECURSIVE, _compile_segments
+
+try:
+    from typing import Union, Callable, Iterable, Tuple, Optional, List
+except ImportError:
+    pass
+
+
+# the number of tasks created per process. More tasks balance the load better, but have a higher overhead.
+TASKS_PER_PROCESS = 4
+
+
+def _search_shard(src_pattern_str,  # type: str
+                  root_str,         # type: str
+                  frames,           # type: List[Tuple[str, int]]
+                  cache_path        # type: Optional[str]
+                  ):
+    # type: (...) -> Tuple[int, str, Optional[str]]
+    """
+    Searches the files matching `src_pattern_str` from `frames`, in a worker process.
+
+    :return: a compact batch of results `(count, sources, captured)`, where `sources` contains the matching paths
+        joined with null characters, and `captured` the captured sub-paths joined the same way (or None if the source
+        pattern has no double wildcard).
+    """
+    src_pattern = Path(src_pattern_str)
+    src_glob_start, src_double_wildcard = _parse_src_pattern(src_pattern)
+    suffix_matchers = None
+    if src_double_wildcard is not None:
+        suffix_matchers = tuple(_compile_glob_part(p) for p in src_double_wildcard[1])
+
+    cache = None
+    if cache_path is not None:
+        cache, _ = get_cache(cache_path)
+    try:
+        paths = walk_frames(frames, src_pattern.parts[src_glob_start:], lister=cache and cache.list_dir)
+        matches = list(_capture_matches(paths, src_pattern, root_str, src_glob_start, src_double_wildcard,
+                                        suffix_matchers))
+    finally:
+        if cache is not None:
+            cache.close()
+
+    sources = '\0'.join(src for src, _ in matches)
+    captured = None if src_double_wildcard is None else '\0'.join(c for _, c in matches)
+    return len(matches), sources, captured
+
+
+def _run_task(args):
+    """Runs `_search_shard` with the tuple of arguments `args`"""
+    return _search_shard(*args)
+
+
+def gen_sharded_matches(src_pattern,          # type: Path
+                        root_str,             # type: str
+                        src_glob_start,       # type: int
+                        src_double_wildcard,  # type: Optional[Tuple[int, Tuple[str, ...]]]
+                        walk_engine,          # type: Callable
+                        cache,                # type: Union[str, DirListingCache]
+                        ordered,              # type: bool
+                        processes             # type: int
+                        ):
+    # type: (...) -> Iterable[Tuple[str, Optional[str]]]
+    """
+    Implementation of `_gen_matching_strs` with `processes`: the walk is split into frames in the current process
+    (see `split_frames`), and contiguous groups of frames are searched by a pool of `processes` processes. Each
+    process also computes the paths captured by the double wildcard, and returns its results as a compact batch of
+    strings. The batches are merged back in the order of the serial walk, or as soon as they are ready if `ordered`
+    is False.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    if processes < 1:
+        raise ValueError("`processes` should be a positive integer, found %r" % processes)
+    if walk_engine is not scandir_engine:
+        raise ValueError("`processes` is only supported by the 'scandir' walk engine")
+
+    cache_path = None
+    if cache is not None:
+        cache_path = cache.path if isinstance(cache, DirListingCache) else str(cache)
+
+    # -- split the walk, and group the frames in contiguous tasks
+    pattern_parts = src_pattern.parts[src_glob_start:]
+    nb_tasks = processes * TASKS_PER_PROCESS
+    frames = split_frames(root_str, pattern_parts, nb_tasks)
+    task_size = max(-(-len(frames) // nb_tasks), 1)
+    tasks = [(str(src_pattern), root_str, frames[i:i + task_size], cache_path)
+             for i in range(0, len(frames), task_size)]
+
+    # several '**' may match the same path several times: remember the ones already yielded
+    yielded = set() if sum(1 for k, _ in _compile_segments(pattern_parts) if k == _RECURSIVE) > 1 else None
+
+    pool = ProcessPoolExecutor(max_workers=processes)
+    futures = [pool.submit(_run_task, t) for t in tasks]
+    try:
+        batches = (f.result() for f in (futures if ordered else as_completed(futures)))
+
+        for count, sources, captured in batches:
+            if count == 0:
+                continue
+            sources = sources.split('\0')
+            captured = [None] * count if captured is None else [intern(c) for c in captured.split('\0')]
+            for match in zip(sources, captured):
+                if yielded is not None:
+                    if match[0] in yielded:
+                        continue
+                    yielded.add(match[0])
+                yield match
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=False)
@@ -0,0 +1,74 @@
+"""
+Staleness filter: only yield the items whose destinations need to be rebuilt, with the same rules than `make`.
+"""
+from .main import FileItem, _gen_matching_strs, _normalize, _stem, _dst_templates
+from .walk import EntriesMemo, _mtime_ns
+
+try:
+    from typing import Iterable, Optional
+    from .main import FilePattern
+except ImportError:
+    pass
+
+
+def gen_stale_items(pattern,  # type: FilePattern
+                    **walk_options
+                    ):
+    # type: (...) -> Iterable[FileItem]
+    """
+    Lists all files matching the source pattern of `pattern` and only yields the stale items, that is, the items with
+    at least one destination that does not exist or is older than the source. As in `make`, a destination with the
+    same modification time than its source is up to date.
+
+    The file system is accessed as little as possible:
+
+     - the modification time of each source is read from the folder listings made by the walk when possible (this
+       does not require any system call on windows), or with a single `stat` otherwise.
+     - each destination folder is listed once, so that missing destinations are detected without any `stat`. Only
+       the existing destinations are `stat`-ed, which does not require any system call on windows either.
+
+    :param pattern: the compiled pattern
+    :param walk_options: the walk options, see `FilePattern.iter`
+    :return: a generator of `FileItem`
+    """
+    templates = _dst_templates(pattern)
+    entries = EntriesMemo()
+
+    for src_str, captured_subpath in _gen_matching_strs(pattern.src_pattern, pattern.src_glob_start,
+                                                        pattern.src_double_wildcard, pattern.src_suffix_matchers,
+                                                        entries=entries, **walk_options):
+        src_stat = entries.stat(src_str)
+        if src_stat is None:
+            # removed during the search
+            continue
+        src_mtime = _mtime_ns(src_stat)
+
+        stem = _stem(src_str)
+        for template in templates:
+            dst_stat = entries.stat(_normalize(template.format(stem, captured_subpath)), list_missing=True)
+            if dst_stat is None or _mtime_ns(dst_stat) < src_mtime:
+                yield FileItem(pattern, src_str, captured_subpath)
+                break
+
+
+def is_stale(item  # type: FileItem
+             ):
+    # type: (...) -> Optional[bool]
+    """
+    Returns True if at least one destination of `item` does not exist or is older than its source, False if all are
+    up to date, and None if the source does not exist.
+
+    :param item: a `FileItem`
+    :return:
+    """
+    entries = EntriesMemo()
+    src_stat = entries.stat(item.src_str)
+    if src_stat is None:
+        return None
+    src_mtime = _mtime_ns(src_stat)
+    stem = _stem(item.src_str)
+    for template in _dst_templates(item.pattern):
+        dst_stat = entries.stat(_normalize(template.format(stem, item.captured_subpath)))
+        if dst_stat is None or _mtime_ns(dst_stat) < src_mtime:
+            return True
+    return False
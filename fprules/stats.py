@@ -0,0 +1,188 @@
+"""
+Opt-in instrumentation of the file searches: counters and cumulative timings per phase, collected in a `MatchStats`.
+"""
+from collections import OrderedDict
+from threading import Lock
+
+try:
+    from time import perf_counter as _timer
+except ImportError:
+    # python 2
+    from timeit import default_timer as _timer
+
+try:
+    from typing import Callable, Iterable, Optional, List, Any, Dict
+    from .cache import DirListingCache
+except ImportError:
+    pass
+
+
+class MatchStats(object):
+    """
+    Statistics of one or several file searches, collected when passed as `stats` to `file_pattern`,
+    `gen_matching_files` or the methods of `FilePattern`. For example:
+
+    ```python
+    stats = MatchStats()
+    items = list(file_pattern('./defs/**/*.ddl', './downloaded/%%/%.csv', stats=stats))
+    print(stats.to_dict())
+    ```
+
+    Counters:
+
+     - `dirs_listed`: the number of folders listed (including the ones listed from a cache)
+     - `entries_examined`: the number of entries found in these folders, each tested against the pattern
+     - `pruned_dirs`: the number of sub-folders found in the listings that the walk does not enter, because they can
+       not contain any match. Symbolic links to folders are not counted. This relies on the file types reported by
+       the listings: on the rare file systems that do not report them, counting costs one `lstat` per skipped entry,
+       not included in `fs_calls`.
+     - `fs_calls`: the number of system calls made to list the folders (one `scandir` per folder, plus one `stat`
+       per folder with a listing cache)
+     - `cached_dirs`: the number of folder listings read from a listing cache
+     - `matches`: the number of matches
+
+    Cumulative timings in seconds, per phase:
+
+     - `listing`: listing folders
+     - `walk`: matching the folder entries with the pattern, apart from listing
+     - `capture`: finding the paths captured by the double wildcards
+     - `items`: creating the items (or the table). The destinations and names of the items are created lazily, when
+       they are first accessed: this is not included.
+
+    Counters about folders are only available with the walk engines accepting a `lister`, such as the default
+    `'scandir'` engine, and are not collected in the worker processes when `processes` is used. When stats are not
+    requested, the searches are not instrumented at all.
+
+    The same object can be used for several searches: the statistics are accumulated.
+    """
+    __slots__ = ('dirs_listed', 'entries_examined', 'pruned_dirs', 'fs_calls', 'cached_dirs', 'matches',
+                 '_listing_time', '_walk_time', '_search_time', '_total_time', '_lock')
+
+    def __init__(self):
+        self.dirs_listed = 0
+        self.entries_examined = 0
+        self.pruned_dirs = 0
+        self.fs_calls = 0
+        self.cached_dirs = 0
+        self.matches = 0
+        # inclusive timings: the walk includes the listing, the search includes the walk, and the total includes all
+        self._listing_time = 0.
+        self._walk_time = 0.
+        self._search_time = 0.
+        self._total_time = 0.
+        self._lock = Lock()
+
+    @property
+    def timings(self):
+        # type: (...) -> Dict[str, float]
+        """The ordered dictionary of cumulative timings (in seconds) per phase"""
+        # use an OrderedDict for legacy python compatibility
+        return OrderedDict([('listing', self._listing_time),
+                            ('walk', max(self._walk_time - self._listing_time, 0.)),
+                            ('capture', max(self._search_time - self._walk_time, 0.)),
+                            ('items', max(self._total_time - self._search_time, 0.))])
+
+    def to_dict(self):
+        # type: (...) -> Dict[str, Any]
+        """Returns an ordered dictionary of the counters, with the per-phase timings under the `'timings'` key"""
+        return OrderedDict([('dirs_listed', self.dirs_listed), ('entries_examined', self.entries_examined),
+                            ('pruned_dirs', self.pruned_dirs), ('fs_calls', self.fs_calls),
+                            ('cached_dirs', self.cached_dirs), ('matches', self.matches),
+                            ('timings', self.timings)])
+
+    def to_json(self, **kwargs):
+        # type: (...) -> str
+        """Returns the JSON representation of `to_dict()`. Keyword arguments are passed to `json.dumps`"""
+        import json
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def __repr__(self):
+        return "MatchStats(%s)" % ', '.join('%s=%r' % (k, v) for k, v in self.to_dict().items() if k != 'timings')
+
+    def lister(self,
+               lister  # type: Callable[[str], Optional[List[Any]]]
+               ):
+        # type: (...) -> Callable[[str], Optional[List[Any]]]
+        """
+        Returns a folder lister equivalent to `lister`, that counts and times the listings, with one system call per
+        listing. It can be called from several threads.
+
+        :param lister: the folder lister to instrument
+        """
+        def counting_lister(dir_path):
+            start = _timer()
+            entries = lister(dir_path)
+            elapsed = _timer() - start
+            with self._lock:
+                self._listing_time += elapsed
+                self.fs_calls += 1
+                if entries is not None:
+                    self.dirs_listed += 1
+                    self.entries_examined += len(entries)
+            return entries
+        return counting_lister
+
+    def cache_lister(self,
+                     cache  # type: DirListingCache
+                     ):
+        # type: (...) -> Callable[[str], Optional[List[Any]]]
+        """
+        Returns a folder lister equivalent to `cache.list_dir`, that counts and times the listings, including the
+        ones read from the cache. It can be called from several threads.
+
+        :param cache: the listing cache
+        """
+        list_dir = cache._list_dir
+
+        def counting_lister(dir_path):
+            start = _timer()
+            entries, cached, fs_calls = list_dir(dir_path)
+            elapsed = _timer() - start
+            with self._lock:
+                self._listing_time += elapsed
+                self.fs_calls += fs_calls
+                if entries is not None:
+                    self.dirs_listed += 1
+                    self.entries_examined += len(entries)
+                    self.cached_dirs += cached
+            return entries
+        return counting_lister
+
+    def count_pruned(self,
+                     nb_dirs  # type: int
+                     ):
+        """Adds `nb_dirs` sub-folders not entered by the walk. It is passed as `pruned` to the walk engine."""
+        if nb_dirs:
+            with self._lock:
+                self.pruned_dirs += nb_dirs
+
+    def timed(self,
+              iterable,  # type: Iterable
+              phase      # type: str
+              ):
+        # type: (...) -> Iterable
+        """
+        Yields the elements of `iterable`, adding the time spent to get them to the inclusive timing of `phase`:
+        `'walk'` (the results of the walk engine), `'search'` (the matches, that are also counted) or `'total'` (the
+        items).
+        """
+        attr = '_%s_time' % phase
+        it = iter(iterable)
+        elapsed = 0.
+        count = 0
+        try:
+            while True:
+                start = _timer()
+                try:
+                    element = next(it)
+                except StopIteration:
+                    elapsed += _timer() - start
+                    break
+                elapsed += _timer() - start
+                count += 1
+                yield element
+        finally:
+            with self._lock:
+                setattr(self, attr, getattr(self, attr) + elapsed)
+                if phase == 'search':
+                    self.matches += count
@@ -0,0 +1,319 @@
+"""
+A columnar representation of the results of a file pattern rule, for very large sets of matches.
+"""
+import sys
+from array import array
+from itertools import chain
+from os import sep
+
+try:
+    from itertools import accumulate
+except ImportError:
+    # python 2
+    def accumulate(iterable):
+        total = 0
+        for x in iterable:
+            total += x
+            yield total
+
+from .main import FileItem, _stem, _normalize
+
+try:
+    from typing import Iterable, List, Optional, Tuple, Union, Callable, Any, Sequence, Dict
+    from .main import FilePattern
+except ImportError:
+    pass
+
+
+def _uint_typecode(max_value  # type: int
+                   ):
+    # type: (...) -> str
+    """
+    Returns the typecode of the `array`s storing unsigned integers up to `max_value`. 'L' is only 32 bits on some
+    platforms such as Windows, where the 64 bits 'Q' is used for larger values.
+    """
+    if max_value < 1 << (8 * array('L').itemsize):
+        return 'L'
+    try:
+        array('Q')
+        return 'Q'
+    except ValueError:
+        # python 2: 'Q' is not available
+        return 'L'
+
+
+# the typecode of the arrays of codes of `CategoricalColumn`s: any number of distinct values can be indexed
+_CODES_TYPECODE = _uint_typecode(sys.maxsize)
+
+
+def _indices_list(indices  # type: Iterable[int]
+                  ):
+    # type: (...) -> List[int]
+    """Returns `indices` as a list of python integers, converting numpy arrays at once"""
+    return indices.tolist() if hasattr(indices, 'tolist') else list(indices)
+
+
+class StrColumn(object):
+    """
+    An immutable column of strings, stored contiguously in a single string with the offsets of each element.
+    """
+    __slots__ = ('_buf', '_offsets')
+
+    def __init__(self,
+                 strs=()  # type: Iterable[str]
+                 ):
+        strs = list(strs)
+        self._buf = '\0'.join(strs)
+        self._offsets = array(_uint_typecode(len(self._buf) + 1), chain((0,), accumulate(len(s) + 1 for s in strs)))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        # type: (int) -> str
+        if i < 0:
+            i += len(self)
+        return self._buf[self._offsets[i]:self._offsets[i + 1] - 1]
+
+    def tolist(self):
+        # type: (...) -> List[str]
+        """Returns the list of strings in this column"""
+        return self._buf.split('\0') if len(self) else []
+
+    def take(self,
+             indices  # type: Iterable[int]
+             ):
+        # type: (...) -> StrColumn
+        """Returns a new column with the elements at positions `indices`. This creates one string per element."""
+        buf, offsets = self._buf, self._offsets
+        return StrColumn([buf[offsets[i]:offsets[i + 1] - 1] for i in _indices_list(indices)])
+
+
+class CategoricalColumn(object):
+    """
+    An immutable column of strings with many duplicates, stored as an array of integer codes and a list of values.
+    """
+    __slots__ = ('codes', 'values')
+
+    def __init__(self,
+                 codes,  # type: array
+                 values  # type: List[str]
+                 ):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        # type: (int) -> str
+        return self.values[self.codes[i]]
+
+    def tolist(self):
+        # type: (...) -> List[str]
+        """Returns the list of strings in this column"""
+        values = self.values
+        return [values[c] for c in self.codes]
+
+    def take(self,
+             indices  # type: Iterable[int]
+             ):
+        # type: (...) -> CategoricalColumn
+        """Returns a new column with the elements at positions `indices`"""
+        codes = self.codes
+        return CategoricalColumn(array(codes.typecode, [codes[i] for i in _indices_list(indices)]), self.values)
+
+
+class FileTable(object):
+    """
+    The results of a file pattern rule, stored in columns instead of one `FileItem` per match. See
+    `FilePattern.table()` or `file_pattern(..., as_table=True)`.
+
+    Only the source paths and the paths captured by the double wildcard are stored: the source paths are packed in a
+    single string, and the captured paths are stored once per distinct value. The `'name'` column and the destination
+    columns (`'dst_path'`, or one column per destination name when there are multiple targets) are computed on demand
+    from the compiled templates, without creating `Path` objects.
+
+    Tables can be filtered, sorted, and exported to lists or to numpy arrays. `FileItem`s are only created when rows
+    are accessed with `table[i]` or by iterating on the table. Note that filtering and sorting are not vectorized:
+    they loop over the rows in python and create one string per row of the column used, and `take` creates one
+    string per selected source path. Only the captured paths are filtered once per distinct value.
+    """
+    __slots__ = ('pattern', '_src', '_captured')
+
+    def __init__(self,
+                 pattern,  # type: FilePattern
+                 src,      # type: StrColumn
+                 captured  # type: Optional[CategoricalColumn]
+                 ):
+        """
+        Creates a table from its columns. Users should rather use `FileTable.from_matches`.
+
+        :param pattern: the compiled pattern
+        :param src: the column of normalized source path strings
+        :param captured: the column of captured paths, or None if the source pattern has no double wildcard
+        """
+        self.pattern = pattern
+        self._src = src
+        self._captured = captured
+
+    @classmethod
+    def from_matches(cls,
+                     pattern,  # type: FilePattern
+                     matches   # type: Iterable[Tuple[str, Optional[str]]]
+                     ):
+        # type: (...) -> FileTable
+        """
+        Creates a table from the compiled pattern and an iterable of (normalized source path string, captured path)
+        tuples.
+        """
+        srcs = []
+        if pattern.src_double_wildcard is None:
+            for src, _ in matches:
+                srcs.append(src)
+            return cls(pattern, StrColumn(srcs), None)
+        else:
+            codes = array(_CODES_TYPECODE)
+            values = []
+            values_idx = dict()
+            for src, captured in matches:
+                srcs.append(src)
+                try:
+                    codes.append(values_idx[captured])
+                except KeyError:
+                    codes.append(values_idx.setdefault(captured, len(values)))
+                    values.append(captured)
+            return cls(pattern, StrColumn(srcs), CategoricalColumn(codes, values))
+
+    def __len__(self):
+        return len(self._src)
+
+    @property
+    def columns(self):
+        # type: (...) -> Tuple[str, ...]
+        """The names of the columns of this table"""
+        dst_columns = self.pattern.dst_keys if self.pattern.has_multi_targets else ('dst_path',)
+        return ('name', 'src_path', 'captured_subpath') + dst_columns
+
+    def column(self,
+               name  # type: str
+               ):
+        # type: (...) -> List[str]
+        """
+        Returns the list of strings in column `name`. Paths are native path strings, except names that always use
+        forward slashes as in `FileItem.name`. The `'captured_subpath'` column contains `None` if the source pattern
+        has no double wildcard.
+
+        :param name: the name of the column, see `columns`
+        :return:
+        """
+        if name == 'src_path':
+            return self._src.tolist()
+        elif name == 'captured_subpath':
+            return self._captured.tolist() if self._captured is not None else [None] * len(self)
+        elif name == 'name':
+            names = self._format(self.pattern.names_template)
+            return names if sep == '/' else [n.replace(sep, '/') for n in names]
+        elif name == 'dst_path' and not self.pattern.has_multi_targets:
+            return self._format(self.pattern.dst_templates)
+        elif self.pattern.has_multi_targets and name in self.pattern.dst_keys:
+            return self._format(self.pattern.dst_templates[self.pattern.dst_keys.index(name)][1])
+        else:
+            raise KeyError("Unknown column '%s'. Available columns: %s" % (name, self.columns))
+
+    def _format(self,
+                template  # type: str
+                ):
+        # type: (...) -> List[str]
+        """Computes the column of normalized path strings created with compiled template `template`"""
+        srcs = self._src.tolist()
+        if self._captured is None:
+            return [_normalize(template.format(_stem(s))) for s in srcs]
+        else:
+            return [_normalize(template.format(_stem(s), c)) for s, c in zip(srcs, self._captured.tolist())]
+
+    def to_lists(self,
+                 *columns  # type: str
+                 ):
+        # type: (...) -> Dict[str, List[str]]
+        """
+        Returns a dictionary containing the list of strings for each column in `columns` (default: all columns).
+        """
+        return dict((c, self.column(c)) for c in (columns or self.columns))
+
+    def to_numpy(self,
+                 *columns  # type: str
+                 ):
+        # type: (...) -> Dict[str, Any]
+        """
+        Returns a dictionary containing a numpy string array for each column in `columns` (default: all columns).
+        This requires `numpy`.
+        """
+        import numpy as np
+        return dict((c, np.array(self.column(c), dtype=str)) for c in (columns or self.columns))
+
+    def take(self,
+             indices  # type: Iterable[int]
+             ):
+        # type: (...) -> FileTable
+        """Returns a new table containing the rows at positions `indices`, in this order"""
+        indices = list(indices)
+        captured = self._captured.take(indices) if self._captured is not None else None
+        return FileTable(self.pattern, self._src.take(indices), captured)
+
+    def filter(self,
+               mask,             # type: Union[Sequence[bool], Callable[[str], bool]]
+               column='src_path'  # type: str
+               ):
+        # type: (...) -> FileTable
+        """
+        Returns a new table containing the rows selected by `mask`. This is not vectorized: a function `mask` is called
+        once per row, except for the `'captured_subpath'` column where it is called once per distinct value.
+
+        :param mask: a sequence of booleans with one element per row, such as a numpy boolean array. It can also be a
+            function, that is applied to each element of `column`.
+        :param column: the column to apply `mask` on when it is a function.
+        :return:
+        """
+        if callable(mask):
+            if column == 'captured_subpath' and self._captured is not None:
+                selected = [bool(mask(v)) for v in self._captured.values]
+                return self.take(i for i, c in enumerate(self._captured.codes) if selected[c])
+            mask = [mask(v) for v in self.column(column)]
+        elif len(mask) != len(self):
+            raise ValueError("The mask should have one element per row: %s, found %s" % (len(self), len(mask)))
+        if hasattr(mask, 'nonzero'):
+            # numpy boolean array
+            return self.take(mask.nonzero()[0])
+        return self.take(i for i, m in enumerate(mask) if m)
+
+    def sort(self,
+             by='src_path',  # type: str
+             reverse=False   # type: bool
+             ):
+        # type: (...) -> FileTable
+        """
+        Returns a new table with rows sorted on the strings of column `by`. This is not vectorized: the strings of
+        the column are created and sorted in python.
+        """
+        values = self.column(by)
+        return self.take(sorted(range(len(values)), key=values.__getitem__, reverse=reverse))
+
+    def __getitem__(self, i):
+        # type: (int) -> FileItem
+        """Returns the `FileItem` for row `i`"""
+        return FileItem(self.pattern, self._src[i], self._captured[i] if self._captured is not None else None)
+
+    def __iter__(self):
+        # type: (...) -> Iterable[FileItem]
+        """Yields the `FileItem` of each row"""
+        pattern = self.pattern
+        if self._captured is None:
+            for src in self._src.tolist():
+                yield FileItem(pattern, src)
+        else:
+            for src, captured in zip(self._src.tolist(), self._captured.tolist()):
+                yield FileItem(pattern, src, captured)
+
+    def __repr__(self):
+        return "<FileTable of %s rows for %r>" % (len(self), str(self.pattern.src_pattern))
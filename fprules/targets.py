@@ -0,0 +1,173 @@
+"""
+Preparation of the destinations of many items at once: their folders are created in a single deduplicated pass.
+"""
+import os
+from errno import EEXIST
+from itertools import groupby
+from os.path import dirname, basename, isdir, sep
+
+from .main import _dst_templates, _normalize, _stem
+from .table import FileTable
+
+try:
+    from typing import Union, Iterable, Set, List, Tuple, Optional
+    from .main import FileItem, FilePattern
+except ImportError:
+    pass
+
+
+def prepare_targets(items,        # type: Union[Iterable[FileItem], FileTable]
+                    workers=None  # type: int
+                    ):
+    # type: (...) -> int
+    """
+    Creates the folders of all the destinations of `items`, so that the targets can be written without calling
+    `mkdir` for each of them. For example:
+
+    ```python
+    items = list(file_pattern('./defs/**/*.ddl', './downloaded/%%/%.csv'))
+    prepare_targets(items)
+    ```
+
+    The distinct destination folders are computed from the compiled templates without creating `Path` objects, and
+    once per captured path when the folder does not depend on the stem. Only the deepest folders are checked: when
+    they all exist, a single `stat` per folder is needed. For the missing ones, parents are checked up to the first one
+    that exists or is already known to exist. Only the missing folders are then created, parents first, with one
+    `mkdir` per folder.
+
+    :param items: an iterable of `FileItem`, possibly from several patterns, or a `FileTable`
+    :param workers: an optional number of threads to use to check and create the folders concurrently. Folders at
+        the same depth are handled in parallel, which is much faster on network file systems.
+    :return: the number of folders created
+    """
+    if workers is not None and workers < 1:
+        raise ValueError("`workers` should be a positive integer")
+
+    # -- the deepest distinct folders, the others are created with them
+    dst_dirs = _dst_dirs(items)
+    parents = set()
+    for dst_dir in dst_dirs:
+        parents.update(_parents(dst_dir))
+    leaves = dst_dirs - parents
+
+    if workers is None:
+        def run(func, dir_paths):
+            return [func(d) for d in dir_paths]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=workers)
+
+        def run(func, dir_paths):
+            return list(pool.map(func, dir_paths))
+
+    try:
+        # -- check the existing folders
+        leaves = sorted(leaves)
+        missing = []
+        existing = set()
+        for dst_dir, exists in zip(leaves, run(isdir, leaves)):
+            if exists:
+                existing.update(_parents(dst_dir))
+            else:
+                missing.append(dst_dir)
+        if not missing:
+            return 0
+
+        # -- find their missing parents, up to the first one that exists or is already known
+        to_create = set(missing)
+        for dst_dir in missing:
+            for parent in _parents(dst_dir):
+                if parent in existing or parent in to_create:
+                    break
+                if isdir(parent):
+                    existing.add(parent)
+                    break
+                to_create.add(parent)
+
+        # -- create them, parents first
+        nb_created = 0
+        for _, level in groupby(sorted(to_create, key=lambda d: (d.count(sep), d)), key=lambda d: d.count(sep)):
+            nb_created += sum(run(_mkdir, list(level)))
+        return nb_created
+    finally:
+        if workers is not None:
+            pool.shutdown()
+
+
+def _dst_dirs(items  # type: Union[Iterable[FileItem], FileTable]
+              ):
+    # type: (...) -> Set[str]
+    """Returns the set of the normalized destination folders of `items`, except the current folder"""
+    if isinstance(items, FileTable):
+        pattern = items.pattern
+        rows = ((pattern, src_str, captured_subpath) for src_str, captured_subpath
+                in zip(items.column('src_path'), items.column('captured_subpath')))
+    else:
+        rows = ((item.pattern, item.src_str, item.captured_subpath) for item in items)
+
+    dst_dirs = set()
+    last_pattern = None
+    templates = ()
+    memo = dict()
+    for pattern, src_str, captured_subpath in rows:
+        if pattern is not last_pattern:
+            templates = _dir_templates(pattern)
+            last_pattern = pattern
+
+        stem = None
+        for template, dir_template in templates:
+            if dir_template is not None:
+                # the folder only depends on the captured path
+                try:
+                    dst_dir = memo[(dir_template, captured_subpath)]
+                except KeyError:
+                    dst_dir = memo[(dir_template, captured_subpath)] = \
+                        _normalize(dir_template.format(None, captured_subpath))
+            else:
+                if stem is None:
+                    stem = _stem(src_str)
+                dst_dir = dirname(_normalize(template.format(stem, captured_subpath))) or '.'
+            dst_dirs.add(dst_dir)
+
+    dst_dirs.discard('.')
+    return dst_dirs
+
+
+def _dir_templates(pattern  # type: FilePattern
+                   ):
+    # type: (...) -> List[Tuple[str, Optional[str]]]
+    """
+    Returns the list of (template, folder template) for all the destinations of `pattern`. The folder template is
+    None if the destination folder depends on the stem, or if the file name depends on the captured path (that can
+    contain several path elements).
+    """
+    dir_templates = []
+    for template in _dst_templates(pattern):
+        dir_template = dirname(template)
+        if '{0}' in dir_template or '{1}' in basename(template):
+            dir_template = None
+        dir_templates.append((template, dir_template))
+    return dir_templates
+
+
+def _parents(dir_path  # type: str
+             ):
+    # type: (...) -> Iterable[str]
+    """Yields the parent folders of normalized folder path `dir_path`, except the root and the current folder"""
+    parent = dirname(dir_path)
+    while parent and dirname(parent) != parent:
+        yield parent
+        parent = dirname(parent)
+
+
+def _mkdir(dir_path  # type: str
+           ):
+    # type: (...) -> bool
+    """Creates folder `dir_path` if it does not exist, and returns True if it was created"""
+    try:
+        os.mkdir(dir_path)
+        return True
+    except OSError as e:
+        if e.errno == EEXIST and isdir(dir_path):
+            return False
+        raise
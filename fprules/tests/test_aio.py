@@ -0,0 +1,80 @@
+import sys
+
+import pytest
+
+try:
+    from pathlib import Path
+except ImportError:
+    from pathlib2 import Path
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7), reason="asyncio.run requires python 3.7 or higher")
+
+if sys.version_info >= (3, 7):
+    import asyncio
+    from fprules import file_pattern, afile_pattern
+
+
+def test_afile_pattern():
+    resources = Path(__file__).parent / "resources"
+    expected = [str(r) for r in file_pattern(resources / "**/*", "./%%/%.toto")]
+
+    async def collect(**kwargs):
+        return [str(r) async for r in afile_pattern(resources / "**/*", "./%%/%.toto", **kwargs)]
+
+    assert asyncio.run(collect()) == expected
+    # small batches and queue: the producer has to wait for the consumer
+    assert asyncio.run(collect(batch_size=2, max_batches=1)) == expected
+
+
+def test_afile_pattern_early_stop():
+    resources = Path(__file__).parent / "resources"
+
+    async def first():
+        agen = afile_pattern(resources / "**/*", "./%%/%.toto", batch_size=1, max_batches=1)
+        async for item in agen:
+            await agen.aclose()
+            return item
+
+    assert asyncio.run(first()) is not None
+
+
+def test_afile_pattern_errors():
+    async def collect(src, dst, **kwargs):
+        return [r async for r in afile_pattern(src, dst, **kwargs)]
+
+    # invalid pattern
+    with pytest.raises(ValueError):
+        asyncio.run(collect("*.ddl", "%%/%.csv"))
+
+    # error during the search
+    def failing_engine(root, pattern_parts):
+        yield 'a.ddl'
+        raise RuntimeError("walk error")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect("*.ddl", "%.csv", engine=failing_engine))
+
+
+def test_afile_pattern_options(tmpdir):
+    """The options of `file_pattern` are supported, except `as_table`"""
+    from inspect import signature
+    assert set(signature(file_pattern).parameters) - set(signature(afile_pattern).parameters) == set()
+
+    for name in ('a', 'b', 'c'):
+        tmpdir.join('defs', '%s.ddl' % name).write(name, ensure=True)
+    tmpdir.join('out', 'a.csv').write('a', ensure=True)
+
+    async def collect(**kwargs):
+        return [r async for r in afile_pattern('defs/*.ddl', 'out/%.csv', **kwargs)]
+
+    with tmpdir.as_cwd():
+        paths = ['defs/b.ddl', 'other/x.ddl']
+        assert asyncio.run(collect(paths=paths)) == list(file_pattern('defs/*.ddl', 'out/%.csv', paths=paths))
+        assert sorted(r.name for r in asyncio.run(collect(only_stale=True))) == ['b', 'c']
+        fingerprints = dict((r.name, r.fingerprint) for r in asyncio.run(collect(fingerprint='sha256')))
+        assert fingerprints == dict((r.name, r.fingerprint) for r in file_pattern('defs/*.ddl', 'out/%.csv',
+                                                                                  fingerprint='sha256'))
+        with pytest.raises(ValueError):
+            asyncio.run(collect(as_table=True))
+        with pytest.raises(ValueError):
+            asyncio.run(collect(hash_cache='.hashes'))
@@ -11,12 +11,40 @@ except ImportError:
     from pathlib2 import Path, PurePath
 
 
-@pytest.mark.skipif(sys.version_info < (3, 6), reason="Keyword-only argument require python3.6 or higher")
+@pytest.mark.skipif(sys.version_info < (3, 0), reason="Keyword-only argument require python3")
 def test_signature_has_keyword_only():
     with pytest.raises(TypeError):
         file_pattern('*.*', '%', '%')
 
 
+@pytest.mark.skipif(sys.version_info < (3, 0), reason="Keyword-only argument require python3")
+def test_signature_same_as_legacy(monkeypatch):
+    """The python 3 `file_pattern` has the same parameters and defaults than the legacy one, and forwards them all"""
+    from inspect import signature
+    import fprules._py3 as py3
+    from fprules.main import _legacy_file_pattern
+
+    params = signature(file_pattern).parameters
+    legacy_params = signature(_legacy_file_pattern).parameters
+    assert [(p.name, p.default) for p in params.values()] == [(p.name, p.default) for p in legacy_params.values()]
+
+    received = []
+    monkeypatch.setattr(py3, '_legacy_file_pattern', lambda *args, **kwargs: received.append((args, kwargs)))
+    kwargs = dict((name, object()) for name in list(params)[2:])
+    file_pattern('src', 'dst', **kwargs)
+    assert received == [(('src', 'dst'), kwargs)]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="The version is computed lazily on python 3.7 or higher")
+def test_import_is_light():
+    """Importing fprules should not import the modules only needed by some features, nor compute the version"""
+    import subprocess
+    code = "import sys, fprules; print(','.join(m for m in ('asyncio', 'sqlite3', 'ctypes', 'pickle', 'tempfile', " \
+           "'subprocess', 'setuptools_scm', 'makefun') if m in sys.modules))"
+    out = subprocess.check_output([sys.executable, '-c', code], cwd=str(Path(__file__).parents[2]))
+    assert out.decode('utf-8').strip() == ''
+
+
 def test_stem_only_simplest():
     # locate the resources folder
     resources = Path(__file__).parent / "resources" / "basics"
@@ -111,3 +139,18 @@ def test_several_double_wildcards():
     ]
     # order is different on travis/linux
     assert set([str(r) for r in res]) == set(expected)
+
+
+def test_double_wildcard_capture_no_suffix():
+    # locate the resources folder
+    resources = Path(__file__).parent / "resources" / "basics"
+
+    # a trailing double wildcard matches folders only, the whole variable part is captured
+    res = file_pattern(str(resources) + "/foo/**", "./target/%%")
+    expected = [
+        "[foo] %s/foo -> target" % resources.as_posix(),
+        "[bar/bar] %s/foo/bar -> target/bar" % resources.as_posix(),
+        "[barbar/barbar] %s/foo/barbar -> target/barbar" % resources.as_posix(),
+    ]
+    # order is different on travis/linux
+    assert set([str(r) for r in res]) == set(expected)
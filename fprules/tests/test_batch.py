@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+import fprules.walk as fpwalk
+from fprules import file_patterns, file_pattern, compile_pattern
+
+try:
+    from pathlib import Path
+except ImportError:
+    from pathlib2 import Path
+
+
+def test_file_patterns(monkeypatch):
+    resources = Path(__file__).parent / "resources"
+
+    listed = []
+    original_list_dir = fpwalk.list_dir
+
+    def list_dir(dir_path):
+        listed.append(dir_path)
+        return original_list_dir(dir_path)
+
+    monkeypatch.setattr(fpwalk, 'list_dir', list_dir)
+
+    rules = OrderedDict([
+        ('yml', (resources / "**/*.yml", "./out/%%/%.csv")),
+        ('yaml', dict(src_pattern=resources / "**/*.yaml", dst_pattern="./out/%%/%.csv", names="%")),
+        ('bar', compile_pattern(resources / "basics/foo/bar/*", "./out/%")),
+        ('nomatch', (resources / "*/nothere/**/*", "./out/%")),
+    ])
+    res = file_patterns(rules)
+    assert list(res) == list(rules)
+
+    # all folders were listed once
+    assert len(listed) == len(set(listed))
+
+    # same results than file_pattern
+    del listed[:]
+    for rule_name, rule in rules.items():
+        if hasattr(rule, 'iter'):
+            ref = rule.iter()
+        elif isinstance(rule, dict):
+            ref = file_pattern(**rule)
+        else:
+            ref = file_pattern(*rule)
+        assert [str(r) for r in res[rule_name]] == [str(r) for r in ref]
+    assert len(listed) > len(set(listed))
+
+
+def test_file_patterns_order(tmpdir):
+    """Rules sharing a search root keep the order of `file_pattern`, even when another rule starts with a literal"""
+    for d in ('c', 'b', 'z', 'a', 'y', 'x'):
+        for sub in ('s', 'r'):
+            tmpdir.join(d, sub, 'f.txt').write('x', ensure=True)
+        tmpdir.join(d, 'g.txt').write('x')
+
+    with tmpdir.as_cwd():
+        rules = OrderedDict([('all', ('**/*', '%.csv')), ('depth3', ('*/*/*', '%.csv')), ('a', ('a/*', '%.csv'))])
+        res = file_patterns(rules)
+        for rule_name, rule in rules.items():
+            assert [str(r) for r in res[rule_name]] == [str(r) for r in file_pattern(*rule)]
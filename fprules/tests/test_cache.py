@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+
+import pytest
+
+from fprules import file_pattern
+import fprules.cache as fpcache
+from fprules.cache import DirListingCache
+
+
+@pytest.fixture
+def counted_listings(monkeypatch):
+    """Counts the folders actually listed by the cache, and disables the racy delay"""
+    listed = []
+    original_list_dir = fpcache.list_dir
+
+    def list_dir(dir_path):
+        listed.append(os.path.basename(dir_path))
+        return original_list_dir(dir_path)
+
+    monkeypatch.setattr(fpcache, 'list_dir', list_dir)
+    monkeypatch.setattr(fpcache, 'RACY_DELAY', -1)
+    return listed
+
+
+def test_listing_cache(tmpdir, counted_listings):
+    tmpdir.join('src', 'a', 'x.ddl').ensure()
+    tmpdir.join('src', 'b', 'y.ddl').ensure()
+    tmpdir.join('src', 'b', 'z.txt').ensure()
+    cache_file = str(tmpdir.join('.fprules-cache'))
+
+    def run():
+        return sorted(str(f) for f in file_pattern(str(tmpdir.join('src', '**', '*.ddl')), './%%/%.csv',
+                                                     cache=cache_file))
+
+    res = run()
+    assert res == ['[a/x] %s -> a/x.csv' % tmpdir.join('src', 'a', 'x.ddl'),
+                   '[b/y] %s -> b/y.csv' % tmpdir.join('src', 'b', 'y.ddl')]
+    assert sorted(counted_listings) == ['a', 'b', 'src']
+
+    # second run: nothing is listed again
+    del counted_listings[:]
+    assert run() == res
+    assert counted_listings == []
+
+    # a modified folder is listed again
+    tmpdir.join('src', 'b', 'w.ddl').ensure()
+    os.utime(str(tmpdir.join('src', 'b')), (1, 1))
+    assert len(run()) == 3
+    assert counted_listings == ['b']
+
+
+def test_listing_cache_entries(tmpdir, counted_listings):
+    tmpdir.join('d', 'f').ensure()
+    tmpdir.join('d', 'sub').ensure(dir=True)
+
+    with DirListingCache(str(tmpdir.join('c.db'))) as cache:
+        assert sorted(e.name for e in cache.list_dir(str(tmpdir.join('d')))) == ['f', 'sub']
+        assert cache.list_dir(str(tmpdir.join('nothere'))) is None
+
+    with DirListingCache(str(tmpdir.join('c.db'))) as cache:
+        entries = {e.name: e for e in cache.list_dir(str(tmpdir.join('d')))}
+    assert counted_listings == ['d']
+    assert entries['sub'].is_dir() and not entries['f'].is_dir()
+    assert not entries['sub'].is_symlink()
+
+
+def test_listing_cache_pathlib_engine(tmpdir):
+    with pytest.raises(ValueError):
+        list(file_pattern(str(tmpdir.join('*.ddl')), '%.csv', engine='pathlib', cache=str(tmpdir.join('c.db'))))
+
+
+def _open_cache(cache_cls, path, start):
+    """Opens and closes cache `path` once `start` is set, in another process"""
+    start.wait()
+    cache_cls(path).close()
+
+
+def open_concurrently(cache_cls, tmpdir, nb_processes=8, nb_runs=10):
+    """Opens new cache files of class `cache_cls` from several processes at once, and returns the number of failures"""
+    failures = 0
+    for i in range(nb_runs):
+        start = multiprocessing.Event()
+        path = str(tmpdir.join('cache%s.db' % i))
+        processes = [multiprocessing.Process(target=_open_cache, args=(cache_cls, path, start))
+                     for _ in range(nb_processes)]
+        for p in processes:
+            p.start()
+        start.set()
+        for p in processes:
+            p.join()
+        failures += sum(1 for p in processes if p.exitcode != 0)
+    return failures
+
+
+def test_listing_cache_concurrent_creation(tmpdir):
+    """Several processes can create the same new cache file at the same time"""
+    assert open_concurrently(DirListingCache, tmpdir) == 0
@@ -0,0 +1,40 @@
+import os
+
+from fprules import file_pattern, ADDED, MODIFIED, REMOVED
+
+
+def test_changes(tmpdir):
+    tmpdir.join('src', 'a', 'x.ddl').write('x', ensure=True)
+    tmpdir.join('src', 'b', 'y.ddl').write('y', ensure=True)
+    tmpdir.join('src', 'b', 'z.ddl').write('z', ensure=True)
+    snapshot = str(tmpdir.join('state.snapshot'))
+    src_pattern = str(tmpdir.join('src', '**', '*.ddl'))
+
+    def changes():
+        return sorted((i.change, i.name) for i in file_pattern(src_pattern, './out/%%/%.csv', snapshot=snapshot))
+
+    # first run: everything is new
+    assert changes() == [(ADDED, 'a/x'), (ADDED, 'b/y'), (ADDED, 'b/z')]
+    # no change
+    assert changes() == []
+
+    # modify, add and remove files
+    tmpdir.join('src', 'a', 'x.ddl').write('xx', ensure=True)
+    tmpdir.join('src', 'b', 'w.ddl').write('w', ensure=True)
+    os.remove(str(tmpdir.join('src', 'b', 'z.ddl')))
+    os.utime(str(tmpdir.join('src', 'b', 'y.ddl')), (1, 1))
+    res = list(file_pattern(src_pattern, './out/%%/%.csv', snapshot=snapshot))
+    assert sorted((i.change, i.name) for i in res) == [(ADDED, 'b/w'), (MODIFIED, 'a/x'), (MODIFIED, 'b/y'),
+                                                       (REMOVED, 'b/z')]
+    removed = [i for i in res if i.change == REMOVED][0]
+    assert str(removed) == "[b/z] %s -> out/b/z.csv" % tmpdir.join('src', 'b', 'z.ddl')
+    assert changes() == []
+
+
+def test_changes_other_pattern(tmpdir):
+    """A snapshot created for another pattern is ignored"""
+    tmpdir.join('src', 'x.ddl').write('x', ensure=True)
+    snapshot = str(tmpdir.join('state.snapshot'))
+
+    assert len(list(file_pattern(str(tmpdir.join('src', '*.ddl')), '%.csv', snapshot=snapshot))) == 1
+    assert len(list(file_pattern(str(tmpdir.join('src', '*')), '%.csv', snapshot=snapshot))) == 1
@@ -0,0 +1,104 @@
+from collections import OrderedDict
+
+import pytest
+
+from fprules import compile_pattern, file_pattern
+from fprules.walk import compile_glob_regex
+
+try:
+    from pathlib import Path, PurePath
+except ImportError:
+    from pathlib2 import Path, PurePath
+
+
+def test_compile_cached_and_immutable():
+    resources = Path(__file__).parent / "resources" / "basics"
+
+    p = compile_pattern(str(resources) + "/foo/**/*.y*ml", "./%%/target/%")
+    assert compile_pattern(resources / "foo/**/*.y*ml", "./%%/target/%") is p
+
+    with pytest.raises(AttributeError):
+        p.names = '%'
+
+    # iter() yields the same items than file_pattern, several times
+    expected = [str(r) for r in file_pattern(str(resources) + "/foo/**/*.y*ml", "./%%/target/%")]
+    assert [str(r) for r in p.iter()] == expected
+    assert [str(r) for r in p.iter()] == expected
+
+
+def test_compile_match_expand():
+    p = compile_pattern("data/**/defs/*.ddl",
+                        dst_pattern=OrderedDict([('csv', "./out/%%/%.csv"), ('log', "./{logs}/%.log")]))
+
+    # match does not require the file to exist
+    item = p.match("data/a/b/defs/iris.ddl")
+    assert str(item) == "[a/b/iris] data/a/b/defs/iris.ddl -> {csv=out/a/b/iris.csv, log={logs}/iris.log}"
+    assert item.csv == Path("out/a/b/iris.csv")
+
+    assert p.match("data/a/b/iris.ddl") is None
+    assert p.match("other/defs/iris.ddl") is None
+
+    # expand assumes that the path matches
+    assert p.expand("data/defs/wine.ddl").csv == Path("out/wine.csv")
+    assert p.expand("data/x/defs/wine.ddl", captured_subpath='y').csv == Path("out/y/wine.csv")
+    with pytest.raises(ValueError):
+        p.expand("data/x/wine.csv")
+
+
+@pytest.mark.parametrize("pattern, path, captured, stem",
+                         [("a/**/*.c", "a/x.c", None, "x"),
+                          ("a/**/*.c", "a/b/c/x.tar.c", "b/c", "x.tar"),
+                          ("a/**/*.c", "b/x.c", False, None),
+                          ("a/**/*.c", "a/b/x.h", False, None),
+                          ("a/**", "a", None, False),
+                          ("a/**", "a/b/c", "b/c", False),
+                          ("**/b/**/[!x]?", "a/b/c/yz", "a/b/c", "yz"),
+                          ("**/b/**/[!x]?", "b/yz", "b", "yz"),
+                          ("**/b/**/[!x]?", "a/b/c/xz", False, None),
+                          ("**/b/**/[!x]?", "a/bb/yz", False, None),
+                          ("*.c", "a/x.c", False, None),
+                          ("*.c", ".c", None, ".c"),
+                          ("/r/**/*.c", "/r/x.c", None, "x"),
+                          ("/r/**/*.c", "r/x.c", False, None),
+                          ])
+def test_compile_glob_regex(pattern, path, captured, stem):
+    """Tests that the regular expression of the whole pattern matches and captures the same elements than glob"""
+    regex = compile_glob_regex(PurePath(pattern).parts)
+    m = regex.match(str(PurePath(path)))
+    if captured is False:
+        assert m is None
+    else:
+        groups = m.groupdict()
+        assert groups.get('captured', None) == (captured if captured is None else str(PurePath(captured)))
+        assert groups.get('stem', False) == stem
+
+
+def test_compile_glob_regex_trailing_double_wildcard(tmpdir):
+    """A trailing '**' only yields folders when walking, while the regular expression also matches files"""
+    tmpdir.join('a', 'b', 'c', 'x.txt').write('x', ensure=True)
+    tmpdir.join('a', 'y.txt').write('y', ensure=True)
+    root = Path(str(tmpdir))
+    walked = set(str(p) for p in root.glob('a/**'))
+    assert walked == set(str(root / d) for d in ('a', 'a/b', 'a/b/c'))
+
+    regex = compile_glob_regex((root / 'a' / '**').parts)
+    all_paths = set(str(p) for p in root.glob('**/*'))
+    matched = set(p for p in all_paths if regex.match(p))
+    assert walked <= matched
+    assert matched - walked == set(str(root / f) for f in ('a/b/c/x.txt', 'a/y.txt'))
+
+    # matching listed paths is therefore different from walking
+    p = compile_pattern(str(root / 'a' / '**'), './out/%%')
+    assert sorted(str(i.src_path) for i in p.iter()) == sorted(walked)
+    assert p.match(str(root / 'a' / 'y.txt')) is not None
+
+
+def test_compile_dst_dict_not_modified():
+    dst = {'a': Path("./out/%.csv")}
+    compile_pattern("*.ddl", dst)
+    assert dst == {'a': Path("./out/%.csv")}
+
+
+def test_compile_invalid():
+    with pytest.raises(ValueError):
+        compile_pattern("*.ddl", "./out/%%/%.csv")
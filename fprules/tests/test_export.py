@@ -0,0 +1,63 @@
+import io
+import json
+import subprocess
+import sys
+
+import pytest
+
+from fprules import file_pattern, gen_matching_files, export_matches
+
+try:
+    from pathlib import Path
+except ImportError:
+    from pathlib2 import Path
+
+
+def test_export_jsonl():
+    """JSON lines contain the same names and paths than the items"""
+    resources = Path(__file__).parent / "resources" / "basics"
+    src, dst = resources / "**/*.y*ml", {'csv': './out/%%/%.csv', 'log': 'logs/%.log'}
+
+    out = io.BytesIO()
+    nb = export_matches(src, dst, out=out, fields=('name', 'src_path', 'dst_path', 'captured_subpath'))
+    records = [json.loads(line) for line in out.getvalue().decode('ascii').splitlines()]
+
+    ref = list(file_pattern(src, dst))
+    assert nb == len(ref) > 0
+    assert records == [{'name': item.name, 'src_path': item.src_path.as_posix(),
+                        'dst_path': {'csv': item.csv.as_posix(), 'log': item.log.as_posix()},
+                        'captured_subpath': item.captured_subpath} for item in ref]
+
+
+@pytest.mark.parametrize("fmt, sep, end", [('tsv', '\t', '\n'), ('nul', '\0', '\0')])
+def test_export_records(fmt, sep, end):
+    """TSV and null-separated records, written in small chunks to a text stream"""
+    resources = Path(__file__).parent / "resources" / "basics"
+    src = resources / "foo/*.y*ml"
+
+    out = io.StringIO()
+    export_matches(src, './out/%.csv', out=out, format=fmt, buffer_size=10)
+
+    ref = list(file_pattern(src, './out/%.csv'))
+    assert out.getvalue() == ''.join(sep.join((item.name, item.src_path.as_posix(), item.dst_path.as_posix())) + end
+                                     for item in ref)
+
+
+def test_export_invalid():
+    resources = Path(__file__).parent / "resources" / "basics"
+    with pytest.raises(ValueError):
+        export_matches(resources / "**/*", format='csv', out=io.BytesIO())
+    with pytest.raises(ValueError):
+        export_matches(resources / "**/*", fields=('name',), out=io.BytesIO())
+    with pytest.raises(ValueError):
+        export_matches(resources / "**/*", fields=('src_path', 'src_path'), out=io.BytesIO())
+
+
+def test_export_cli():
+    """`python -m fprules list` writes the source paths by default"""
+    resources = Path(__file__).parent / "resources" / "basics"
+    src = resources / "foo/*"
+
+    out = subprocess.check_output([sys.executable, '-m', 'fprules', 'list', str(src), '-0'],
+                                  cwd=str(Path(__file__).parents[2]))
+    assert out.decode('utf-8').split('\0')[:-1] == [p.as_posix() for p, _ in gen_matching_files(src)]
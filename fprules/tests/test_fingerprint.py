@@ -0,0 +1,74 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from fprules import file_pattern, compile_pattern, HashCache
+from fprules import fingerprint as fingerprint_module
+from fprules.fingerprint import hash_file
+
+from fprules.tests.test_cache import open_concurrently
+
+
+def _make_sources(tmpdir):
+    past = time.time() - 3600
+    for i, size in enumerate((0, 10, 3000000)):
+        src = tmpdir.join('defs', 'f%s.bin' % i)
+        src.write_binary(os.urandom(size), ensure=True)
+        os.utime(str(src), (past, past))
+
+
+def test_fingerprint(tmpdir, monkeypatch):
+    """Items have the sha256 of their source, and unchanged sources are not hashed again with a hash cache"""
+    _make_sources(tmpdir)
+    with tmpdir.as_cwd():
+        items = list(file_pattern('defs/*.bin', 'out/%.csv', fingerprint='sha256', hash_cache='.hashes'))
+        assert len(items) == 3
+        for item in items:
+            assert item.fingerprint == hashlib.sha256(item.src_path.read_bytes()).hexdigest()
+
+        # hash with a smaller threshold to use mmap, and block reads
+        monkeypatch.setattr(fingerprint_module, 'MMAP_THRESHOLD', 1000)
+        monkeypatch.setattr(fingerprint_module, 'READ_SIZE', 3)
+        assert [hash_file(item.src_str) for item in items] == [item.fingerprint for item in items]
+
+        # the hashes of unchanged files come from the cache
+        hashed = []
+        monkeypatch.setattr(fingerprint_module, 'hash_file', lambda path_str, algo: hashed.append(path_str) or 'new')
+        with HashCache('.hashes') as hash_cache:
+            pattern = compile_pattern('defs/*.bin', 'out/%.csv')
+            assert list(pattern.fingerprints(hash_cache=hash_cache)) == items
+            assert hashed == []
+
+            # a modified file is hashed again
+            os.utime(os.path.join('defs', 'f1.bin'), None)
+            fingerprints = dict((item.name, item.fingerprint) for item in pattern.fingerprints(hash_cache=hash_cache))
+            assert fingerprints['f1'] == 'new'
+            assert hashed == [os.path.join('defs', 'f1.bin')]
+
+
+def test_fingerprint_folders(tmpdir):
+    """Sources that are folders are skipped, with or without a hash cache"""
+    _make_sources(tmpdir)
+    tmpdir.join('defs', 'sub.bin').ensure(dir=True)
+    with tmpdir.as_cwd():
+        for hash_cache in (None, '.hashes'):
+            items = list(file_pattern('defs/*.bin', 'out/%.csv', fingerprint='sha256', hash_cache=hash_cache))
+            assert sorted(item.name for item in items) == ['f0', 'f1', 'f2']
+        with HashCache('.hashes') as hash_cache:
+            assert hash_cache.hash_file(os.path.join('defs', 'sub.bin')) is None
+
+
+def test_hash_cache_concurrent_creation(tmpdir):
+    """Several processes can create the same new hash cache file at the same time"""
+    assert open_concurrently(HashCache, tmpdir) == 0
+
+
+def test_fingerprint_invalid():
+    with pytest.raises(ValueError):
+        list(file_pattern('*.bin', '%.csv', fingerprint='md4'))
+    with pytest.raises(ValueError):
+        list(file_pattern('*.bin', '%.csv', fingerprint='sha256', as_table=True))
+    with pytest.raises(ValueError):
+        list(file_pattern('*.bin', '%.csv', hash_cache='.hashes'))
@@ -0,0 +1,98 @@
+from subprocess import check_call, check_output
+
+import pytest
+
+from fprules import file_pattern
+from fprules.gitindex import find_git_dir, read_git_index
+
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
+
+pytestmark = pytest.mark.skipif(which('git') is None, reason="git is not installed")
+
+
+def _git(repo, *args):
+    check_call(('git', '-c', 'user.name=test', '-c', 'user.email=test@test') + args, cwd=str(repo))
+
+
+@pytest.fixture
+def repo(tmpdir):
+    for f in ('src/x.ddl', 'src/a/y.ddl', 'src/a/b/z.ddl', 'src/c/w.txt', 'docs/r.md', 'src/a/ignored.log'):
+        tmpdir.join(f).write('x', ensure=True)
+    tmpdir.join('.gitignore').write('*.log\n')
+    _git(tmpdir, 'init', '-q', '.')
+    _git(tmpdir, 'add', '.')
+    _git(tmpdir, 'commit', '-q', '-m', 'init')
+    tmpdir.join('src', 'a', 'untracked.ddl').write('x')
+    return tmpdir
+
+
+def _names(src_pattern, **kwargs):
+    return sorted(i.name for i in file_pattern(src_pattern, "./out/%%/%.csv", **kwargs))
+
+
+@pytest.mark.parametrize("index_version", ['2', '4'])
+def test_git_engine(repo, index_version):
+    _git(repo, 'update-index', '--index-version', index_version)
+    src_pattern = str(repo.join('src', '**', '*.ddl'))
+
+    assert _names(src_pattern) == ['a/b/z', 'a/untracked', 'a/y', 'x']
+    assert _names(src_pattern, engine='git') == ['a/b/z', 'a/y', 'x']
+    assert _names(src_pattern, engine='git+untracked') == ['a/b/z', 'a/untracked', 'a/y', 'x']
+
+    # same results than the walk, including the folders
+    for src_pattern in ('src/*', 'src/**', 'src/**/*', '**/*.md'):
+        src_pattern = str(repo.join(src_pattern))
+        expected = sorted(str(i) for i in file_pattern(src_pattern, "./out/%") if 'untracked' not in str(i)
+                          and 'ignored' not in str(i))
+        assert sorted(str(i) for i in file_pattern(src_pattern, "./out/%", engine='git')) == expected
+
+
+def test_git_index_and_dir(repo):
+    paths = list(read_git_index(str(repo.join('.git', 'index'))))
+    assert paths == [b'.gitignore', b'docs/r.md', b'src/a/b/z.ddl', b'src/a/y.ddl', b'src/c/w.txt', b'src/x.ddl']
+
+    # a '.git' file pointing to the git folder, as in linked working trees
+    worktree = repo.join('wt').ensure(dir=True)
+    worktree.join('.git').write('gitdir: ../.git\n')
+    assert find_git_dir(str(worktree.join('sub'))) == (str(worktree), str(repo.join('.git')))
+
+    with pytest.raises(ValueError):
+        list(file_pattern(str(repo.join('src', '*.ddl')), "%.csv", engine='git', workers=2))
+
+
+@pytest.mark.parametrize("index_version", ['2', '4'])
+def test_git_split_index(repo, index_version):
+    """The entries of the shared index of a split index are listed, except the deleted ones"""
+    for i in range(150):
+        repo.join('src', 'd', 'f%03d.ddl' % i).write('x', ensure=True)
+    _git(repo, 'add', '.')
+    _git(repo, 'update-index', '--index-version', index_version)
+    _git(repo, 'update-index', '--split-index')
+    index_file = str(repo.join('.git', 'index'))
+    assert repo.join('.git').listdir('sharedindex.*')
+
+    # delete, modify and add entries, the changes are written in the main index only
+    _git(repo, 'rm', '-q', '-f', 'docs/r.md', 'src/d/f070.ddl', 'src/d/f149.ddl')
+    repo.join('src', 'x.ddl').write('y')
+    repo.join('src', 'd', 'f100.ddl').write('y')
+    repo.join('src', 'new.ddl').write('x')
+    _git(repo, '-c', 'splitIndex.maxPercentChange=100', 'add', 'src')
+    shared_files = repo.join('.git').listdir('sharedindex.*')
+
+    expected = check_output(('git', 'ls-files', '-z'), cwd=str(repo)).split(b'\0')[:-1]
+    paths = list(read_git_index(index_file))
+    assert paths == expected
+    assert b'src/new.ddl' in paths and b'docs/r.md' not in paths and b'src/d/f070.ddl' not in paths
+
+    src_pattern = str(repo.join('src', '*.ddl'))
+    assert sorted(i.name for i in file_pattern(src_pattern, "./out/%.csv", engine='git')) == ['new', 'x']
+
+    # a missing shared index can not be ignored
+    for shared_file in shared_files:
+        shared_file.remove()
+    with pytest.raises(ValueError):
+        list(read_git_index(index_file))
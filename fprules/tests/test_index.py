@@ -0,0 +1,37 @@
+import os
+
+from fprules import PatternIndex, compile_pattern
+
+
+def test_pattern_index(tmpdir):
+    tmpdir.join('defs', 'iris.ddl').write('x', ensure=True)
+    tmpdir.join('defs', 'sub', 'wine.ddl').write('x', ensure=True)
+    tmpdir.join('defs', 'sub', 'wine.yml').write('x', ensure=True)
+    cwd = os.getcwd()
+    os.chdir(str(tmpdir))
+    try:
+        csv = compile_pattern('./defs/**/*.ddl', {'csv': './downloaded/%%/%.csv', 'pkl': './pickled/%%/%.pkl'})
+        index = PatternIndex(csv, ('defs/**/*.yml', 'config/%%/%.json', 'yml/%%/%')).scan()
+        assert len(index) == 3
+
+        item, = index.by_dst('downloaded/iris.csv')
+        assert item.src_path.as_posix() == 'defs/iris.ddl'
+        assert index.by_dst('./pickled/sub/wine.pkl') == index.by_src('defs/sub/wine.ddl')
+        assert index.by_dst('downloaded/unknown.csv') == []
+        assert index.by_name('sub/wine')[0].pattern is csv
+        assert [i.name for i in index.by_name('yml/sub/wine')] == ['yml/sub/wine']
+        assert sorted(i.name for i in index.under('downloaded')) == ['iris', 'sub/wine']
+        assert sorted(i.name for i in index.under('defs/sub', kind='src')) == ['sub/wine', 'yml/sub/wine']
+
+        # incremental updates
+        added, = index.add_path('defs/new.ddl')
+        assert index.by_dst('downloaded/new.csv') == [added]
+        assert index.add_path('defs/new.ddl') == []
+        assert index.add_path('other/new.ddl') == []
+        assert len(index) == 4
+        assert index.remove_path('defs/sub/wine.ddl')[0].name == 'sub/wine'
+        assert index.by_dst('downloaded/sub/wine.csv') == []
+        assert index.by_name('sub/wine') == []
+        assert sorted(i.name for i in index) == ['iris', 'new', 'yml/sub/wine']
+    finally:
+        os.chdir(cwd)
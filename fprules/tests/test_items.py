@@ -0,0 +1,55 @@
+import pickle
+from collections import OrderedDict
+
+import pytest
+
+from fprules import compile_pattern, FileItem
+
+try:
+    from pathlib import Path
+except ImportError:
+    from pathlib2 import Path
+
+
+def test_item_lazy_targets():
+    p = compile_pattern("data/**/*.ddl", OrderedDict([('csv', "./out/%%/%.csv"), ('log', "./logs/%.log")]))
+    item = p.match("data/a/b/iris.ddl")
+    assert isinstance(item, FileItem)
+
+    # nothing is created before first access
+    assert item._dst_paths is None and item._name is None
+
+    assert item.log == Path("logs/iris.log")
+    assert item._dst_paths[0] is None
+    assert item.csv == Path("out/a/b/iris.csv")
+    assert item.csv is item.csv
+    with pytest.raises(AttributeError):
+        item.txt
+
+    assert item.dst_path == OrderedDict([('csv', Path("out/a/b/iris.csv")), ('log', Path("logs/iris.log"))])
+    assert item.dst_path is item.dst_path
+    assert item.dst_path['csv'] is item.csv
+    assert item.name == "a/b/iris"
+    assert item.src_path == Path("data/a/b/iris.ddl")
+
+    # legacy unpacking
+    name, src_path, has_multi_targets, dst_path = item
+    assert (name, src_path, has_multi_targets) == ("a/b/iris", Path("data/a/b/iris.ddl"), True)
+
+
+def test_item_single_target():
+    item = compile_pattern("data/*.ddl", "./out/%.csv").match("data/.hidden.ddl")
+    assert item.dst_path == Path("out/.hidden.csv")
+    assert not item.has_multi_targets
+    with pytest.raises(AttributeError):
+        item.csv
+
+
+def test_item_pickle_and_eq():
+    p = compile_pattern("data/**/*.ddl", {'csv': "./out/%%/%.csv"})
+    item = p.match("data/a/iris.ddl")
+    item2 = pickle.loads(pickle.dumps(item))
+    assert item2 == item
+    assert hash(item2) == hash(item)
+    assert str(item2) == str(item) == "[a/iris] data/a/iris.ddl -> {csv=out/a/iris.csv}"
+    assert item != p.match("data/b/iris.ddl")
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from fprules import file_pattern, compile_pattern
+from fprules import manifest, walk
+
+try:
+    from pathlib import Path
+except ImportError:
+    from pathlib2 import Path
+
+
+RESOURCES = Path(__file__).parent / "resources" / "basics"
+
+
+def _no_file_system(*args, **kwargs):
+    raise AssertionError("the file system should not be accessed")
+
+
+def test_paths_iterable(monkeypatch):
+    """Checks that listed paths produce the same items than the search, without accessing the file system"""
+    src_pattern = str(RESOURCES) + "/foo/**/*.y*ml"
+    expected = [str(i) for i in file_pattern(src_pattern, "./%%/target/%")]
+    all_files = [os.path.join(d, f) for d, _, files in os.walk(str(RESOURCES)) for f in files]
+
+    monkeypatch.setattr(walk, 'scandir', _no_file_system)
+    monkeypatch.setattr(os, 'stat', _no_file_system)
+    items = list(file_pattern(src_pattern, "./%%/target/%", paths=all_files))
+    assert sorted(str(i) for i in items) == sorted(expected)
+    assert {i.name for i in items} == {'xfile', 'bar/file3'}
+
+    # paths are normalized, and do not need to exist
+    p = compile_pattern("data/**/*.ddl", "out/%%/%.csv")
+    items = list(p.iter(paths=["./data/a//iris.ddl", Path("data/wine.ddl"), "data/x.csv", "other/data/x.ddl"]))
+    assert [str(i) for i in items] == ["[a/iris] data/a/iris.ddl -> out/a/iris.csv",
+                                       "[wine] data/wine.ddl -> out/wine.csv"]
+
+
+@pytest.mark.parametrize("delimiter", ['\n', '\r\n', '\0'], ids=['lf', 'crlf', 'nul'])
+@pytest.mark.parametrize("mmap", [False, True], ids=['read', 'mmap'])
+def test_paths_manifest(tmpdir, monkeypatch, delimiter, mmap):
+    if mmap:
+        monkeypatch.setattr(manifest, 'MMAP_THRESHOLD', 0)
+        monkeypatch.setattr(manifest, 'BLOCK_SIZE', 7)
+
+    listed = ["data/a/iris.ddl", "data/wine.ddl", "data/b/c/x.txt", "", "data/b/c/d/e.ddl", "data/f.ddl"]
+    manifest_file = tmpdir.join('files.txt')
+    manifest_file.write_binary(delimiter.join(listed).encode('utf-8'))
+
+    names = [i.name for i in file_pattern("data/**/*.ddl", "out/%%/%.csv", paths=str(manifest_file))]
+    assert names == ['a/iris', 'wine', 'b/c/d/e', 'f']
+
+    table = file_pattern("data/*/*.ddl", "out/%.csv", paths=Path(str(manifest_file)), as_table=True)
+    assert [i.name for i in table] == ['iris']
+
+    tmpdir.join('empty.txt').write('')
+    assert list(file_pattern("*", "%", paths=str(tmpdir.join('empty.txt')))) == []
+
+
+def test_paths_invalid():
+    with pytest.raises(ValueError):
+        list(file_pattern("*.ddl", "%.csv", paths=["a.ddl"], workers=2))
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from fprules import compile_pattern
+from fprules.resolve import _compile_inverse_template
+
+
+@pytest.fixture
+def data_dir(tmpdir):
+    tmpdir.join('defs', 'iris.ddl').write('x', ensure=True)
+    tmpdir.join('defs', 'sub', 'deep', 'wine.ddl').write('x', ensure=True)
+    tmpdir.join('defs', 'sub', 'wine.yml').write('x', ensure=True)
+    tmpdir.join('defs', 'sub', 'wine.tar.gz').write('x', ensure=True)
+    cwd = os.getcwd()
+    os.chdir(str(tmpdir))
+    yield tmpdir
+    os.chdir(cwd)
+
+
+def test_resolve(data_dir):
+    p = compile_pattern('./defs/**/*.ddl', {'csv': './downloaded/%%/%.csv', 'flat': 'flat/%.csv'})
+    item, = p.resolve('downloaded/iris.csv')
+    assert item.src_path.as_posix() == 'defs/iris.ddl'
+    assert item.captured_subpath == '.'
+    item, = p.resolve(os.path.join('.', 'downloaded', 'sub', 'deep', 'wine.csv'))
+    assert (item.name, item.captured_subpath) == ('sub/deep/wine', os.path.join('sub', 'deep'))
+    assert p.resolve('downloaded/sub/wine.csv') == []
+    assert p.resolve('downloaded/sub/deep/wine.pkl') == []
+
+    # the captured path is unknown in this template: fallback
+    item, = p.resolve('flat/wine.csv')
+    assert item.name == 'sub/deep/wine'
+    assert p.resolve('flat/wine.csv', key='csv') == []
+
+    # wildcards resolved with a listing
+    p = compile_pattern('./defs/*/wine.*', './out/%.json')
+    assert sorted(i.src_path.as_posix() for i in p.resolve('out/wine.json')) == ['defs/sub/wine.yml']
+    p = compile_pattern('./defs/*/*', './out/%.json')
+    assert sorted(i.src_path.as_posix() for i in p.resolve('out/wine.tar.json')) == ['defs/sub/wine.tar.gz']
+
+    # resolving a target is consistent with the forward expansion
+    p = compile_pattern('./defs/**/*', './out/%%/%.txt')
+    for item in p.iter():
+        assert p.resolve(item.dst_path) == [item]
+
+
+def test_resolve_several_double_wildcards(tmpdir):
+    """With several double wildcards, only the sources matching the whole pattern are resolved"""
+    tmpdir.join('a', 'x', 'y', 'foo.ddl').write('x', ensure=True)
+    tmpdir.join('a', 'x', 'b', 'y', 'bar.ddl').write('x', ensure=True)
+    with tmpdir.as_cwd():
+        p = compile_pattern('a/**/b/**/*.ddl', 'out/%%/%.csv')
+        assert p.resolve('out/x/y/foo.csv') == []
+        assert list(p.iter()) == p.resolve('out/x/b/y/bar.csv')
+        assert len(p.resolve('out/x/b/y/bar.csv')) == 1
+
+
+def test_inverse_template():
+    match = _compile_inverse_template(os.path.join('out', '{1}', '{0}.csv'))
+    assert match(os.path.join('out', 'a', 'b', 'x.csv')).group('captured', 'stem') == (os.path.join('a', 'b'), 'x')
+    assert match(os.path.join('out', 'x.csv')).group('captured', 'stem') == (None, 'x')
+    assert match(os.path.join('other', 'x.csv')) is None
+    match = _compile_inverse_template('{0}/{0}_{1}')
+    assert match(os.path.join('x', 'x_y')).group('captured', 'stem') == ('y', 'x')
+    assert match(os.path.join('x', 'z_y')) is None
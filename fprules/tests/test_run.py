@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fprules import run_rule
+
+
+def _make_defs(tmpdir):
+    for sub_path in ('x.ddl', 'a/y.ddl', 'a/b/z.ddl'):
+        tmpdir.join('defs', sub_path).ensure()
+
+
+def _copy_command():
+    """A command copying {src} to {dst}, portable across platforms"""
+    return [sys.executable, '-c', 'import shutil, sys; shutil.copy(sys.argv[1], sys.argv[2])', '{src}', '{dst}']
+
+
+@pytest.mark.parametrize("jobs", [1, 3], ids="jobs={}".format)
+def test_run_rule(tmpdir, jobs):
+    """Commands are run for the stale items only, with their destination folders created beforehand"""
+    _make_defs(tmpdir)
+    with tmpdir.as_cwd():
+        assert run_rule('defs/**/*.ddl', 'out/%%/%.csv', _copy_command(), jobs=jobs) == 3
+        created = tmpdir.join('out').visit(lambda p: p.isfile())
+        assert sorted(str(p.relto(tmpdir)).replace(os.sep, '/') for p in created) \
+            == ['out/a/b/z.csv', 'out/a/y.csv', 'out/x.csv']
+
+        # up to date
+        assert run_rule('defs/**/*.ddl', 'out/%%/%.csv', _copy_command(), jobs=jobs) == 0
+        assert run_rule('defs/**/*.ddl', 'out/%%/%.csv', _copy_command(), jobs=jobs, force=True) == 3
+
+        # a modified source
+        os.utime('out/a/y.csv', (0, 0))
+        assert run_rule('defs/**/*.ddl', 'out/%%/%.csv', _copy_command(), jobs=jobs) == 1
+
+
+def test_run_rule_failure(tmpdir):
+    """A failed command stops the run"""
+    _make_defs(tmpdir)
+    with tmpdir.as_cwd():
+        command = [sys.executable, '-c', 'import sys; sys.exit(3)', '{src}']
+        with pytest.raises(subprocess.CalledProcessError) as exc_info:
+            run_rule('defs/**/*.ddl', 'out/%%/%.csv', command)
+        assert exc_info.value.returncode == 3
+        assert exc_info.value.cmd[-1] == os.path.join('defs', 'x.ddl')
+
+        with pytest.raises(ValueError):
+            run_rule('defs/**/*.ddl', 'out/%%/%.csv', ['cp', '{source}', '{dst}'])
+
+
+def test_run_cli(tmpdir):
+    """`python -m fprules run` with several targets and a dry run"""
+    _make_defs(tmpdir)
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    out = subprocess.check_output([sys.executable, '-m', 'fprules', 'run', 'defs/*.ddl', '-t', 'csv=out/%.csv',
+                                   '-t', 'log=logs/%.log', '-n', '--', 'convert', '{src}', '{csv}', '{log}'],
+                                  cwd=str(tmpdir), env=env)
+    assert out.decode('utf-8').split() == ['convert', os.path.join('defs', 'x.ddl'), os.path.join('out', 'x.csv'),
+                                           os.path.join('logs', 'x.log')]
+    assert not tmpdir.join('out').exists()
@@ -0,0 +1,47 @@
+import os
+
+from fprules import file_pattern, compile_pattern
+from fprules.stale import is_stale
+
+
+def _touch(f, mtime):
+    f.write('x', ensure=True)
+    os.utime(str(f), (mtime, mtime))
+
+
+def test_only_stale(tmpdir):
+    for name in ('a', 'b', 'c', 'd'):
+        _touch(tmpdir.join('src', 'sub', name + '.ddl'), 1000)
+    # up to date, same mtime, outdated, missing
+    _touch(tmpdir.join('out', 'sub', 'a.csv'), 2000)
+    _touch(tmpdir.join('out', 'sub', 'b.csv'), 1000)
+    _touch(tmpdir.join('out', 'sub', 'c.csv'), 500)
+
+    src_pattern = str(tmpdir.join('src', '**', '*.ddl'))
+    dst_pattern = str(tmpdir.join('out', '%%', '%.csv'))
+    stale = file_pattern(src_pattern, dst_pattern, only_stale=True)
+    assert sorted(i.name for i in stale) == ['sub/c', 'sub/d']
+
+    # with workers and a listing cache
+    stale = file_pattern(src_pattern, dst_pattern, only_stale=True, workers=2, cache=str(tmpdir.join('.cache')))
+    assert sorted(i.name for i in stale) == ['sub/c', 'sub/d']
+
+    # the destination folder does not exist
+    stale = file_pattern(src_pattern, str(tmpdir.join('other', '%.csv')), only_stale=True)
+    assert len(list(stale)) == 4
+
+
+def test_only_stale_multi_targets(tmpdir):
+    _touch(tmpdir.join('src', 'a.ddl'), 1000)
+    _touch(tmpdir.join('src', 'b.ddl'), 1000)
+    _touch(tmpdir.join('out', 'a.csv'), 2000)
+    _touch(tmpdir.join('out', 'a.pkl'), 2000)
+    _touch(tmpdir.join('out', 'b.csv'), 2000)
+    _touch(tmpdir.join('out', 'b.pkl'), 500)
+
+    pattern = compile_pattern(str(tmpdir.join('src', '*.ddl')),
+                              {'csv': str(tmpdir.join('out', '%.csv')), 'pkl': str(tmpdir.join('out', '%.pkl'))})
+    assert [i.name for i in pattern.stale()] == ['b']
+    items = sorted(pattern.iter(), key=lambda i: i.name)
+    assert [is_stale(i) for i in items] == [False, True]
+    assert is_stale(pattern.expand(tmpdir.join('src', 'c.ddl'))) is None
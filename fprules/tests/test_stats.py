@@ -0,0 +1,70 @@
+import json
+
+from fprules import file_pattern, compile_pattern, MatchStats
+
+try:
+    from pathlib import Path
+except ImportError:
+    from pathlib2 import Path
+
+
+RESOURCES = Path(__file__).parent / "resources" / "basics"
+
+
+def test_stats():
+    stats = MatchStats()
+    items = list(file_pattern(str(RESOURCES) + "/foo/**/*.y*ml", "./%%/target/%", stats=stats))
+    assert len(items) == 2
+
+    # foo, foo/bar and foo/barbar are listed
+    assert (stats.dirs_listed, stats.entries_examined, stats.pruned_dirs, stats.fs_calls, stats.matches) \
+        == (3, 7, 0, 3, 2)
+    d = stats.to_dict()
+    assert list(d['timings']) == ['listing', 'walk', 'capture', 'items']
+    assert all(t >= 0 for t in d['timings'].values())
+    assert json.loads(stats.to_json()) == json.loads(json.dumps(d))
+
+    # the sub-folders of foo can not contain matches: they are pruned. Statistics are accumulated.
+    list(file_pattern(str(RESOURCES) + "/foo/*.yml", "./%", stats=stats))
+    assert (stats.dirs_listed, stats.pruned_dirs, stats.matches) == (4, 2, 3)
+    stats = MatchStats()
+    list(file_pattern(str(RESOURCES) + "/foo/*.yml", "./%", stats=stats))
+    assert (stats.dirs_listed, stats.pruned_dirs, stats.matches) == (1, 2, 1)
+
+
+def test_stats_cache_and_table(tmpdir):
+    p = compile_pattern(str(RESOURCES) + "/foo/**/*.y*ml", "./%%/target/%")
+    cache = str(tmpdir.join('cache'))
+
+    stats = MatchStats()
+    assert len(p.table(cache=cache, stats=stats)) == 2
+    # one stat and one scandir per folder
+    assert (stats.dirs_listed, stats.fs_calls, stats.cached_dirs, stats.matches) == (3, 6, 0, 2)
+
+    stats = MatchStats()
+    assert len(p.table(cache=cache, stats=stats)) == 2
+    assert (stats.dirs_listed, stats.fs_calls, stats.cached_dirs, stats.matches) == (3, 3, 3, 2)
+
+
+def test_stats_cache_empty_folder(tmpdir):
+    """Empty folders read from the cache are counted as cached, with a single system call"""
+    tmpdir.join('src', 'empty').ensure(dir=True)
+    tmpdir.join('src', 'a.ddl').ensure()
+    cache = str(tmpdir.join('cache'))
+    p = compile_pattern(str(tmpdir.join('src', '**', '*.ddl')), "./%%/%.csv")
+    past = 1e9
+    for d in (tmpdir.join('src', 'empty'), tmpdir.join('src')):
+        d.setmtime(past)
+
+    p.table(cache=cache)
+    stats = MatchStats()
+    assert len(p.table(cache=cache, stats=stats)) == 1
+    assert (stats.dirs_listed, stats.fs_calls, stats.cached_dirs) == (2, 2, 2)
+
+
+def test_stats_pruned_parallel():
+    """Pruned folders are counted when the walk decides to skip them, also in the parallel walks"""
+    for kwargs in (dict(), dict(workers=2), dict(workers=2, ordered=False)):
+        stats = MatchStats()
+        list(file_pattern(str(RESOURCES) + "/foo/*.yml", "./%", stats=stats, **kwargs))
+        assert (stats.dirs_listed, stats.pruned_dirs) == (1, 2)
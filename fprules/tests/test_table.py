@@ -0,0 +1,78 @@
+import sys
+from collections import OrderedDict
+
+import pytest
+
+from fprules import file_pattern, FileTable
+from fprules.table import StrColumn, _uint_typecode
+
+try:
+    from pathlib import Path
+except ImportError:
+    from pathlib2 import Path
+
+
+def test_table_same_as_items():
+    resources = Path(__file__).parent / "resources"
+    dst = OrderedDict([('flat', "./target/%.toto"), ('nested', "./%%/target2/%")])
+
+    items = list(file_pattern(resources / "**/*", dst))
+    table = file_pattern(resources / "**/*", dst, as_table=True)
+    assert isinstance(table, FileTable)
+    assert len(table) == len(items)
+    assert table.columns == ('name', 'src_path', 'captured_subpath', 'flat', 'nested')
+
+    assert table.column('name') == [i.name for i in items]
+    assert table.column('src_path') == [str(i.src_path) for i in items]
+    assert table.column('flat') == [str(i.flat) for i in items]
+    assert table.column('nested') == [str(i.nested) for i in items]
+    assert [str(i) for i in table] == [str(i) for i in items]
+    assert str(table[3]) == str(items[3])
+    with pytest.raises(KeyError):
+        table.column('dst_path')
+
+
+def test_table_filter_sort():
+    resources = Path(__file__).parent / "resources" / "basics"
+    table = file_pattern(resources / "foo/*", "./%.csv", as_table=True)
+    assert table.column('captured_subpath') == [None] * 4
+
+    yml = table.filter(lambda s: s.endswith('.yml'))
+    assert yml.column('dst_path') == ['xfile.csv']
+
+    srt = table.sort('src_path', reverse=True)
+    assert srt.column('src_path') == sorted(table.column('src_path'), reverse=True)
+    assert table.filter([False] * 4).to_lists('name', 'dst_path') == {'name': [], 'dst_path': []}
+    with pytest.raises(ValueError):
+        table.filter([True])
+
+
+def test_table_numpy():
+    np = pytest.importorskip("numpy")
+    resources = Path(__file__).parent / "resources"
+    table = file_pattern(resources / "**/*.y*ml", "./%%/%.csv", as_table=True)
+
+    arrays = table.to_numpy('src_path', 'dst_path')
+    mask = np.char.endswith(arrays['src_path'], '.yaml')
+    assert table.filter(mask).column('dst_path') == list(arrays['dst_path'][mask])
+
+
+def test_table_filter_captured():
+    """A function filtering the captured paths is called once per distinct value"""
+    resources = Path(__file__).parent / "resources"
+    table = file_pattern(resources / "**/*", "./%%/%.csv", as_table=True)
+    called = []
+    filtered = table.filter(lambda c: called.append(c) or c.startswith('basics'), column='captured_subpath')
+    assert sorted(called) == sorted(set(table.column('captured_subpath')))
+    assert filtered.column('src_path') == [s for s, c in zip(table.column('src_path'), table.column('captured_subpath'))
+                                           if c.startswith('basics')]
+
+
+def test_table_offsets_typecode():
+    """Offsets and codes arrays can index more than 4GB of path data on all platforms"""
+    from array import array
+    if sys.version_info >= (3, 3):
+        assert array(_uint_typecode(1 << 32)).itemsize >= 8
+    assert _uint_typecode((1 << 32) - 1) == 'L'
+    column = StrColumn(['a', 'bc', ''])
+    assert column.tolist() == ['a', 'bc', ''] and column.take([2, 1])[1] == 'bc'
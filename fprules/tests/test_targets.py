@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from fprules import file_pattern, prepare_targets
+from fprules import targets as targets_module
+
+
+def _make_defs(tmpdir):
+    for sub_path in ('x.ddl', 'a/y.ddl', 'a/b/z.ddl', 'c/w.ddl'):
+        tmpdir.join('defs', sub_path).ensure()
+
+
+@pytest.mark.parametrize("workers", [None, 3], ids="workers={}".format)
+def test_prepare_targets(tmpdir, monkeypatch, workers):
+    """All destination folders are created once each, parents first"""
+    _make_defs(tmpdir)
+    created = []
+    mkdir = os.mkdir
+    monkeypatch.setattr(targets_module.os, 'mkdir', lambda path: created.append(path) or mkdir(path))
+
+    with tmpdir.as_cwd():
+        items = list(file_pattern('defs/**/*.ddl', {'csv': 'out/%%/%.csv', 'log': 'logs/%/%.log'}))
+        assert prepare_targets(items, workers=workers) == 9
+        expected = [os.path.join(*p.split('/')) for p in ('out', 'out/a', 'out/a/b', 'out/c', 'logs', 'logs/w',
+                                                          'logs/x', 'logs/y', 'logs/z')]
+        assert sorted(created) == sorted(expected)
+        for dir_path in expected:
+            assert os.path.isdir(dir_path)
+        # parents first
+        assert created.index('out') < created.index(os.path.join('out', 'a')) < created.index(
+            os.path.join('out', 'a', 'b'))
+
+        # nothing to create anymore
+        del created[:]
+        assert prepare_targets(items, workers=workers) == 0
+        assert created == []
+
+        # tables are supported
+        table = file_pattern('defs/**/*.ddl', 'out2/%%/%.csv', as_table=True)
+        assert prepare_targets(table, workers=workers) == 4
+        assert os.path.isdir(os.path.join('out2', 'a', 'b'))
+
+
+def test_prepare_targets_minimal(tmpdir, monkeypatch):
+    """Parents are only checked up to the first existing one, and only the missing folders are created"""
+    _make_defs(tmpdir)
+    tmpdir.join('out', 'a').ensure(dir=True)
+    checked, created = [], []
+    isdir, mkdir = targets_module.isdir, os.mkdir
+    monkeypatch.setattr(targets_module, 'isdir', lambda path: checked.append(path) or isdir(path))
+    monkeypatch.setattr(targets_module.os, 'mkdir', lambda path: created.append(path) or mkdir(path))
+
+    with tmpdir.as_cwd():
+        out = str(tmpdir.join('out'))
+        items = list(file_pattern('defs/**/*.ddl', out + '/%%/x/%.csv'))
+        assert prepare_targets(items) == 6
+        assert sorted(created) == sorted(os.path.join(out, *p.split('/')) for p in ('x', 'a/x', 'a/b', 'a/b/x',
+                                                                                     'c', 'c/x'))
+        # the ancestors of the existing folders are never checked
+        assert all(p.startswith(out) for p in checked)
+
+
+def test_prepare_targets_file_exists(tmpdir):
+    """A file in place of a destination folder is an error"""
+    _make_defs(tmpdir)
+    with tmpdir.as_cwd():
+        tmpdir.join('out').write('')
+        with pytest.raises(OSError):
+            prepare_targets(file_pattern('defs/*.ddl', 'out/%.csv'))
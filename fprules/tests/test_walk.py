@@ -0,0 +1,98 @@
+import pytest
+
+from fprules import gen_matching_files
+from fprules.walk import WALK_ENGINES, get_engine, split_frames, walk_frames
+
+try:
+    from pathlib import Path
+except ImportError:
+    from pathlib2 import Path
+
+
+@pytest.mark.parametrize("pattern", ["basics/foo/*", "basics/foo/**/*.y*ml", "**/foo/**/**/[!x]*.y*ml",
+                                     "*/foo/bar/*", "basics/**", "**/xfile", "nothere/**/*"])
+def test_engines_same_results(pattern):
+    """All walk engines listing folders should yield the same results in the same order than Path.glob"""
+    resources = Path(__file__).parent / "resources"
+
+    ref = list(gen_matching_files(resources / pattern, engine='pathlib'))
+    for engine in WALK_ENGINES:
+        if engine.startswith('git'):
+            # only tracked files, in the order of the git index: see test_gitindex.py
+            continue
+        assert list(gen_matching_files(resources / pattern, engine=engine)) == ref
+
+
+def test_custom_engine():
+    """A custom walk engine function can be provided"""
+    resources = Path(__file__).parent / "resources" / "basics"
+
+    def my_engine(root, pattern_parts):
+        assert pattern_parts == ('**', '*.yml')
+        yield str(Path(root) / 'bar' / 'a.yml')
+
+    res = list(gen_matching_files(resources / "foo/**/*.yml", engine=my_engine))
+    assert res == [(resources / "foo/bar/a.yml", 'bar')]
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        get_engine('unknown')
+
+
+@pytest.mark.parametrize("ordered", [True, False], ids="ordered={}".format)
+@pytest.mark.parametrize("pattern", ["basics/foo/*", "**/foo/**/**/[!x]*.y*ml", "*/foo/bar/*", "basics/**"])
+def test_parallel_walk(pattern, ordered):
+    """The parallel walk yields the same results, in the same order by default"""
+    resources = Path(__file__).parent / "resources"
+
+    ref = list(gen_matching_files(resources / pattern))
+    res = list(gen_matching_files(resources / pattern, workers=4, ordered=ordered))
+    if ordered:
+        assert res == ref
+    else:
+        assert sorted(res) == sorted(ref)
+
+
+def test_parallel_walk_invalid():
+    resources = Path(__file__).parent / "resources"
+    with pytest.raises(ValueError):
+        list(gen_matching_files(resources / "**/*", workers=0))
+    with pytest.raises(ValueError):
+        list(gen_matching_files(resources / "**/*", workers=2, engine='pathlib'))
+
+
+@pytest.mark.parametrize("ordered", [True, False], ids="ordered={}".format)
+@pytest.mark.parametrize("pattern", ["basics/foo/*", "**/foo/**/**/[!x]*.y*ml", "*/foo/bar/*", "basics/**",
+                                     "nothere/**/*"])
+def test_processes(pattern, ordered):
+    """The multi-process search yields the same results, in the same order by default"""
+    resources = Path(__file__).parent / "resources"
+
+    ref = list(gen_matching_files(resources / pattern))
+    res = list(gen_matching_files(resources / pattern, processes=2, ordered=ordered))
+    if ordered:
+        assert res == ref
+    else:
+        assert sorted(res) == sorted(ref)
+
+
+def test_split_frames():
+    """Walking the frames one by one gives the same results than the serial walk"""
+    resources = str(Path(__file__).parent / "resources")
+    parts = ('**', 'foo', '**', '*.y*ml')
+    ref = list(WALK_ENGINES['scandir'](resources, parts))
+    for min_frames in (1, 5, 100):
+        frames = split_frames(resources, parts, min_frames)
+        res = list(walk_frames(frames, parts))
+        assert [p for i, p in enumerate(res) if p not in res[:i]] == ref
+
+
+def test_processes_invalid():
+    resources = Path(__file__).parent / "resources"
+    with pytest.raises(ValueError):
+        list(gen_matching_files(resources / "**/*", processes=0))
+    with pytest.raises(ValueError):
+        list(gen_matching_files(resources / "**/*", processes=2, workers=2))
+    with pytest.raises(ValueError):
+        list(gen_matching_files(resources / "**/*", processes=2, engine='pathlib'))
@@ -0,0 +1,89 @@
+import errno
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from fprules import watch_pattern, ADDED, MODIFIED, REMOVED
+from fprules import watch as watch_module
+
+
+BACKENDS = ['poll'] + (['inotify'] if sys.platform.startswith('linux') else [])
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_watch_pattern(tmpdir, backend):
+    tmpdir.join('inbox', 'a', 'x.ddl').write('x', ensure=True)
+    tmpdir.join('inbox', 'a', 'ignored.txt').write('x', ensure=True)
+    src_pattern = str(tmpdir.join('inbox', '**', '*.ddl'))
+
+    events = watch_pattern(src_pattern, './out/%%/%.csv', backend=backend, poll_interval=0.05, timeout=1)
+    item = next(events)
+    assert (item.change, item.name, str(item.dst_path)) == (ADDED, 'a/x', os.path.join('out', 'a', 'x.csv'))
+
+    def changes():
+        time.sleep(0.1)
+        tmpdir.join('inbox', 'b', 'c', 'y.ddl').write('y', ensure=True)
+        tmpdir.join('inbox', 'b', 'ignored.txt').write('y', ensure=True)
+        time.sleep(0.2)
+        tmpdir.join('inbox', 'a', 'x.ddl').write('xx')
+        time.sleep(0.2)
+        os.remove(str(tmpdir.join('inbox', 'b', 'c', 'y.ddl')))
+
+    t = threading.Thread(target=changes)
+    t.start()
+    received = [(i.change, i.name) for i in events]
+    t.join()
+    assert received == [(ADDED, 'b/c/y'), (MODIFIED, 'a/x'), (REMOVED, 'b/c/y')]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_watch_pattern_folders(tmpdir, backend):
+    """Removing a folder reports the removal of all its matches"""
+    tmpdir.join('inbox', 'a', 'x.ddl').write('x', ensure=True)
+    tmpdir.join('inbox', 'a', 'y.ddl').write('y', ensure=True)
+    tmpdir.join('inbox', 'b', 'z.ddl').write('z', ensure=True)
+    src_pattern = str(tmpdir.join('inbox', '*', '*.ddl'))
+
+    events = watch_pattern(src_pattern, '%.csv', backend=backend, poll_interval=0.05, timeout=1, initial=False)
+
+    def changes():
+        time.sleep(0.1)
+        tmpdir.join('inbox', 'a').remove()
+
+    t = threading.Thread(target=changes)
+    t.start()
+    received = sorted((i.change, i.name) for i in events)
+    t.join()
+    assert received == [(REMOVED, 'x'), (REMOVED, 'y')]
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotify is only available on linux")
+def test_watch_pattern_inotify_limit(tmpdir, monkeypatch):
+    """An error is raised when a folder can not be watched, for example when the limit of watches is reached"""
+    import ctypes
+    libc = watch_module._load_inotify()
+
+    class LimitedLibc(object):
+        def __init__(self):
+            self.inotify_init1 = libc.inotify_init1
+            self.inotify_rm_watch = libc.inotify_rm_watch
+
+        @staticmethod
+        def inotify_add_watch(fd, path, mask):
+            ctypes.set_errno(errno.ENOSPC)
+            return -1
+
+    monkeypatch.setattr(watch_module, '_load_inotify', LimitedLibc)
+    tmpdir.join('inbox', 'a', 'x.ddl').write('x', ensure=True)
+    with pytest.raises(OSError) as exc_info:
+        next(watch_pattern(str(tmpdir.join('inbox', '**', '*.ddl')), '%.csv', backend='inotify', timeout=0))
+    assert exc_info.value.errno == errno.ENOSPC
+    assert 'max_user_watches' in str(exc_info.value)
+
+
+def test_watch_pattern_invalid_backend():
+    with pytest.raises(ValueError):
+        next(watch_pattern('*.ddl', '%.csv', backend='foo'))
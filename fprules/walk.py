@@ -0,0 +1,854 @@
+"""
+Directory walk engines used by `gen_matching_files` to list the paths matching a glob pattern.
+
+A walk engine is a function `engine(root, pattern_parts, lister=None)` that receives the string path of the root
+folder to search and the tuple of glob pattern parts to match under it, and yields the string paths of all matching
+files and folders. Engines supporting it use the optional `lister` function to list folders, see `list_dir`. Engines
+may support other walk options as keyword arguments, such as `workers` and `ordered` for the scandir engine.
+"""
+import re
+from collections import OrderedDict
+from errno import ENOENT, ENOTDIR, EBADF, ELOOP, EACCES, EPERM
+from fnmatch import translate
+from os import sep, stat
+from os.path import normcase, exists, split
+from threading import Lock
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        # legacy python: use the backport if available
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+try:
+    from pathlib import Path, PurePath
+except ImportError:
+    from pathlib2 import Path, PurePath
+
+try:
+    from typing import Iterable, Tuple, Callable, Optional, List, Any, Union
+except ImportError:
+    pass
+
+
+# glob matching is case-insensitive on case-insensitive file systems (windows), as in `pathlib`
+_GLOB_FLAGS = re.IGNORECASE if normcase('A') == 'a' else 0
+
+# errors that are silently ignored when listing a folder, as in `pathlib`
+_IGNORED_ERRNOS = (ENOENT, ENOTDIR, EBADF, ELOOP, EACCES, EPERM)
+
+# the kinds of pattern segments
+_LITERAL, _WILDCARD, _RECURSIVE = 0, 1, 2
+
+
+def _compile_glob_part(part  # type: str
+                       ):
+    """
+    Compiles a single path element of a glob pattern (e.g. `'*.y*ml'`) into a matching function, using `fnmatch`.
+
+    :param part: the path element pattern. It should not be '**'.
+    :return: a function returning a match object (truthy) if its string argument matches the pattern, None otherwise.
+    """
+    return re.compile(translate(part), _GLOB_FLAGS).match
+
+
+def _translate_part(part  # type: str
+                    ):
+    # type: (...) -> str
+    """
+    Translates a path element of a glob pattern into a regular expression matching a single path element, with the
+    same rules than `fnmatch.translate`, except that wildcards and character classes never match a separator.
+    """
+    esc_sep = re.escape(sep)
+    not_sep = '[^%s]' % esc_sep
+    res = []
+    i, n = 0, len(part)
+    while i < n:
+        c = part[i]
+        i += 1
+        if c == '*':
+            # consecutive stars are equivalent to a single one
+            if not res or res[-1] != not_sep + '*':
+                res.append(not_sep + '*')
+        elif c == '?':
+            res.append(not_sep)
+        elif c == '[':
+            j = i
+            if j < n and part[j] == '!':
+                j += 1
+            if j < n and part[j] == ']':
+                j += 1
+            while j < n and part[j] != ']':
+                j += 1
+            if j >= n:
+                # not a character class
+                res.append('\\[')
+            else:
+                stuff = part[i:j].replace('\\', '\\\\')
+                i = j + 1
+                if stuff[0] == '!':
+                    stuff = '^' + stuff[1:]
+                elif stuff[0] in ('^', '['):
+                    stuff = '\\' + stuff
+                stuff = re.sub(r'([&~|])', r'\\\1', stuff)
+                res.append('(?!%s)[%s]' % (esc_sep, stuff))
+        else:
+            res.append(re.escape(c))
+    return ''.join(res)
+
+
+def compile_glob_regex(pattern_parts  # type: Tuple[str, ...]
+                       ):
+    """
+    Compiles a whole glob pattern into a single anchored regular expression, matching the normalized string paths
+    (as returned by `str(Path(...))`) that `Path.glob` would return for this pattern. Paths can therefore be matched
+    without accessing the file system, for example paths listed by git or read from a manifest file.
+
+    The regular expression has the following named groups:
+
+     - `'captured'`: the path elements matched from the first '**' to the last one, or None if they do not match any
+       path element. It is not defined if the pattern has no '**'.
+     - `'stem'`: the stem of the last path element, as `Path.stem`. It is not defined if the pattern ends with '**'.
+
+    Since paths are matched without accessing the file system, a trailing '**' matches any path under its folder,
+    including files, while `Path.glob` and the walk engines only yield folders for it. Callers matching listed paths
+    against such a pattern should check the kind of the matches themselves if needed.
+
+    :param pattern_parts: the tuple of parts of the glob pattern, as returned by `PurePath.parts`
+    :return: the compiled regular expression object
+    """
+    esc_sep = re.escape(sep)
+    not_sep = '[^%s]' % esc_sep
+
+    def part_regex(p):
+        return _translate_part(p) if _is_wildcard_part(p) else re.escape(p)
+
+    parts = list(pattern_parts)
+    regex = ''
+    absolute = bool(parts) and parts[0][-1:] == sep
+    if absolute:
+        # the root (and drive), without the trailing separator that is added before each element below
+        regex = re.escape(parts.pop(0)[:-1])
+
+    # -- the units of the pattern: single elements (False, regex), and the '**' span (True, regex)
+    units = [(False, part_regex(p)) for p in parts]
+    span_optional = False
+    dbl_idx = [i for i, p in enumerate(parts) if p == '**']
+    if dbl_idx:
+        first, last = dbl_idx[0], dbl_idx[-1]
+        middle = [p for p in parts[first:last + 1] if p != '**']
+        if not middle:
+            # only '**': at least one element in the group, the whole group being optional
+            span = '%s+(?:%s%s+)*' % (not_sep, esc_sep, not_sep)
+            span_optional = True
+        else:
+            # the first '**' is followed by a separator, the next ones are preceded by a separator
+            span = '(?:%s+%s)*' % (not_sep, esc_sep)
+            started = False
+            for p in parts[first + 1:last + 1]:
+                if p == '**':
+                    if started:
+                        span += '(?:%s%s+)*' % (esc_sep, not_sep)
+                else:
+                    span += (esc_sep if started else '') + part_regex(p)
+                    started = True
+        units[first:last + 1] = [(True, span)]
+
+    # -- the stem of the last element
+    if units and not units[-1][0]:
+        # the stem ends before the last dot, if it is not the first character and is followed by a suffix
+        units[-1] = (False, '(?=(?P<stem>%s+(?=\\.[^%s.]+\\Z)|%s+\\Z))%s'
+                     % (not_sep, esc_sep, not_sep, units[-1][1]))
+
+    skip_sep = False
+    for i, (is_span, unit) in enumerate(units):
+        lead = '' if skip_sep or (i == 0 and not absolute) else esc_sep
+        skip_sep = False
+        if not is_span:
+            regex += lead + unit
+        elif not span_optional:
+            regex += lead + '(?P<captured>%s)' % unit
+        elif i < len(units) - 1:
+            # the separator following the span is only there if the span matches
+            regex += lead + '(?:(?P<captured>%s)%s)?' % (unit, esc_sep)
+            skip_sep = True
+        else:
+            regex += '(?:%s(?P<captured>%s))?' % (lead, unit)
+
+    return re.compile(regex + '\\Z', re.DOTALL | _GLOB_FLAGS)
+
+
+def _is_wildcard_part(part  # type: str
+                      ):
+    """Return True if path element `part` contains special glob characters"""
+    return '*' in part or '?' in part or '[' in part
+
+
+def _compile_segments(pattern_parts  # type: Tuple[str, ...]
+                      ):
+    # type: (...) -> Tuple[Tuple[int, Any], ...]
+    """
+    Compiles the glob pattern parts into a tuple of segments `(kind, arg)`, where `arg` is the literal name for
+    literal segments, the matching function for wildcard segments, and None for '**' segments.
+    """
+    segments = []
+    for part in pattern_parts:
+        if part == '**':
+            segments.append((_RECURSIVE, None))
+        elif '**' in part:
+            # raise same error than glob
+            raise ValueError("Invalid pattern: '**' can only be an entire path component")
+        elif _is_wildcard_part(part):
+            segments.append((_WILDCARD, _compile_glob_part(part)))
+        else:
+            segments.append((_LITERAL, part))
+    return tuple(segments)
+
+
+def _join(dir_path,  # type: str
+          name       # type: str
+          ):
+    # type: (...) -> str
+    """Fast equivalent of `os.path.join` for a folder path and an entry name, mimicking the `pathlib` str output"""
+    if dir_path == '.':
+        return name
+    elif dir_path[-1] == sep:
+        # a root folder such as '/' or 'C:\\'
+        return dir_path + name
+    else:
+        return dir_path + sep + name
+
+
+def list_dir(dir_path  # type: str
+             ):
+    # type: (...) -> Optional[List[Any]]
+    """
+    Default folder lister used by the scandir engine.
+
+    :param dir_path: the string path of the folder to list
+    :return: the list of `os.DirEntry` in the folder, or None if the folder does not exist, is not a folder, or can
+        not be read.
+    """
+    try:
+        return list(scandir(dir_path))
+    except OSError as e:
+        if e.errno in _IGNORED_ERRNOS:
+            return None
+        raise
+
+
+def _entry_is_dir(entry, follow_symlinks=True):
+    """Return True if DirEntry `entry` is a folder, ignoring the same errors than `pathlib`"""
+    try:
+        return entry.is_dir() if follow_symlinks else (entry.is_dir() and not entry.is_symlink())
+    except OSError as e:
+        if e.errno in _IGNORED_ERRNOS:
+            return False
+        raise
+
+
+def _expand_frame(dir_path,    # type: str
+                  idx,         # type: int
+                  entries,     # type: Optional[List[Any]]
+                  segments,    # type: Tuple[Tuple[int, Any], ...]
+                  lister,      # type: Callable[[str], Optional[List[Any]]]
+                  pruned=None  # type: Callable[[int], Any]
+                  ):
+    # type: (...) -> List[Tuple[str, int, Optional[List[Any]]]]
+    """
+    Matches pattern segment `segments[idx]` against folder `dir_path`, and returns the list of resulting frames, in
+    the same order than `pathlib`'s glob.
+
+    A frame is a tuple `(path, next_idx, entries)`. When `next_idx` is `len(segments)` the path is a match, otherwise
+    the frame has to be expanded in turn. `entries` is the listing of `path` if it is already known, or None.
+
+    :param dir_path: the string path of the folder to match against
+    :param idx: the index of the segment to match
+    :param entries: the listing of `dir_path` if it is already known, None otherwise
+    :param segments: the compiled pattern segments
+    :param lister: the function to use to list a folder
+    :param pruned: an optional function called with the number of sub-folders of `dir_path` that are not entered,
+        when `dir_path` is listed here for a wildcard segment. Symbolic links to folders are not counted.
+    :return:
+    """
+    kind, arg = segments[idx]
+    is_last = idx == len(segments) - 1
+
+    if kind == _LITERAL:
+        child_path = _join(dir_path, arg)
+        if not is_last:
+            # no need to check that the child is a folder: listing it in the next segment will tell
+            return [(child_path, idx + 1, None)]
+        elif exists(child_path):
+            return [(child_path, idx + 1, None)]
+        else:
+            return []
+
+    # the listings passed by a '**' segment are not counted: all their sub-folders are entered by the '**'
+    count_pruned = pruned is not None and entries is None
+    if entries is None:
+        entries = lister(dir_path)
+        if entries is None:
+            return []
+
+    if kind == _WILDCARD:
+        if not count_pruned:
+            return [(_join(dir_path, entry.name), idx + 1, None)
+                    for entry in entries
+                    if arg(entry.name) and (is_last or _entry_is_dir(entry))]
+        frames = []
+        nb_pruned = 0
+        for entry in entries:
+            if arg(entry.name) and (is_last or _entry_is_dir(entry)):
+                frames.append((_join(dir_path, entry.name), idx + 1, None))
+            elif _entry_is_dir(entry, follow_symlinks=False):
+                nb_pruned += 1
+        pruned(nb_pruned)
+        return frames
+    else:
+        # '**': the folder itself matches, and the sub-folders recursively (symlinks are not followed, as in pathlib).
+        # Pass the listing to the first frame so that the successor segment does not list the folder a second time.
+        frames = [(dir_path, idx + 1, entries)]
+        frames += [(_join(dir_path, entry.name), idx, None)
+                   for entry in entries if _entry_is_dir(entry, follow_symlinks=False)]
+        return frames
+
+
+def scandir_engine(root,           # type: str
+                   pattern_parts,  # type: Tuple[str, ...]
+                   lister=None,    # type: Callable[[str], Optional[List[Any]]]
+                   workers=None,   # type: int
+                   ordered=True,   # type: bool
+                   pruned=None     # type: Callable[[int], Any]
+                   ):
+    # type: (...) -> Iterable[str]
+    """
+    A walk engine relying on `os.scandir`. It yields the same paths in the same order than `Path(root).glob(pattern)`
+    but works on plain strings, relies on the file type information cached in `os.DirEntry`, only enters the
+    sub-folders that can match the next pattern part, and lists each folder at most once per '**' pattern part.
+
+    When `workers` is set, folders are listed concurrently on a pool of `workers` threads, which is much faster on
+    file systems with a high latency such as network file systems. By default the paths are still yielded in the same
+    order, while the folders that will be needed next are listed in advance. With `ordered=False` the paths are
+    yielded as soon as they are found, in no particular order.
+
+    :param root: the string path of the folder to search
+    :param pattern_parts: the tuple of glob pattern parts to match in `root`
+    :param lister: an alternate function to list folders, with the same contract than `list_dir`
+    :param workers: the number of threads to use to list folders. The default `None` lists them in the current
+        thread.
+    :param ordered: when `workers` is set, a boolean indicating if the paths should be yielded in the same order than
+        in the serial walk (default `True`), or as soon as they are found (`False`).
+    :param pruned: an optional function called with the number of sub-folders that the walk does not enter in each
+        folder it lists for a wildcard pattern part, for example to collect statistics. It can be called from several
+        threads when `workers` is set.
+    :return: a generator of matching string paths
+    """
+    if lister is None:
+        lister = list_dir
+
+    segments = _compile_segments(pattern_parts)
+
+    if workers is None:
+        walk = _walk_ordered(root, segments, lister, pruned=pruned)
+    else:
+        if workers < 1:
+            raise ValueError("`workers` should be a positive integer, found %r" % workers)
+        if ordered:
+            walk = _walk_ordered_prefetch(root, segments, lister, workers, pruned)
+        else:
+            walk = _walk_unordered(root, segments, lister, workers, pruned)
+
+    # several '**' may match the same path several times: remember the ones already yielded
+    if sum(1 for k, _ in segments if k == _RECURSIVE) > 1:
+        return _unique(walk)
+    else:
+        return walk
+
+
+def _unique(paths  # type: Iterable[str]
+            ):
+    """Yields the paths that were not already yielded"""
+    yielded = set()
+    for path in paths:
+        if path not in yielded:
+            yielded.add(path)
+            yield path
+
+
+def _walk_ordered(root,         # type: str
+                  segments,     # type: Tuple[Tuple[int, Any], ...]
+                  lister,       # type: Callable[[str], Optional[List[Any]]]
+                  start_idx=0,  # type: int
+                  pruned=None   # type: Callable[[int], Any]
+                  ):
+    # type: (...) -> Iterable[str]
+    """
+    The serial depth-first traversal used by `scandir_engine`, preserving the order of frames at each level. It
+    starts with frame `(root, start_idx)`, that should not be a match.
+    """
+    nb_segments = len(segments)
+    stack = [iter(_expand_frame(root, start_idx, None, segments, lister, pruned))]
+    while stack:
+        for path, idx, entries in stack[-1]:
+            if idx == nb_segments:
+                yield path
+            else:
+                stack.append(iter(_expand_frame(path, idx, entries, segments, lister, pruned)))
+                break
+        else:
+            stack.pop()
+
+
+def split_frames(root,           # type: str
+                 pattern_parts,  # type: Tuple[str, ...]
+                 min_frames,     # type: int
+                 lister=None,    # type: Callable[[str], Optional[List[Any]]]
+                 max_depth=3     # type: int
+                 ):
+    # type: (...) -> List[Tuple[str, int]]
+    """
+    Splits the scandir walk of `pattern_parts` in `root` into a list of frames `(path, next_idx)` that can be walked
+    independently with `walk_frames`, for example in several processes. Concatenating the results of each frame
+    gives the same paths in the same order than `scandir_engine` (except that paths matched several times by several
+    '**' are not removed).
+
+    The frames are expanded level by level, until there are at least `min_frames` of them or `max_depth` levels were
+    expanded.
+
+    :param root: the string path of the folder to search
+    :param pattern_parts: the tuple of glob pattern parts to match in `root`
+    :param min_frames: the minimum number of frames wanted
+    :param lister: an alternate function to list folders, with the same contract than `list_dir`
+    :param max_depth: the maximum number of levels to expand
+    :return:
+    """
+    if lister is None:
+        lister = list_dir
+    segments = _compile_segments(pattern_parts)
+    nb_segments = len(segments)
+
+    frames = [(root, 0, None)]
+    for _ in range(max_depth):
+        if len(frames) >= min_frames or all(idx == nb_segments for _, idx, _ in frames):
+            break
+        expanded = []
+        for path, idx, entries in frames:
+            if idx == nb_segments:
+                expanded.append((path, idx, entries))
+            else:
+                expanded += _expand_frame(path, idx, entries, segments, lister)
+        frames = expanded
+
+    return [(path, idx) for path, idx, _ in frames]
+
+
+def walk_frames(frames,         # type: Iterable[Tuple[str, int]]
+                pattern_parts,  # type: Tuple[str, ...]
+                lister=None     # type: Callable[[str], Optional[List[Any]]]
+                ):
+    # type: (...) -> Iterable[str]
+    """
+    Yields the paths matching `pattern_parts` from each of the `frames` returned by `split_frames`, in order.
+
+    :param frames: a sequence of frames `(path, next_idx)` returned by `split_frames`
+    :param pattern_parts: the tuple of glob pattern parts, the same than in `split_frames`
+    :param lister: an alternate function to list folders, with the same contract than `list_dir`
+    :return:
+    """
+    if lister is None:
+        lister = list_dir
+    segments = _compile_segments(pattern_parts)
+    for path, idx in frames:
+        if idx == len(segments):
+            yield path
+        else:
+            for p in _walk_ordered(path, segments, lister, start_idx=idx):
+                yield p
+
+
+# the maximum number of folder listings done in advance per worker thread in the ordered parallel walk
+PREFETCH_PER_WORKER = 256
+
+
+def _walk_ordered_prefetch(root,        # type: str
+                           segments,    # type: Tuple[Tuple[int, Any], ...]
+                           lister,      # type: Callable[[str], Optional[List[Any]]]
+                           workers,     # type: int
+                           pruned=None  # type: Callable[[int], Any]
+                           ):
+    # type: (...) -> Iterable[str]
+    """
+    The same traversal than `_walk_ordered`, but the folders that will be expanded later are listed in advance on a
+    thread pool, as soon as they are known.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    nb_segments = len(segments)
+    max_pending = PREFETCH_PER_WORKER * workers
+    pending = dict()
+
+    def prefetch(frames):
+        for path, idx, entries in frames:
+            if len(pending) >= max_pending:
+                break
+            if entries is None and idx < nb_segments and segments[idx][0] != _LITERAL and path not in pending:
+                pending[path] = pool.submit(lister, path)
+        return iter(frames)
+
+    def prefetched_lister(dir_path):
+        future = pending.pop(dir_path, None)
+        return lister(dir_path) if future is None else future.result()
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        stack = [prefetch(_expand_frame(root, 0, None, segments, prefetched_lister, pruned))]
+        while stack:
+            for path, idx, entries in stack[-1]:
+                if idx == nb_segments:
+                    yield path
+                else:
+                    stack.append(prefetch(_expand_frame(path, idx, entries, segments, prefetched_lister, pruned)))
+                    break
+            else:
+                stack.pop()
+    finally:
+        _shutdown(pool, pending.values())
+
+
+def _walk_unordered(root,        # type: str
+                    segments,    # type: Tuple[Tuple[int, Any], ...]
+                    lister,      # type: Callable[[str], Optional[List[Any]]]
+                    workers,     # type: int
+                    pruned=None  # type: Callable[[int], Any]
+                    ):
+    # type: (...) -> Iterable[str]
+    """
+    A parallel traversal where each frame is expanded on a thread pool. Matching paths are yielded as soon as they
+    are found.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    nb_segments = len(segments)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pending = {pool.submit(_expand_frame, root, 0, None, segments, lister, pruned)}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for path, idx, entries in future.result():
+                    if idx == nb_segments:
+                        yield path
+                    else:
+                        pending.add(pool.submit(_expand_frame, path, idx, entries, segments, lister, pruned))
+    finally:
+        _shutdown(pool, pending)
+
+
+def _shutdown(pool, pending_futures):
+    """Cancels the pending futures and shuts the thread pool down without waiting"""
+    for future in pending_futures:
+        future.cancel()
+    pool.shutdown(wait=False)
+
+
+def scandir_multi_walk(root,                 # type: str
+                       patterns_parts,       # type: Iterable[Tuple[str, ...]]
+                       lister=None           # type: Callable[[str], Optional[List[Any]]]
+                       ):
+    # type: (...) -> Iterable[Tuple[int, str]]
+    """
+    Searches the paths matching several glob patterns under the same `root` folder in a single traversal: each folder
+    is listed at most once, and each of its entries is tested against all patterns.
+
+    Folders are visited depth-first in the order of the entries of their parent, and for each folder the matches are
+    yielded in the order of its entries. For each pattern, this is the same order than `scandir_engine` when no '**'
+    is followed by more than one pattern part, such as in `'**/*.ddl'`, whatever the other patterns. Each path is
+    yielded at most once per pattern.
+
+    :param root: the string path of the folder to search
+    :param patterns_parts: an iterable of tuples of glob pattern parts to match in `root`
+    :param lister: an alternate function to list folders, with the same contract than `list_dir`
+    :return: a generator of tuples (<pattern index>, <matching string path>)
+    """
+    if lister is None:
+        lister = list_dir
+
+    segments_list = tuple(_compile_segments(parts) for parts in patterns_parts)
+    initial_states = tuple((r, 0) for r in range(len(segments_list)))
+
+    stack = [iter(((root, initial_states),))]
+    while stack:
+        for dir_path, states in stack[-1]:
+            matches, children = _expand_multi_frame(dir_path, states, segments_list, lister)
+            for match in matches:
+                yield match
+            if children:
+                stack.append(iter(children))
+                break
+        else:
+            stack.pop()
+
+
+def _expand_multi_frame(dir_path,       # type: str
+                        states,         # type: Iterable[Tuple[int, int]]
+                        segments_list,  # type: Tuple[Tuple[Tuple[int, Any], ...], ...]
+                        lister          # type: Callable[[str], Optional[List[Any]]]
+                        ):
+    # type: (...) -> Tuple[List[Tuple[int, str]], List[Tuple[str, Tuple[Tuple[int, int], ...]]]]
+    """
+    Matches the states `(pattern index, segment index)` against folder `dir_path`, and returns a tuple containing the
+    list of matches `(pattern index, path)` and the list of sub-folders to visit next with their states.
+    """
+    # add the states reached by matching '**' with zero path elements, removing duplicates
+    all_states = OrderedDict()
+    for r, i in states:
+        segments = segments_list[r]
+        all_states[(r, i)] = None
+        while i < len(segments) and segments[i][0] == _RECURSIVE:
+            i += 1
+            all_states[(r, i)] = None
+
+    matches = []
+    children = OrderedDict()
+    # the sub-folders named by a literal part. When the folder is listed, they are visited at their position in the
+    # listing, so that the order of the other patterns is the same than when they are searched alone.
+    literal_children = OrderedDict()
+    listing_states = []
+    for r, i in all_states:
+        segments = segments_list[r]
+        if i == len(segments):
+            # a trailing '**' matches the folder itself: the listing will tell if it exists
+            listing_states.append((r, i))
+            continue
+        kind, arg = segments[i]
+        if kind == _LITERAL:
+            if i < len(segments) - 1:
+                literal_children.setdefault(arg, []).append((r, i + 1))
+            else:
+                child_path = _join(dir_path, arg)
+                if exists(child_path):
+                    matches.append((r, child_path))
+        else:
+            listing_states.append((r, i))
+
+    if listing_states:
+        entries = lister(dir_path)
+        if entries is not None:
+            for r, i in listing_states:
+                if i == len(segments_list[r]):
+                    matches.append((r, dir_path))
+
+            for entry in entries:
+                name = entry.name
+                child_path = None
+                if literal_children:
+                    literal_states = literal_children.pop(name, None)
+                    if literal_states is not None:
+                        child_path = _join(dir_path, name)
+                        children[child_path] = literal_states
+                for r, i in listing_states:
+                    segments = segments_list[r]
+                    if i == len(segments):
+                        continue
+                    kind, arg = segments[i]
+                    if kind == _WILDCARD:
+                        if arg(name):
+                            if child_path is None:
+                                child_path = _join(dir_path, name)
+                            if i == len(segments) - 1:
+                                matches.append((r, child_path))
+                            elif _entry_is_dir(entry):
+                                children.setdefault(child_path, []).append((r, i + 1))
+                    elif _entry_is_dir(entry, follow_symlinks=False):
+                        # '**' matching one more path element
+                        if child_path is None:
+                            child_path = _join(dir_path, name)
+                        children.setdefault(child_path, []).append((r, i))
+
+    # the literal sub-folders that were not listed: listing them in turn will tell if they exist
+    for name, literal_states in literal_children.items():
+        children.setdefault(_join(dir_path, name), []).extend(literal_states)
+
+    return matches, list(children.items())
+
+
+def pathlib_engine(root,           # type: str
+                   pattern_parts,  # type: Tuple[str, ...]
+                   lister=None,    # type: Callable[[str], Optional[List[Any]]]
+                   **walk_options
+                   ):
+    # type: (...) -> Iterable[str]
+    """
+    The legacy walk engine, relying on `Path.glob`.
+
+    :param root: the string path of the folder to search
+    :param pattern_parts: the tuple of glob pattern parts to match in `root`
+    :param lister: not supported by this engine, should be None
+    :param walk_options: no other walk option is supported by this engine
+    :return: a generator of matching string paths
+    """
+    if lister is not None:
+        raise ValueError("The 'pathlib' walk engine does not support custom folder listers")
+    if walk_options:
+        raise ValueError("The 'pathlib' walk engine does not support options %s" % sorted(walk_options))
+    for p in Path(root).glob(str(PurePath(*pattern_parts))):
+        yield str(p)
+
+
+def git_engine(root,           # type: str
+               pattern_parts,  # type: Tuple[str, ...]
+               lister=None,    # type: Callable[[str], Optional[List[Any]]]
+               **walk_options
+               ):
+    # type: (...) -> Iterable[str]
+    """
+    A walk engine reading the git index of the repository containing `root`, instead of listing folders. Only the
+    files tracked by git (and the folders containing them) are found. See `fprules.gitindex.git_walk`.
+    """
+    from .gitindex import git_walk
+    return git_walk(root, pattern_parts, lister=lister, **walk_options)
+
+
+def git_untracked_engine(root,           # type: str
+                         pattern_parts,  # type: Tuple[str, ...]
+                         lister=None,    # type: Callable[[str], Optional[List[Any]]]
+                         **walk_options
+                         ):
+    # type: (...) -> Iterable[str]
+    """
+    Same as `git_engine`, but the untracked files that are not ignored are also found, using `git ls-files`. See
+    `fprules.gitindex.git_walk`.
+    """
+    from .gitindex import git_walk
+    return git_walk(root, pattern_parts, lister=lister, untracked=True, **walk_options)
+
+
+WALK_ENGINES = {
+    'pathlib': pathlib_engine,
+    'git': git_engine,
+    'git+untracked': git_untracked_engine
+}
+if scandir is not None:
+    WALK_ENGINES['scandir'] = scandir_engine
+
+DEFAULT_ENGINE = 'scandir' if scandir is not None else 'pathlib'
+
+
+def get_engine(engine=None  # type: Union[str, Callable]
+               ):
+    # type: (...) -> Callable
+    """
+    Returns the walk engine function corresponding to `engine`.
+
+    :param engine: the name of a walk engine in `WALK_ENGINES`, a walk engine function, or None to use the default
+        engine (`'scandir'` when `os.scandir` is available, `'pathlib'` otherwise).
+    :return:
+    """
+    if engine is None:
+        engine = DEFAULT_ENGINE
+
+    if callable(engine):
+        return engine
+
+    try:
+        return WALK_ENGINES[engine]
+    except KeyError:
+        raise ValueError("Unknown walk engine '%s'. Available engines: %s" % (engine, sorted(WALK_ENGINES)))
+
+
+def _mtime_ns(st):
+    # type: (...) -> int
+    """Returns the modification time of stat result `st`, in nanoseconds"""
+    mtime = getattr(st, 'st_mtime_ns', None)
+    if mtime is None:
+        mtime = int(st.st_mtime * 1e9)
+    return mtime
+
+
+class EntriesMemo(object):
+    """
+    A bounded memo of folder listings, used to get the `stat` of many files with one listing per folder.
+
+    Listings made by a walk can be recorded with `recorder(lister)`, so that the entries of the matches can be
+    reused afterwards: on windows, `os.DirEntry.stat()` does not require any system call. Other folders can be
+    listed on demand by `stat(path, list_missing=True)`, so that missing files in a folder are detected without any
+    `stat` at all.
+    """
+    __slots__ = ('_listings', '_max_dirs', '_lock')
+
+    def __init__(self,
+                 max_dirs=1024  # type: int
+                 ):
+        """
+        :param max_dirs: the maximum number of folder listings kept in memory. The least recently used ones are
+            discarded first.
+        """
+        self._listings = OrderedDict()
+        self._max_dirs = max_dirs
+        self._lock = Lock()
+
+    def _record(self,
+                dir_path,  # type: str
+                entries    # type: Optional[List[Any]]
+                ):
+        """Stores the listing `entries` of folder `dir_path`, indexed by normalized case entry name"""
+        listing = None if entries is None else dict((normcase(e.name), e) for e in entries)
+        with self._lock:
+            self._listings[dir_path] = listing
+            if len(self._listings) > self._max_dirs:
+                self._listings.popitem(last=False)
+        return listing
+
+    def recorder(self,
+                 lister  # type: Callable[[str], Optional[List[Any]]]
+                 ):
+        # type: (...) -> Callable[[str], Optional[List[Any]]]
+        """Returns a folder lister equivalent to `lister`, that records the listings in this memo"""
+        def recording_lister(dir_path):
+            entries = lister(dir_path)
+            self._record(dir_path, entries)
+            return entries
+        return recording_lister
+
+    def stat(self,
+             path_str,           # type: str
+             list_missing=False  # type: bool
+             ):
+        """
+        Returns the `os.stat` result of file `path_str`, or None if it does not exist.
+
+        :param path_str: the normalized string path of the file
+        :param list_missing: if True, the parent folder is listed when its listing is not in the memo. Otherwise, a
+            `stat` is done on the file.
+        :return:
+        """
+        dir_path, name = split(path_str)
+        if not dir_path:
+            dir_path = '.'
+        with self._lock:
+            listing = self._listings.get(dir_path, self)
+            if listing is not self:
+                # keep it as the most recently used
+                del self._listings[dir_path]
+                self._listings[dir_path] = listing
+
+        if listing is self:
+            if list_missing and scandir is not None:
+                listing = self._record(dir_path, list_dir(dir_path))
+            else:
+                try:
+                    return stat(path_str)
+                except OSError:
+                    return None
+
+        entry = None if listing is None else listing.get(normcase(name))
+        if entry is None:
+            return None
+        try:
+            return entry.stat()
+        except OSError:
+            return None
@@ -0,0 +1,486 @@
+"""
+Watch mode: yield the items of a rule as their source files are added, modified or removed.
+
+Two backends are available: `'inotify'` relies on the linux kernel notifications (through `ctypes`, no dependency
+needed), and `'poll'` periodically checks the modification time of the watched folders and matched files. In both
+cases the folders are listed once during the initial scan, and then only the folders that changed are listed again.
+"""
+import os
+import struct
+import sys
+from errno import EINTR, ENOENT, ENOTDIR, ENOSPC
+from time import time, sleep
+
+from .cache import RACY_DELAY
+from .changes import ChangedFileItem, ADDED, MODIFIED, REMOVED, _signature
+from .main import compile_pattern
+from .walk import list_dir, _compile_segments, _entry_is_dir, _join, _mtime_ns, _WILDCARD, _RECURSIVE, _GLOB_FLAGS
+
+try:
+    from typing import Union, Any, Iterable, Optional, FrozenSet, Dict, List, Tuple, Callable
+    from .main import FilePattern
+except ImportError:
+    pass
+
+
+def _closure(states,   # type: FrozenSet[int]
+             segments  # type: Tuple[Tuple[int, Any], ...]
+             ):
+    # type: (...) -> FrozenSet[int]
+    """Adds to `states` the segment indices that can be reached through '**' segments matching zero elements"""
+    result = set(states)
+    todo = list(states)
+    while todo:
+        s = todo.pop()
+        if s < len(segments) and segments[s][0] == _RECURSIVE and s + 1 not in result:
+            result.add(s + 1)
+            todo.append(s + 1)
+    return frozenset(result)
+
+
+def _step(states,   # type: FrozenSet[int]
+          name,     # type: str
+          segments  # type: Tuple[Tuple[int, Any], ...]
+          ):
+    # type: (...) -> FrozenSet[int]
+    """Returns the segment indices that can be reached from `states` after matching path element `name`"""
+    nb_segments = len(segments)
+    result = set()
+    for s in states:
+        if s == nb_segments:
+            continue
+        kind, arg = segments[s]
+        if kind == _RECURSIVE:
+            result.add(s)
+        elif kind == _WILDCARD:
+            if arg(name):
+                result.add(s + 1)
+        elif name == arg or (_GLOB_FLAGS and name.lower() == arg.lower()):
+            result.add(s + 1)
+    return _closure(result, segments)
+
+
+class _Watcher(object):
+    """
+    The state of a watched rule: the watched folders, and the signature of the matched files in each of them.
+    """
+    __slots__ = ('pattern', 'root', 'segments', 'dirs', 'files', 'on_new_dir', 'on_removed_dir')
+
+    def __init__(self,
+                 pattern  # type: FilePattern
+                 ):
+        self.pattern = pattern
+        src_pattern = pattern.src_pattern
+        if pattern.src_glob_start is None:
+            root, parts = src_pattern.parent, (src_pattern.name,)
+        else:
+            root = src_pattern.parents[len(src_pattern.parts) - pattern.src_glob_start - 1]
+            parts = src_pattern.parts[pattern.src_glob_start:]
+        self.root = str(root)
+        self.segments = _compile_segments(parts)
+        # watched folder path -> [pattern states, folder mtime, names of the watched sub-folders]
+        self.dirs = dict()    # type: Dict[str, List[Any]]
+        # watched folder path -> {entry name -> signature of the matched entry}
+        self.files = dict()   # type: Dict[str, Dict[str, Tuple[int, int]]]
+        # hooks called when a folder starts or stops being watched
+        self.on_new_dir = None      # type: Callable[[str], None]
+        self.on_removed_dir = None  # type: Callable[[str], None]
+
+    def _item(self,
+              change,   # type: str
+              path_str  # type: str
+              ):
+        # type: (...) -> ChangedFileItem
+        """Creates the item for a change of source `path_str`"""
+        return ChangedFileItem(self.pattern, path_str, self.pattern._expand_str(path_str).captured_subpath, change)
+
+    def start(self):
+        # type: (...) -> List[ChangedFileItem]
+        """Performs the initial scan, and returns the items of all files matching the pattern"""
+        changes = []
+        self.add_dir(self.root, _closure(frozenset((0,)), self.segments), changes)
+        return changes
+
+    def add_dir(self,
+                dir_path,  # type: str
+                states,    # type: FrozenSet[int]
+                changes    # type: List[ChangedFileItem]
+                ):
+        """Starts watching folder `dir_path` and its relevant sub-folders, and reports all the matches they contain"""
+        if self.on_new_dir is not None:
+            # start watching before listing, so that no event is missed
+            self.on_new_dir(dir_path)
+        self.dirs[dir_path] = [states, None, set()]
+        self.files[dir_path] = dict()
+        parent_path, name = os.path.split(dir_path)
+        parent_info = self.dirs.get(parent_path or '.')
+        if parent_info is not None:
+            parent_info[2].add(name)
+        self.scan_dir(dir_path, changes)
+
+    def remove_dir(self,
+                   dir_path,  # type: str
+                   changes    # type: List[ChangedFileItem]
+                   ):
+        """Stops watching folder `dir_path` and all its sub-folders, and reports the removal of all their matches"""
+        dir_info = self.dirs.pop(dir_path, None)
+        if dir_info is None:
+            return
+        parent_path, name = os.path.split(dir_path)
+        parent_info = self.dirs.get(parent_path or '.')
+        if parent_info is not None:
+            parent_info[2].discard(name)
+        if self.on_removed_dir is not None:
+            self.on_removed_dir(dir_path)
+
+        for name in self.files.pop(dir_path):
+            changes.append(self._item(REMOVED, _join(dir_path, name)))
+        for name in dir_info[2]:
+            self.remove_dir(_join(dir_path, name), changes)
+
+    def scan_dir(self,
+                 dir_path,  # type: str
+                 changes    # type: List[ChangedFileItem]
+                 ):
+        """Lists watched folder `dir_path` again, and reports the changes of its entries"""
+        dir_info = self.dirs[dir_path]
+        try:
+            dir_info[1] = _mtime_ns(os.stat(dir_path))
+        except OSError:
+            self.remove_dir(dir_path, changes)
+            return
+
+        entries = list_dir(dir_path)
+        if entries is None:
+            self.remove_dir(dir_path, changes)
+            return
+
+        names = set()
+        for entry in entries:
+            names.add(entry.name)
+            self.update_entry(dir_path, entry.name, entry, changes)
+        for name in [n for n in self.files.get(dir_path, ()) if n not in names]:
+            self.update_entry(dir_path, name, None, changes)
+        for name in [n for n in dir_info[2] if n not in names]:
+            self.remove_dir(_join(dir_path, name), changes)
+
+    def update_entry(self,
+                     dir_path,  # type: str
+                     name,      # type: str
+                     entry,     # type: Optional[Any]
+                     changes,   # type: List[ChangedFileItem]
+                     check=False
+                     ):
+        """
+        Reports the changes of entry `name` in watched folder `dir_path`.
+
+        :param entry: the `os.DirEntry` of the entry, or None if it does not exist. When `check` is True, it is
+            ignored and the file system is checked instead.
+        """
+        path = _join(dir_path, name)
+        if check:
+            entry = _PathEntry(path) if os.path.lexists(path) else None
+
+        states = _step(self.dirs[dir_path][0], name, self.segments)
+        files = self.files[dir_path]
+
+        if len(self.segments) in states:
+            # a match
+            try:
+                signature = None if entry is None else _signature(entry.stat())
+            except OSError:
+                signature = None
+            previous = files.get(name)
+            if signature is None:
+                if previous is not None:
+                    del files[name]
+                    changes.append(self._item(REMOVED, path))
+            elif previous is None:
+                files[name] = signature
+                changes.append(self._item(ADDED, path))
+            elif previous != signature:
+                files[name] = signature
+                changes.append(self._item(MODIFIED, path))
+
+        if any(s < len(self.segments) for s in states):
+            # a folder that may contain matches
+            follow_symlinks = not any(self.segments[s][0] == _RECURSIVE for s in states if s < len(self.segments))
+            is_dir = entry is not None and _entry_is_dir(entry, follow_symlinks=follow_symlinks)
+            if is_dir and path not in self.dirs:
+                self.add_dir(path, states, changes)
+            elif not is_dir and path in self.dirs:
+                self.remove_dir(path, changes)
+
+    def check_files(self,
+                    changes  # type: List[ChangedFileItem]
+                    ):
+        """Checks the signature of all matched files, to report the modified ones"""
+        for dir_path, files in list(self.files.items()):
+            for name, signature in list(files.items()):
+                try:
+                    unchanged = _signature(os.stat(_join(dir_path, name))) == signature
+                except OSError:
+                    unchanged = False
+                if not unchanged and dir_path in self.dirs:
+                    self.update_entry(dir_path, name, None, changes, check=True)
+
+
+class _PathEntry(object):
+    """A minimal equivalent of `os.DirEntry` for a path"""
+    __slots__ = ('path',)
+
+    def __init__(self, path):
+        self.path = path
+
+    def stat(self, follow_symlinks=True):
+        return os.stat(self.path) if follow_symlinks else os.lstat(self.path)
+
+    def is_dir(self, follow_symlinks=True):
+        return os.path.isdir(self.path) and (follow_symlinks or not os.path.islink(self.path))
+
+    def is_symlink(self):
+        return os.path.islink(self.path)
+
+
+def _watch_poll(watcher,        # type: _Watcher
+                initial,        # type: bool
+                poll_interval,  # type: float
+                timeout         # type: Optional[float]
+                ):
+    # type: (...) -> Iterable[ChangedFileItem]
+    """
+    The polling backend: every `poll_interval` seconds, each watched folder is listed again only if its modification
+    time changed, and each matched file is checked with a single `stat`.
+    """
+    changes = watcher.start()
+    if initial:
+        for item in changes:
+            yield item
+
+    last_change = time()
+    while timeout is None or time() - last_change < timeout:
+        sleep(poll_interval)
+        changes = []
+        now = time()
+        for dir_path, dir_info in list(watcher.dirs.items()):
+            if dir_path not in watcher.dirs:
+                # removed with a parent folder
+                continue
+            try:
+                mtime = _mtime_ns(os.stat(dir_path))
+            except OSError:
+                mtime = None
+            # folders modified recently may be modified again without their mtime changing: list them again
+            if mtime is None or mtime != dir_info[1] or now - mtime / 1e9 < RACY_DELAY:
+                watcher.scan_dir(dir_path, changes)
+        watcher.check_files(changes)
+
+        if changes:
+            last_change = time()
+            for item in changes:
+                yield item
+
+
+# inotify constants, see `man inotify`
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ONLYDIR = 0x1000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_IN_WATCH_MASK = (_IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+                  | _IN_DELETE_SELF | _IN_ONLYDIR)
+_IN_EVENT = struct.Struct('iIII')
+
+
+def _load_inotify():
+    """Returns the libc with the inotify functions, or None if inotify is not available"""
+    if not sys.platform.startswith('linux'):
+        return None
+    # imported here since importing ctypes is slow
+    import ctypes
+    import ctypes.util
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = (ctypes.c_int,)
+        libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        libc.inotify_rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_fsencode = getattr(os, 'fsencode', lambda s: s)
+_fsdecode = getattr(os, 'fsdecode', lambda s: s)
+
+
+def _watch_inotify(watcher,  # type: _Watcher
+                   initial,  # type: bool
+                   timeout,  # type: Optional[float]
+                   libc
+                   ):
+    # type: (...) -> Iterable[ChangedFileItem]
+    """
+    The inotify backend: the events received for the watched folders are used to check the entries that changed.
+    A folder is listed again only when a new folder appears, or when the kernel event queue overflows.
+    """
+    import ctypes
+    from select import select
+
+    fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    wds = dict()       # watch descriptor -> folder path
+    dir_wds = dict()   # folder path -> watch descriptor
+
+    def add_watch(dir_path):
+        wd = libc.inotify_add_watch(fd, _fsencode(dir_path), _IN_WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            if errno in (ENOENT, ENOTDIR):
+                # the folder was removed in the meantime: the event of its parent will be received
+                return
+            msg = "inotify_add_watch failed for folder '%s': %s" % (dir_path, os.strerror(errno))
+            if errno == ENOSPC:
+                msg += ". The limit of watched folders per user was reached: increase the " \
+                       "'fs.inotify.max_user_watches' sysctl, or use the 'poll' backend"
+            raise OSError(errno, msg)
+        wds[wd] = dir_path
+        dir_wds[dir_path] = wd
+
+    def rm_watch(dir_path):
+        wd = dir_wds.pop(dir_path, None)
+        if wd is not None:
+            wds.pop(wd, None)
+            libc.inotify_rm_watch(fd, wd)
+
+    try:
+        # each folder is watched before being listed by the initial scan, so that no change is missed
+        watcher.on_new_dir, watcher.on_removed_dir = add_watch, rm_watch
+        changes = watcher.start()
+        if initial:
+            for item in changes:
+                yield item
+
+        deadline = None if timeout is None else time() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time(), 0)
+            try:
+                readable = select([fd], [], [], remaining)[0]
+            except (OSError, IOError) as e:
+                if e.args[0] == EINTR:
+                    continue
+                raise
+            if not readable:
+                return
+
+            try:
+                data = os.read(fd, 65536)
+            except OSError as e:
+                if e.errno == EINTR:
+                    continue
+                raise
+
+            changes = []
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _IN_EVENT.unpack_from(data, offset)
+                name = _fsdecode(data[offset + _IN_EVENT.size:offset + _IN_EVENT.size + length].rstrip(b'\0'))
+                offset += _IN_EVENT.size + length
+
+                if mask & _IN_Q_OVERFLOW:
+                    # events were lost: scan all folders again
+                    for dir_path in list(watcher.dirs):
+                        if dir_path in watcher.dirs:
+                            watcher.scan_dir(dir_path, changes)
+                    continue
+
+                dir_path = wds.get(wd)
+                if dir_path is None or dir_path not in watcher.dirs:
+                    continue
+                if mask & _IN_IGNORED:
+                    # the watch was removed by the kernel
+                    wds.pop(wd, None)
+                    dir_wds.pop(dir_path, None)
+                elif mask & _IN_DELETE_SELF:
+                    watcher.remove_dir(dir_path, changes)
+                elif name and (mask & _IN_CREATE) and not (mask & _IN_ISDIR) and not os.path.islink(
+                        _join(dir_path, name)):
+                    # a new file: wait until it is closed after writing
+                    continue
+                elif name:
+                    watcher.update_entry(dir_path, name, None, changes, check=True)
+
+            if changes:
+                if deadline is not None:
+                    deadline = time() + timeout
+                for item in changes:
+                    yield item
+    finally:
+        watcher.on_new_dir = watcher.on_removed_dir = None
+        os.close(fd)
+
+
+WATCH_BACKENDS = ('inotify', 'poll')
+
+
+def watch_pattern(src_pattern,         # type: Union[str, Any]
+                  dst_pattern,         # type: Union[str, Any]
+                  names=None,          # type: Union[str, Any]
+                  backend=None,        # type: str
+                  poll_interval=0.5,   # type: float
+                  initial=True,        # type: bool
+                  timeout=None         # type: float
+                  ):
+    # type: (...) -> Iterable[ChangedFileItem]
+    """
+    Watches the files matching `src_pattern` and yields the corresponding items as they are added, modified or
+    removed. Each item has a `change` attribute equal to `'added'`, `'modified'` or `'removed'`, see
+    `fprules.changes.ChangedFileItem`. See `file_pattern` for details about the patterns.
+
+    A single scan is done at first. Then, only the folders and files that changed are checked again: with the
+    `'inotify'` backend (linux), the kernel reports the changes as soon as they happen. With the `'poll'` backend,
+    every `poll_interval` seconds each watched folder is `stat`-ed and listed again only if it changed, and each
+    matched file is `stat`-ed to detect modifications.
+
+    New files are reported once they are closed after writing with the `'inotify'` backend, so that partially
+    written files are not reported. The root folder of the search (the part of `src_pattern` before the first
+    wildcard) should exist when the watch starts.
+
+    The `'inotify'` backend watches each folder that can contain matches, and the number of watches per user is
+    limited by the `fs.inotify.max_user_watches` sysctl (8192 on older kernels). When the limit is reached, or when a
+    folder can not be watched, an `OSError` is raised: increase the limit, or use the `'poll'` backend.
+
+    This generator runs forever unless `timeout` is set: close it or break out of the loop to stop watching.
+
+    :param src_pattern: a string or object representing the source pattern to match
+    :param dst_pattern: a string or object representing the destination pattern(s)
+    :param names: a string or object representing the naming pattern to use
+    :param backend: `'inotify'`, `'poll'`, or None (default) to use `'inotify'` when available.
+    :param poll_interval: the number of seconds between two checks, for the `'poll'` backend.
+    :param initial: if True (default), the items of all files found by the initial scan are yielded first, as
+        `'added'`.
+    :param timeout: an optional number of seconds after which the generator stops if no change happened.
+    :return: a generator of `fprules.changes.ChangedFileItem`
+    """
+    if backend not in (None,) + WATCH_BACKENDS:
+        raise ValueError("Unknown watch backend '%s'. Available backends: %s" % (backend, WATCH_BACKENDS))
+
+    libc = None
+    if backend != 'poll':
+        libc = _load_inotify()
+        if libc is None and backend == 'inotify':
+            raise ValueError("The 'inotify' watch backend is not available on this system")
+
+    watcher = _Watcher(compile_pattern(src_pattern, dst_pattern, names=names))
+    if libc is not None:
+        return _watch_inotify(watcher, initial, timeout, libc)
+    else:
+        return _watch_poll(watcher, initial, poll_interval, timeout)
@@ -13,12 +13,12 @@ pkg_resources.require("setuptools_scm")
 from setuptools_scm import get_version  # noqa: E402
 
 # *************** Dependencies *********
-INSTALL_REQUIRES = ['pathlib2;python_version<"3.2"', 'makefun;python_version>="3.6"']
+INSTALL_REQUIRES = ['pathlib2;python_version<"3.2"', 'futures;python_version<"3.2"']
 DEPENDENCY_LINKS = []
 SETUP_REQUIRES = ['pytest-runner', 'setuptools_scm']
 TESTS_REQUIRE = ['pytest', 'pytest-logging', #  'pytest-cases
                  'requests', 'wget', 'doit']
-EXTRAS_REQUIRE = {}
+EXTRAS_REQUIRE = {'xxhash': ['xxhash']}
 
 # ************** ID card *****************
 DISTNAME = 'fprules'
@@ -138,11 +138,11 @@ setup(
     # To provide executable scripts, use entry points in preference to the
     # "scripts" keyword. Entry points provide cross-platform support and allow
     # pip to create the appropriate form of executable for the target platform.
-    # entry_points={
-    #     'console_scripts': [
-    #         'sample=sample:main',
-    #     ],
-    # },
+    entry_points={
+        'console_scripts': [
+            'fprules=fprules.__main__:main',
+        ],
+    },
 
     # explicitly setting the flag to avoid `ply` being downloaded
     # see https://github.com/smarie/python-getversion/pull/5